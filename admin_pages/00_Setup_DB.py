@@ -1,5 +1,6 @@
 import streamlit as st
-from db import run_exec, run_q
+from db import databases, ensure_schema, reserve_ids, run_exec, run_q, sharded
+from sharding import note_listings
 
 st.title("🔧 One-time DB Setup")
 
@@ -48,29 +49,44 @@ DDL = [
 ]
 
 if st.button("Create/ensure tables"):
-    for sql in DDL:
-        run_exec(sql)
+    for _, route in databases():  # every shard in sharded mode
+        for sql in DDL:
+            run_exec(sql, **route)
+    ensure_schema()  # normalized contact columns + indexes, backfilled from Contact
     st.success("Tables are ready.")
 
 st.divider()
 st.subheader("Optional: insert a few sample rows")
 if st.button("Insert sample data"):
-    run_exec("INSERT IGNORE INTO providers VALUES (1,'Food Bank','NGO','123 Main','Delhi','+911234567890')")
-    run_exec("INSERT IGNORE INTO receivers VALUES (1,'Shelter A','NGO','Delhi','+911111111111')")
+    run_exec(
+        "INSERT IGNORE INTO providers (Provider_ID,Name,Type,Address,City,Contact,Contact_E164,Contact_Kind) "
+        "VALUES (1,'Food Bank','NGO','123 Main','Delhi','+911234567890','+911234567890','phone')",
+        city="Delhi",
+    )
+    run_exec(
+        "INSERT IGNORE INTO receivers (Receiver_ID,Name,Type,City,Contact,Contact_E164,Contact_Kind) "
+        "VALUES (1,'Shelter A','NGO','Delhi','+911111111111','+911111111111','phone')",
+        city="Delhi",
+    )
     run_exec("""
         INSERT IGNORE INTO food_listings
         (Food_ID,Food_Name,Quantity,Expiry_Date,Provider_ID,Provider_Type,Location,Food_Type,Meal_Type)
         VALUES (1,'Veg Meals',20,DATE_ADD(CURDATE(), INTERVAL 2 DAY),1,'NGO','Delhi','Cooked','Lunch')
-    """)
-    run_exec("INSERT IGNORE INTO claims (Claim_ID, Food_ID, Receiver_ID, Status) VALUES (1,1,1,'Pending')")
+    """, city="Delhi")
+    if sharded():
+        note_listings([(1, "Delhi")])  # claim routing finds the listing's shard through the directory
+    run_exec("INSERT IGNORE INTO claims (Claim_ID, Food_ID, Receiver_ID, Status) VALUES (1,1,1,'Pending')",
+             city="Delhi")  # claims live with their listing
+    reserve_ids("claims", 1)  # keep the claim numbering past the sample claim
     st.success("Sample rows inserted.")
 
 st.divider()
 st.write("Current tables:")
-for r in run_q("SHOW TABLES"):
+for r in run_q("SHOW TABLES", **databases()[0][1]):
     st.write(list(r.values())[0])
 import streamlit as st
-from db import run_exec, run_q
+from db import databases, ensure_schema, reserve_ids, run_exec, run_q, sharded
+from sharding import note_listings
 
 st.title("🔧 One-time DB Setup")
 
@@ -119,24 +135,38 @@ DDL = [
 ]
 
 if st.button("Create/ensure tables"):
-    for sql in DDL:
-        run_exec(sql)
+    for _, route in databases():  # every shard in sharded mode
+        for sql in DDL:
+            run_exec(sql, **route)
+    ensure_schema()  # normalized contact columns + indexes, backfilled from Contact
     st.success("Tables are ready.")
 
 st.divider()
 st.subheader("Optional: insert a few sample rows")
 if st.button("Insert sample data"):
-    run_exec("INSERT IGNORE INTO providers VALUES (1,'Food Bank','NGO','123 Main','Delhi','+911234567890')")
-    run_exec("INSERT IGNORE INTO receivers VALUES (1,'Shelter A','NGO','Delhi','+911111111111')")
+    run_exec(
+        "INSERT IGNORE INTO providers (Provider_ID,Name,Type,Address,City,Contact,Contact_E164,Contact_Kind) "
+        "VALUES (1,'Food Bank','NGO','123 Main','Delhi','+911234567890','+911234567890','phone')",
+        city="Delhi",
+    )
+    run_exec(
+        "INSERT IGNORE INTO receivers (Receiver_ID,Name,Type,City,Contact,Contact_E164,Contact_Kind) "
+        "VALUES (1,'Shelter A','NGO','Delhi','+911111111111','+911111111111','phone')",
+        city="Delhi",
+    )
     run_exec("""
         INSERT IGNORE INTO food_listings
         (Food_ID,Food_Name,Quantity,Expiry_Date,Provider_ID,Provider_Type,Location,Food_Type,Meal_Type)
         VALUES (1,'Veg Meals',20,DATE_ADD(CURDATE(), INTERVAL 2 DAY),1,'NGO','Delhi','Cooked','Lunch')
-    """)
-    run_exec("INSERT IGNORE INTO claims (Claim_ID, Food_ID, Receiver_ID, Status) VALUES (1,1,1,'Pending')")
+    """, city="Delhi")
+    if sharded():
+        note_listings([(1, "Delhi")])  # claim routing finds the listing's shard through the directory
+    run_exec("INSERT IGNORE INTO claims (Claim_ID, Food_ID, Receiver_ID, Status) VALUES (1,1,1,'Pending')",
+             city="Delhi")  # claims live with their listing
+    reserve_ids("claims", 1)  # keep the claim numbering past the sample claim
     st.success("Sample rows inserted.")
 
 st.divider()
 st.write("Current tables:")
-for r in run_q("SHOW TABLES"):
+for r in run_q("SHOW TABLES", **databases()[0][1]):
     st.write(list(r.values())[0])
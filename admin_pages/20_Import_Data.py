@@ -1,88 +1,14 @@
 import streamlit as st
 import pandas as pd
-from db import run_exec
+import claim_events
+from db import run_exec, max_allowed_packet, reserve_ids, sharded, transaction
+from sharding import partition
+from batching import AdaptiveBatcher, load_batched
+from ingest import CANON, UPSERT_SQL, apply_mapping, build_rows
 
 st.title("📥 Bulk Import CSVs")
 
-# -------- batching + tiny helpers --------
-BATCH = 100  # lower to 50 if your DB proxy is flaky; raise to 200 if stable
-
-def _truncate(v, n):
-    if v is None:
-        return None
-    s = str(v)
-    return s[:n]
-
-def _clean(v):
-    # Turn NaN/NaT into None so MySQL accepts them
-    try:
-        if pd.isna(v):
-            return None
-    except Exception:
-        pass
-    return v
-
-# ----- canonical schemas (DB column names) -----
-CANON = {
-    "providers": {
-        "Provider_ID": ["provider_id","providerid","id"],
-        "Name":        ["name","providername"],
-        "Type":        ["type","providertype"],
-        "Address":     ["address","addr","street"],
-        "City":        ["city","locationcity"],
-        "Contact":     ["contact","phone","phone_number","phonenumber","contactnumber","email"],
-    },
-    "receivers": {
-        "Receiver_ID": ["receiver_id","receiverid","id"],
-        "Name":        ["name","receivername"],
-        "Type":        ["type"],
-        "City":        ["city"],
-        "Contact":     ["contact","phone","phone_number","phonenumber","contactnumber","email"],
-    },
-    "food_listings": {
-        "Food_ID":       ["food_id","foodid","id"],
-        "Food_Name":     ["food_name","foodname","name"],
-        "Quantity":      ["quantity","qty","count"],
-        "Expiry_Date":   ["expiry_date","expiredate","expdate","expiry"],
-        "Provider_ID":   ["provider_id","providerid"],
-        "Provider_Type": ["provider_type","providertype","type"],
-        "Location":      ["location","city","area"],
-        "Food_Type":     ["food_type","foodtype","category"],
-        "Meal_Type":     ["meal_type","mealtype"],
-    },
-    "claims": {
-        "Claim_ID":    ["claim_id","claimid","id"],
-        "Food_ID":     ["food_id","foodid"],
-        "Receiver_ID": ["receiver_id","receiverid"],
-        "Status":      ["status"],
-        "Timestamp":   ["timestamp","created_at","createdat","time"],
-    },
-}
-
-def norm(s: str) -> str:
-    return "".join(ch for ch in s.lower() if ch.isalnum())
-
-def make_mapper(table: str, cols):
-    # Build reverse lookup {normalized_source: canonical}
-    rev = {}
-    for canon, alts in CANON[table].items():
-        for a in [canon] + alts:
-            rev[norm(a)] = canon
-    mapping = {}
-    for c in cols:
-        nc = norm(c)
-        mapping[c] = rev.get(nc)  # None if unknown
-    return mapping
-
-def apply_mapping(df: pd.DataFrame, table: str) -> pd.DataFrame:
-    mapping = make_mapper(table, df.columns)
-    # columns we successfully mapped
-    mapped = {src: dst for src, dst in mapping.items() if dst}
-    df = df.rename(columns=mapped)
-    required = set(CANON[table].keys())
-    have = set(df.columns) & required
-    missing = list(required - have)
-    return df, mapped, missing
+BATCH = 100  # starting size only; AdaptiveBatcher tunes it from latency, packet size and retries
 
 TABLE = st.selectbox("Target table", list(CANON.keys()))
 file = st.file_uploader(f"Upload CSV for {TABLE}", type=["csv"])
@@ -115,138 +41,39 @@ if file:
         prog = st.progress(0)
         status = st.empty()
 
-        # ---------- PROVIDERS ----------
-        if TABLE == "providers":
-            rows = []
-            for i, r in enumerate(df.to_dict(orient="records"), 1):
-                rows.append((
-                    int(r["Provider_ID"]),
-                    _truncate(_clean(r.get("Name")), 100),
-                    _truncate(_clean(r.get("Type")), 50),
-                    _truncate(_clean(r.get("Address")), 255),
-                    _truncate(_clean(r.get("City")), 100),
-                    _truncate(_clean(r.get("Contact")), 100),
-                ))
-                if len(rows) >= BATCH:
-                    run_exec("""
-                        INSERT INTO providers(Provider_ID,Name,Type,Address,City,Contact)
-                        VALUES (%s,%s,%s,%s,%s,%s)
-                        ON DUPLICATE KEY UPDATE Name=VALUES(Name),Type=VALUES(Type),
-                        Address=VALUES(Address),City=VALUES(City),Contact=VALUES(Contact)
-                    """, rows)
-                    rows.clear()
-                if i % BATCH == 0 or i == total:
-                    prog.progress(i/total)
-                    status.write(f"Inserting providers… {i:,}/{total:,}")
-            if rows:
-                run_exec("""
-                    INSERT INTO providers(Provider_ID,Name,Type,Address,City,Contact)
-                    VALUES (%s,%s,%s,%s,%s,%s)
-                    ON DUPLICATE KEY UPDATE Name=VALUES(Name),Type=VALUES(Type),
-                    Address=VALUES(Address),City=VALUES(City),Contact=VALUES(Contact)
-                """, rows)
+        rows = build_rows(df, TABLE)
+        batcher = AdaptiveBatcher(start=BATCH, max_packet=max_allowed_packet())
+
+        def _progress(done, n, size, rps):
+            prog.progress(done / n)
+            status.write(
+                f"Inserting {TABLE}… {done:,}/{n:,} · batch size **{size:,}** · "
+                f"{rps:,.0f} rows/sec · retries {batcher.errors}"
+            )
 
-        # ---------- RECEIVERS ----------
-        elif TABLE == "receivers":
-            rows = []
-            for i, r in enumerate(df.to_dict(orient="records"), 1):
-                rows.append((
-                    int(r["Receiver_ID"]),
-                    _truncate(_clean(r.get("Name")), 100),
-                    _truncate(_clean(r.get("Type")), 50),
-                    _truncate(_clean(r.get("City")), 100),
-                    _truncate(_clean(r.get("Contact")), 100),
-                ))
-                if len(rows) >= BATCH:
-                    run_exec("""
-                        INSERT INTO receivers(Receiver_ID,Name,Type,City,Contact)
-                        VALUES (%s,%s,%s,%s,%s)
-                        ON DUPLICATE KEY UPDATE Name=VALUES(Name),Type=VALUES(Type),
-                        City=VALUES(City),Contact=VALUES(Contact)
-                    """, rows)
-                    rows.clear()
-                if i % BATCH == 0 or i == total:
-                    prog.progress(i/total)
-                    status.write(f"Inserting receivers… {i:,}/{total:,}")
-            if rows:
-                run_exec("""
-                    INSERT INTO receivers(Receiver_ID,Name,Type,City,Contact)
-                    VALUES (%s,%s,%s,%s,%s)
-                    ON DUPLICATE KEY UPDATE Name=VALUES(Name),Type=VALUES(Type),
-                    City=VALUES(City),Contact=VALUES(Contact)
-                """, rows)
+        def _by_shard(chunk):
+            if not sharded():
+                return [({}, chunk)]
+            return [({"shard": name}, part) for name, part in partition(TABLE, chunk).items()]
 
-        # ---------- FOOD_LISTINGS ----------
-        elif TABLE == "food_listings":
-            if "Expiry_Date" in df.columns:
-                df["Expiry_Date"] = pd.to_datetime(df["Expiry_Date"], errors="coerce").dt.date
-            rows = []
-            for i, r in enumerate(df.to_dict(orient="records"), 1):
-                rows.append((
-                    int(r["Food_ID"]),
-                    _truncate(_clean(r.get("Food_Name")), 120),
-                    int(_clean(r.get("Quantity", 0)) or 0),
-                    _clean(r.get("Expiry_Date")),
-                    int(r["Provider_ID"]),
-                    _truncate(_clean(r.get("Provider_Type")), 50),
-                    _truncate(_clean(r.get("Location")), 100),
-                    _truncate(_clean(r.get("Food_Type")), 50),
-                    _truncate(_clean(r.get("Meal_Type")), 50),
-                ))
-                if len(rows) >= BATCH:
-                    run_exec("""
-                        INSERT INTO food_listings(Food_ID,Food_Name,Quantity,Expiry_Date,Provider_ID,Provider_Type,Location,Food_Type,Meal_Type)
-                        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                        ON DUPLICATE KEY UPDATE Food_Name=VALUES(Food_Name),Quantity=VALUES(Quantity),
-                        Expiry_Date=VALUES(Expiry_Date),Provider_ID=VALUES(Provider_ID),Provider_Type=VALUES(Provider_Type),
-                        Location=VALUES(Location),Food_Type=VALUES(Food_Type),Meal_Type=VALUES(Meal_Type)
-                    """, rows)
-                    rows.clear()
-                if i % BATCH == 0 or i == total:
-                    prog.progress(i/total)
-                    status.write(f"Inserting food_listings… {i:,}/{total:,}")
-            if rows:
-                run_exec("""
-                    INSERT INTO food_listings(Food_ID,Food_Name,Quantity,Expiry_Date,Provider_ID,Provider_Type,Location,Food_Type,Meal_Type)
-                    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                    ON DUPLICATE KEY UPDATE Food_Name=VALUES(Food_Name),Quantity=VALUES(Quantity),
-                    Expiry_Date=VALUES(Expiry_Date),Provider_ID=VALUES(Provider_ID),Provider_Type=VALUES(Provider_Type),
-                    Location=VALUES(Location),Food_Type=VALUES(Food_Type),Meal_Type=VALUES(Meal_Type)
-                """, rows)
+        def _exec(sql, chunk):
+            for route, part in _by_shard(chunk):
+                if TABLE == "claims":
+                    # each batch and its claim_events rows commit together
+                    with transaction(**route) as cur:
+                        claim_events.upsert_rows(cur, sql, part)
+                else:
+                    run_exec(sql, part, **route)
 
-        # ---------- CLAIMS ----------
-        elif TABLE == "claims":
-            if "Timestamp" in df.columns:
-                df["Timestamp"] = pd.to_datetime(df["Timestamp"], errors="coerce")
-            rows = []
-            for i, r in enumerate(df.to_dict(orient="records"), 1):
-                rows.append((
-                    int(r["Claim_ID"]),
-                    int(r["Food_ID"]),
-                    int(r["Receiver_ID"]),
-                    _truncate(_clean(r.get("Status", "Pending")), 20),
-                    _clean(r.get("Timestamp")),
-                ))
-                if len(rows) >= BATCH:
-                    run_exec("""
-                        INSERT INTO claims(Claim_ID,Food_ID,Receiver_ID,Status,Timestamp)
-                        VALUES (%s,%s,%s,%s,%s)
-                        ON DUPLICATE KEY UPDATE Food_ID=VALUES(Food_ID),Receiver_ID=VALUES(Receiver_ID),
-                        Status=VALUES(Status),Timestamp=VALUES(Timestamp)
-                    """, rows)
-                    rows.clear()
-                if i % BATCH == 0 or i == total:
-                    prog.progress(i/total)
-                    status.write(f"Inserting claims… {i:,}/{total:,}")
-            if rows:
-                run_exec("""
-                    INSERT INTO claims(Claim_ID,Food_ID,Receiver_ID,Status,Timestamp)
-                    VALUES (%s,%s,%s,%s,%s)
-                    ON DUPLICATE KEY UPDATE Food_ID=VALUES(Food_ID),Receiver_ID=VALUES(Receiver_ID),
-                    Status=VALUES(Status),Timestamp=VALUES(Timestamp)
-                """, rows)
+        load_batched(UPSERT_SQL[TABLE], rows, _exec, batcher, on_progress=_progress)
+        if TABLE == "claims" and rows:
+            reserve_ids("claims", max(r[0] for r in rows))  # new claims are numbered after these
 
         status.empty()
         prog.progress(1.0)
-        st.success(f"Inserted/updated {total:,} rows into `{TABLE}`.")
+        st.success(
+            f"Inserted/updated {total:,} rows into `{TABLE}` "
+            f"({batcher.rows_per_sec:,.0f} rows/sec, final batch size {batcher.next_size():,}, "
+            f"{batcher.errors} retried batches)."
+        )
         st.toast("Done!", icon="✅")
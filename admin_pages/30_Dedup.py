@@ -0,0 +1,65 @@
+import streamlit as st
+import pandas as pd
+from db import run_q, transaction
+from dedup import KINDS, MAX_BLOCK, THRESHOLD, clusters, find_candidates, merge, merge_plan
+
+st.title("🧹 Find & Merge Duplicates")
+
+KIND = st.selectbox("Table", list(KINDS.keys()))
+threshold = st.slider("Minimum score", 0.5, 1.0, THRESHOLD, 0.01)
+id_col = KINDS[KIND]["id"]
+
+if st.button("Find candidates"):
+    with st.spinner("Blocking and scoring…"):
+        df = pd.DataFrame(run_q(f"SELECT * FROM {KIND}", primary=True))
+        skipped = []
+        cands = find_candidates(df, KIND, threshold, skipped) if not df.empty else pd.DataFrame()
+    st.session_state["dedup"] = {"kind": KIND, "rows": len(df), "cands": cands, "skipped": skipped}
+
+res = st.session_state.get("dedup")
+if res and res["kind"] == KIND:
+    cands = res["cands"]
+    st.caption(f"{len(cands)} candidate pair(s) among {res['rows']} {KIND}.")
+    if res["skipped"]:
+        st.warning(f"{len(res['skipped'])} block(s) still had more than {MAX_BLOCK} rows after splitting on a "
+                   "second key and were not compared; duplicates inside them are not listed.")
+        st.dataframe(pd.DataFrame(res["skipped"]), hide_index=True, use_container_width=True)
+    if not cands.empty:
+        edited = st.data_editor(
+            cands.assign(merge=False),
+            column_config={"merge": st.column_config.CheckboxColumn("Merge", default=False)},
+            disabled=[c for c in cands.columns],
+            hide_index=True,
+            use_container_width=True,
+            key=f"dedup_editor_{KIND}",
+        )
+        picked = edited[edited["merge"]]
+        groups = clusters(zip(picked[f"{id_col}_a"], picked[f"{id_col}_b"]))
+        if groups:
+            st.write("**Will merge (lowest ID is kept):**")
+            st.write({int(k): [int(d) for d in v] for k, v in groups.items()})
+        st.caption(
+            f"Each merge repoints {id_col} in `{KINDS[KIND]['ref_table']}` to the kept row "
+            "and deletes the duplicates in one transaction (sharded receivers: references are repointed "
+            "on every shard, then the duplicates deleted, one transaction per shard and step)."
+        )
+        if st.button("Merge selected", disabled=not groups, type="primary"):
+            done, failed = 0, []
+            for keep, drops in groups.items():
+                drops = [int(d) for d in drops]
+                committed = []
+                try:
+                    for steps, route in merge_plan(KIND, int(keep), drops):
+                        with transaction(**route) as cur:
+                            merge(cur, KIND, int(keep), drops, steps)
+                        committed.append(f"{'+'.join(steps)} on {route.get('shard', 'the database')}")
+                    done += 1
+                except Exception as e:
+                    failed.append((keep, e, committed))
+            st.session_state.pop("dedup", None)
+            st.success(f"Merged {done} group(s).")
+            for keep, e, committed in failed:
+                st.error(f"Merge into {keep} failed: {e}")
+                if committed:  # sharded: part of the plan went through; every step is safe to rerun
+                    st.warning(f"Already committed for {keep}: {', '.join(committed)}. "
+                               "Find candidates and merge the group again to finish it.")
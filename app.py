@@ -1,116 +1,282 @@
 # app.py — Streamlit + MySQL (Railway) using db.py helpers
 
-import streamlit as st
-import pandas as pd
-import mysql.connector   # only for catching mysql errors in try/except
+import time
+from collections import OrderedDict
+from functools import partial
 from urllib.parse import quote
 
-from db import run_q as db_run_q, run_exec, ensure_schema
+import startup                  # stdlib-only; times the rest of the cold start
+from startup import phase
+
+with phase("import streamlit"):
+    import streamlit as st
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+with phase("import pandas"):
+    import pandas as pd
+with phase("import mysql.connector"):
+    import mysql.connector   # only for catching mysql errors in try/except
+with phase("import db"):
+    from db import (run_q as db_run_q, run_exec, databases, ensure_schema, note_write, open_pools,
+                    sharded, snapshots, transaction)
+# everything else (queries, sharding, claim_events, contacts, claim_queue, cube, export) is imported
+# where it's used, so the first paint only pays for streamlit, pandas and db
 
 # ------------------------------------------------------------
 # App setup
 # ------------------------------------------------------------
 st.set_page_config(page_title="Local Food Wastage Management", layout="wide")
 
-# Run the schema creation safely (won't crash UI if DB had a transient hiccup)
-try:
-    ensure_schema()  # safe to run every start
-except Exception as e:
-    st.warning(f"Could not verify DB schema right now. If this persists, check DB: {e}")
+# per-interaction query counter: a full run resets it here, fragment reruns in begin_interaction()
+st.session_state["_full_run"] = True
+st.session_state["_q_count"] = 0
+
+@st.cache_resource
+def _schema_once():
+    ensure_schema()  # once per process, not on every widget interaction
+    return True
 
 # ------------------------------------------------------------
 # Helpers
 # ------------------------------------------------------------
-def run_q_df(sql, params=None):
+def counted_q(sql, params=None, **route):
+    """db_run_q plus the per-interaction query counter shown by query_badge(); **route: city/shard/merge."""
+    if get_script_run_ctx() is not None:  # warm-up thread has no session to count into
+        st.session_state["_q_count"] = st.session_state.get("_q_count", 0) + 1
+    return db_run_q(sql, params, **route)
+
+def run_q_df(sql, params=None, **route):
     """Always return a pandas DataFrame, whether db_run_q returns list or DF."""
-    rows = db_run_q(sql, params)
+    rows = counted_q(sql, params, **route)
     return rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(rows)
 
-# Safer link builders (avoid throwing if contact is empty/odd)
-def tel_link(num: str | int | None):
-    """Return tel: link or None if no digits found."""
-    if num is None:
+MEMO_TTL = 60   # seconds a session reuses a read before asking the DB again
+MEMO_MAX = 64   # DataFrames a session keeps (LRU); report 4 alone adds one per city typed
+
+def memo_q_df(sql, params=None, ttl=MEMO_TTL, **route):
+    """Per-session LRU memo of run_q_df keyed by (sql, params, route); cleared by write()."""
+    memo = st.session_state.setdefault("_memo", OrderedDict())
+    key = (sql, tuple(params or ()), tuple(sorted(route.items())))
+    now = time.time()
+    hit = memo.get(key)
+    if hit and now < hit[0]:
+        memo.move_to_end(key)
+        return hit[1]
+    df = run_q_df(sql, params, **route)
+    for k in [k for k, (expires, _) in memo.items() if expires <= now]:
+        del memo[k]  # expired entries would otherwise sit in session_state until the next write
+    memo[key] = (now + ttl, df)
+    while len(memo) > MEMO_MAX:
+        memo.popitem(last=False)
+    return df
+
+def _distinct(col):
+    from sharding import Merge
+    return Merge(distinct=True, order_by=((col, False),))
+
+@st.cache_data(ttl=MEMO_TTL, show_spinner=False)
+def filter_options():
+    """Browse dropdown lists; the same for every session, so cached per process (primed at warm-up)."""
+    from sharding import Merge
+    has_fl = run_q_df("SELECT COUNT(*) AS c FROM food_listings", merge=Merge(sums=("c",)))
+    locs = run_q_df("SELECT DISTINCT Location FROM food_listings ORDER BY 1",
+                    merge=_distinct("Location"))["Location"].tolist() if not has_fl.empty else []
+    provs = run_q_df("SELECT provider_id, name FROM providers ORDER BY name", merge=Merge(order_by=(("name", False),)))
+    food_types = run_q_df("SELECT DISTINCT Food_Type FROM food_listings ORDER BY 1",
+                          merge=_distinct("Food_Type"))["Food_Type"].tolist() if not has_fl.empty else []
+    return locs, (provs["name"].tolist() if not provs.empty else []), food_types
+
+def invalidate():
+    """Drop this session's memoized reads (after it wrote something)."""
+    st.session_state["_memo"] = OrderedDict()
+    filter_options.clear()
+
+def write(sql, params=None, **route):
+    run_exec(sql, params, **route)
+    invalidate()
+
+def flash(msg, kind="success"):
+    """Show `msg` after the next full rerun (used when a fragment write must refresh other parts)."""
+    st.session_state["_flash"] = (kind, msg)
+    st.rerun()
+
+def save(what, do, msg, kind="success"):
+    """Run a CRUD write; flash `msg` on success, show the DB error (e.g. a city mid-move) inline."""
+    try:
+        do()
+    except mysql.connector.Error as e:
+        st.error(f"Could not save {what}: {e}")
+    else:
+        flash(msg, kind)
+
+def claim_queue(food_id):
+    """The claim write queue; sharded, the one of the shard holding listing `food_id`."""
+    from claim_queue import get_claim_queue  # deferred: only claim forms need it
+    import sharding
+    return get_claim_queue(sharding.claim_home(food_id)) if sharded() else get_claim_queue()
+
+def claim_pending():
+    """create() timed out or the commit couldn't be confirmed (claim_queue.CommitUnknown): it may well land."""
+    note_write()
+    invalidate()
+    st.info("Claim submitted and pending: the database hasn't confirmed it yet. "
+            "Check the claims table in a moment before submitting it again.")
+
+SCHEMA_POLL = 2.0   # seconds between checks while the schema isn't there yet
+
+@st.cache_resource
+def warm_up():
+    """Started on the first run; the first paint doesn't wait for any of this."""
+    return startup.WarmUp([
+        ("schema", _schema_once),
+        ("connection pools", open_pools),
+        ("filter options", filter_options),
+        ("supply cube", supply_cube),
+        ("completion times", catch_up_completion_times),
+    ])
+
+@st.fragment(run_every=SCHEMA_POLL)
+def schema_pending():
+    """Stands in for the page until the schema task is done; polls on its own, the shell is already painted."""
+    warmup = warm_up()
+    if warmup.wait("schema", timeout=0):
+        st.rerun()  # full rerun: the page can render now
+    status = warmup.status["schema"]
+    if status.startswith("error"):
+        st.warning(f"Could not set up the DB schema yet (retrying in the background): {status}")
+    else:
+        st.info("⏳ Setting up the database…")
+
+def begin_interaction():
+    """Call first thing in a fragment: a fragment-only rerun starts its own query count."""
+    if not st.session_state.get("_full_run"):
+        st.session_state["_q_count"] = 0
+
+def query_badge(where):
+    st.caption(f"⚡ {st.session_state.get('_q_count', 0)} queries issued on this rerun ({where})")
+
+@st.cache_resource
+def supply_cube():
+    """Process-wide OLAP cube (see cube.py); built once, then refreshed incrementally."""
+    from cube import Cube  # deferred: pulls in numpy-heavy code only when the cube is built
+    with snapshots() as readers:
+        return Cube().build(readers)
+
+@st.cache_resource
+def completion_times():
+    """Process-wide claim_events consumer; each poll reads only events since the last one."""
+    import claim_events
+    return claim_events.CompletionTimes()
+
+def event_readers():
+    """{stream: counted reader} for claim_events consumers: the one database, or each shard."""
+    return {name: partial(counted_q, **route) for name, route in databases()}
+
+def catch_up_completion_times():
+    """
+    Poll completion_times() up to the head of every stream. The warm-up does the full replay of the log,
+    so the Reports page (which calls this on each render) only reads events since the last poll.
+    """
+    import claim_events
+    ct = completion_times()
+    for stream, reader in event_readers().items():
+        claim_events.poll(ct, reader, stream=stream)
+    return ct
+
+# Link builders over the normalized contact columns (see contacts.py); None/NaN -> no link
+def _present(v) -> bool:
+    return v is not None and not pd.isna(v) and v != ""
+
+def tel_link(e164: str | None, ext: str | None = None):
+    """Return tel: link (RFC 3966, with extension) or None."""
+    if not _present(e164):
         return None
-    digits = "".join(ch for ch in str(num) if ch.isdigit())
-    return f"tel:{digits}" if digits else None
+    return f"tel:{e164};ext={ext}" if _present(ext) else f"tel:{e164}"
 
 def mailto_link(addr: str | None, subject="Food Donation", body="Hi, I’m interested."):
     """Return mailto: link or None if empty."""
-    if not addr:
+    if not _present(addr):
         return None
     return f"mailto:{addr}?subject={quote(subject)}&body={quote(body)}"
 
-def wa_link(num: str | int | None, text="Hello, I’m interested in this food listing."):
-    """Return WhatsApp link or None if no digits found."""
-    if num is None:
+def wa_link(e164: str | None, text="Hello, I’m interested in this food listing."):
+    """Return WhatsApp link or None (wa.me wants the E.164 digits without '+')."""
+    if not _present(e164):
         return None
-    digits = "".join(ch for ch in str(num) if ch.isdigit())
-    return f"https://wa.me/{digits}?text={quote(text)}" if digits else None
-
-def next_claim_id():
-    """Get the next integer Claim_ID even without AUTO_INCREMENT."""
-    df = run_q_df("SELECT COALESCE(MAX(Claim_ID)+1,1) AS next_id FROM claims")
-    return int(df.iloc[0]["next_id"]) if df is not None and not df.empty else 1
+    return f"https://wa.me/{e164.lstrip('+')}?text={quote(text)}"
+
+EXPORT_MAX_MB = 50  # in-app downloads are held in memory by Streamlit; bigger ones: python export.py
+
+@st.fragment
+def export_controls(sql, params=None, key="export", **route):
+    """Format picker + streamed export (spooled to a temp file chunk by chunk, capped at EXPORT_MAX_MB)."""
+    import os
+    import tempfile
+    from export import FORMATS, ExportTooLarge, write_to
+
+    c1, c2 = st.columns([1, 3])
+    fmt = c1.selectbox("Export format", list(FORMATS), key=f"{key}_fmt")
+    c2.caption(f"Downloads here are capped at {EXPORT_MAX_MB} MB (the file is served from memory); "
+               "use `python export.py` for larger exports.")
+    if c2.button("Prepare export", key=f"{key}_prep"):
+        # download_button takes a BufferedReader but not a BufferedRandom (TemporaryFile): spool to a
+        # named file, then hand it over opened "rb"
+        spool = tempfile.NamedTemporaryFile(suffix=f".{fmt}", delete=False)
+        try:
+            with spool:
+                write_to(spool, sql, params, fmt, max_bytes=EXPORT_MAX_MB * 2**20, **route)
+            with open(spool.name, "rb") as f:
+                c2.download_button(
+                    f"Download .{fmt}", f, file_name=f"{key}.{fmt}",
+                    mime=FORMATS[fmt], key=f"{key}_dl",
+                )
+        except ExportTooLarge as e:
+            st.warning(f"Not offered for download: the {e}. Use `python export.py` for this one.")
+        except (mysql.connector.Error, RuntimeError) as e:
+            st.error(f"Export failed: {e}")
+        finally:
+            os.unlink(spool.name)
 
 # ------------------------------------------------------------
-# UI
+# Fragments: each reruns on its own widgets and only re-issues its own queries
 # ------------------------------------------------------------
-st.title("Local Food Wastage Management System")
-page = st.sidebar.radio("Go to", ["Browse & Filter", "CRUD", "Reports & Insights"], key="nav_radio")
-
-# ==================== BROWSE & FILTER ====================
-if page == "Browse & Filter":
-    st.subheader("Filter food donations")
-
-    has_fl = run_q_df("SELECT COUNT(*) AS c FROM food_listings")
-    locs = run_q_df("SELECT DISTINCT Location FROM food_listings ORDER BY 1")["Location"].tolist() if not has_fl.empty else []
-    provs = run_q_df("SELECT provider_id, name FROM providers ORDER BY name")
-    food_types = run_q_df("SELECT DISTINCT Food_Type FROM food_listings ORDER BY 1")["Food_Type"].tolist() if not has_fl.empty else []
+@st.fragment
+def browse_results():
+    from queries import browse_route, browse_sql
+    begin_interaction()
+    locs, prov_names, food_types = filter_options()
 
     col1, col2, col3 = st.columns(3)
     sel_loc  = col1.selectbox("Location", ["All"] + locs, key="filter_loc")
-    sel_prov = col2.selectbox("Provider", ["All"] + (provs["name"].tolist() if not provs.empty else []), key="filter_prov")
+    sel_prov = col2.selectbox("Provider", ["All"] + prov_names, key="filter_prov")
     sel_food = col3.selectbox("Food Type", ["All"] + food_types, key="filter_food")
 
-    where, args = [], []
-    if sel_loc  != "All": where.append("fl.Location = %s");  args.append(sel_loc)
-    if sel_prov != "All": where.append("p.Name = %s");       args.append(sel_prov)
-    if sel_food != "All": where.append("fl.Food_Type = %s"); args.append(sel_food)
-
-    sql = """
-        SELECT fl.Food_ID, fl.Food_Name, fl.Quantity, fl.Expiry_Date,
-               fl.Provider_ID, p.Name AS Provider_Name, p.Type AS Provider_Type,
-               fl.Location, fl.Food_Type, fl.Meal_Type, p.Contact
-        FROM food_listings fl
-        JOIN providers p ON p.Provider_ID = fl.Provider_ID
-    """
-    if where:
-        sql += " WHERE " + " AND ".join(where)
-    sql += " ORDER BY fl.Expiry_Date ASC"
-
-    results = run_q_df(sql, args)
+    sql, args = browse_sql(sel_loc, sel_prov, sel_food)
+    results = memo_q_df(sql, args, **browse_route(sel_loc))
+    st.session_state["browse_results"] = results  # input of contact_provider()
     st.success(f"{len(results)} matching listings found.")
     st.dataframe(results, use_container_width=True, key="df_results")
+    export_controls(sql, args, key="browse_results", **browse_route(sel_loc))
+    query_badge("filters")
 
-    # ---------- Contact Provider ----------
+@st.fragment
+def contact_provider():
+    begin_interaction()
+    results = st.session_state.get("browse_results", pd.DataFrame())
     st.markdown("### Contact provider for a selected Food_ID")
     selected_id = st.number_input("Enter Food_ID", step=1, min_value=0, key="bf_selected_id")
 
     if st.button("Show Contact Options", key="btn_show_contact"):
-        row = results[results["Food_ID"] == selected_id]
+        row = results[results["Food_ID"] == selected_id] if not results.empty else results
         if row.empty:
             st.warning("Food_ID not in the filtered table above.")
         else:
             r = row.iloc[0]
             st.markdown(f"**Provider:** {r['Provider_Name']} ({r['Provider_Type']})")
 
-            # contact can be phone or email; build safe links
-            raw_contact = r.get("Contact")
-            contact_str = "" if pd.isna(raw_contact) else str(raw_contact)
-
-            tel  = tel_link(contact_str)
-            mail = mailto_link(contact_str)
-            wa   = wa_link(contact_str)
+            # links come from the contact fields normalized at import/upsert time
+            tel  = tel_link(r.get("Contact_E164"), r.get("Contact_Ext"))
+            mail = mailto_link(r.get("Contact_Email"))
+            wa   = wa_link(r.get("Contact_E164"))
 
             c1, c2, c3 = st.columns(3)
             if tel:  c1.link_button("Call", tel)
@@ -121,187 +287,312 @@ if page == "Browse & Filter":
 
             if wa:   c3.link_button("WhatsApp", wa)
             else:    c3.button("WhatsApp", disabled=True)
-
-    st.divider()
+    query_badge("contact")
+
+@st.fragment
+def contact_lookup():
+    from contacts import reverse_lookup  # deferred: pandas-heavy normalization
+    begin_interaction()
+    st.markdown("### Everything for a phone number or email")
+    q = st.text_input("Phone or email (any format)", key="lookup_contact")
+    if q:
+        found = reverse_lookup(counted_q, q)
+        if not any(found.values()):
+            st.info("No providers or receivers with that contact.")
+        for name, rows in found.items():
+            if rows:
+                st.markdown(f"**{name.capitalize()}** ({len(rows)})")
+                st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+    query_badge("contact lookup")
+
+@st.fragment
+def quick_claim():
+    begin_interaction()
     st.subheader("Quick claim (demo)")
     fid = st.number_input("Food_ID to claim", step=1, min_value=0, key="claim_fid")
     rid = st.number_input("Receiver_ID", step=1, min_value=0, key="claim_rid")
     if st.button("Create Claim", key="btn_create_claim"):
         try:
-            new_id = next_claim_id()
-            run_exec(
-                "INSERT INTO claims(Claim_ID, Food_ID, Receiver_ID, Status, Timestamp) VALUES (%s,%s,%s,%s,NOW())",
-                (new_id, fid, rid, "Pending"),
-            )
+            new_id = claim_queue(fid).create(fid, rid, "Pending")
+            note_write()  # the queue wrote on its own connection
+            invalidate()
             st.success(f"Claim created (ID: {new_id}, status: Pending).")
+        except TimeoutError:
+            claim_pending()
         except mysql.connector.Error as e:
             st.error(f"Could not create claim: {e}")
+    query_badge("quick claim")
+
+@st.fragment
+def crud_providers():
+    import sharding
+    from contacts import normalize_one
+    begin_interaction()
+    st.markdown("**Add / Update Provider**")
+    pid     = st.number_input("Provider_ID", step=1, min_value=0, key="prov_pid")
+    name    = st.text_input("Name", key="prov_name")
+    typ     = st.text_input("Type", key="prov_type")
+    addr    = st.text_input("Address", key="prov_addr")
+    city    = st.text_input("City", key="prov_city")
+    contact = st.text_input("Contact", key="prov_contact")
+    c1, c2 = st.columns(2)
+    if c1.button("Upsert Provider", key="btn_upsert_provider"):
+        save("provider", lambda: write("""
+            INSERT INTO providers(Provider_ID,Name,Type,Address,City,Contact,
+                                  Contact_E164,Contact_Ext,Contact_Email,Contact_Kind)
+            VALUES(%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+            ON DUPLICATE KEY UPDATE Name=VALUES(Name), Type=VALUES(Type),
+                                     Address=VALUES(Address), City=VALUES(City), Contact=VALUES(Contact),
+                                     Contact_E164=VALUES(Contact_E164), Contact_Ext=VALUES(Contact_Ext),
+                                     Contact_Email=VALUES(Contact_Email), Contact_Kind=VALUES(Contact_Kind)
+        """, (pid, name, typ, addr, city, contact, *normalize_one(contact)),
+           **sharding.route("providers", "Provider_ID", pid, city)), "Upserted.")
+    if c2.button("Delete Provider", key="btn_delete_provider"):
+        save("provider", lambda: write("DELETE FROM providers WHERE Provider_ID=%s", (pid,),
+                                       **sharding.route("providers", "Provider_ID", pid)),
+             "Deleted (if existed).", "warning")
+
+@st.fragment
+def crud_receivers():
+    import sharding
+    from contacts import normalize_one
+    begin_interaction()
+    st.markdown("**Add / Update Receiver**")
+    rid     = st.number_input("Receiver_ID", step=1, min_value=0, key="rec_rid")
+    name    = st.text_input("Name", key="rec_name")
+    typ     = st.text_input("Type", key="rec_type")
+    city    = st.text_input("City", key="rec_city")
+    contact = st.text_input("Contact", key="rec_contact")
+    c1, c2 = st.columns(2)
+    if c1.button("Upsert Receiver", key="btn_upsert_receiver"):
+        save("receiver", lambda: write("""
+            INSERT INTO receivers(Receiver_ID,Name,Type,City,Contact,
+                                  Contact_E164,Contact_Ext,Contact_Email,Contact_Kind)
+            VALUES(%s,%s,%s,%s,%s,%s,%s,%s,%s)
+            ON DUPLICATE KEY UPDATE Name=VALUES(Name), Type=VALUES(Type),
+                                     City=VALUES(City), Contact=VALUES(Contact),
+                                     Contact_E164=VALUES(Contact_E164), Contact_Ext=VALUES(Contact_Ext),
+                                     Contact_Email=VALUES(Contact_Email), Contact_Kind=VALUES(Contact_Kind)
+        """, (rid, name, typ, city, contact, *normalize_one(contact)),
+           **sharding.route("receivers", "Receiver_ID", rid, city)), "Upserted.")
+    if c2.button("Delete Receiver", key="btn_delete_receiver"):
+        save("receiver", lambda: write("DELETE FROM receivers WHERE Receiver_ID=%s", (rid,),
+                                       **sharding.route("receivers", "Receiver_ID", rid)),
+             "Deleted (if existed).", "warning")
+
+@st.fragment
+def crud_food_listings():
+    import sharding
+    begin_interaction()
+    st.markdown("**Add / Update Food Listing**")
+    fid   = st.number_input("Food_ID", step=1, min_value=0, key="fl_fid")
+    fname = st.text_input("Food_Name", key="fl_fname")
+    qty   = st.number_input("Quantity", step=1, min_value=0, key="fl_qty")
+    exp   = st.date_input("Expiry_Date", key="fl_exp")
+    pid   = st.number_input("Provider_ID", step=1, min_value=0, key="fl_pid")
+    ptype = st.text_input("Provider_Type", key="fl_ptype")
+    loc   = st.text_input("Location", key="fl_loc")
+    ftype = st.text_input("Food_Type", key="fl_ftype")
+    mtype = st.text_input("Meal_Type", key="fl_mtype")
+    c1, c2 = st.columns(2)
+    if c1.button("Upsert Food", key="btn_upsert_food"):
+        save("listing", lambda: write("""
+            INSERT INTO food_listings(Food_ID,Food_Name,Quantity,Expiry_Date,Provider_ID,Provider_Type,Location,Food_Type,Meal_Type)
+            VALUES(%s,%s,%s,%s,%s,%s,%s,%s,%s)
+            ON DUPLICATE KEY UPDATE Food_Name=VALUES(Food_Name), Quantity=VALUES(Quantity),
+                Expiry_Date=VALUES(Expiry_Date), Provider_ID=VALUES(Provider_ID), Provider_Type=VALUES(Provider_Type),
+                Location=VALUES(Location), Food_Type=VALUES(Food_Type), Meal_Type=VALUES(Meal_Type)
+        """, (fid, fname, qty, exp, pid, ptype, loc, ftype, mtype),
+           **sharding.route("food_listings", "Food_ID", fid, loc)), "Upserted.")
+    if c2.button("Delete Food", key="btn_delete_food"):
+        save("listing", lambda: write("DELETE FROM food_listings WHERE Food_ID=%s", (fid,),
+                                      **sharding.route("food_listings", "Food_ID", fid)),
+             "Deleted (if existed).", "warning")
+
+@st.fragment
+def crud_claims():
+    import claim_events
+    import sharding
+    begin_interaction()
+    st.markdown("**Add / Update Claim**")
+    st.caption("Tip: leave Claim_ID as 0 to create a NEW claim. Any positive Claim_ID will UPDATE that claim.")
+    cid    = st.number_input("Claim_ID (0 = create new)", step=1, min_value=0, value=0, key="cl_cid")
+    fid    = st.number_input("Food_ID", step=1, min_value=0, key="cl_fid")
+    rid    = st.number_input("Receiver_ID", step=1, min_value=0, key="cl_rid")
+    status = st.selectbox("Status", ["Pending", "Completed", "Cancelled"], key="cl_status")
+    c1, c2 = st.columns(2)
+    if c1.button("Save Claim", key="btn_save_claim"):
+        try:
+            if cid == 0:
+                new_id = claim_queue(fid).create(fid, rid, status)
+                note_write()
+                invalidate()
+                msg = f"New claim created with Claim_ID {new_id}."
+            else:
+                with transaction(**sharding.claim_route(cid, fid)) as cur:
+                    found = claim_events.update_claim(cur, cid, fid, rid, status)
+                invalidate()
+                msg = f"Claim {cid} updated." if found else f"Claim {cid} not found."
+        except TimeoutError:
+            claim_pending()
+        except mysql.connector.Error as e:
+            st.error(f"Could not save claim: {e}")
+        else:
+            flash(msg)
+    if c2.button("Delete Claim", key="btn_delete_claim"):
+        if cid == 0:
+            st.warning("Enter a Claim_ID > 0 to delete.")
+        else:
+            save("claim", lambda: delete_claim(cid), f"Claim {cid} deleted (if it existed).", "warning")
+
+def delete_claim(cid):
+    import claim_events
+    import sharding
+    with transaction(**sharding.route("claims", "Claim_ID", cid)) as cur:
+        claim_events.delete_claim(cur, cid)
+    invalidate()
+
+CRUD_FORMS = {
+    "providers": crud_providers,
+    "receivers": crud_receivers,
+    "food_listings": crud_food_listings,
+    "claims": crud_claims,
+}
+
+@st.fragment
+def crud_preview(table):
+    from sharding import Merge
+    begin_interaction()
+    st.markdown("**Preview Table**")
+    st.dataframe(memo_q_df(f"SELECT * FROM {table} LIMIT 200", merge=Merge(limit=200)),
+                 use_container_width=True, key=f"crud_preview_{table}")
+    st.caption("Export covers the whole table, not just the 200-row preview.")
+    export_controls(f"SELECT * FROM {table}", key=f"crud_{table}")
+    query_badge("preview")
+
+@st.fragment
+def report_contacts_by_city(title, sql):
+    begin_interaction()
+    city_for_q4 = st.text_input("For Query 4 (contacts by city), type a city exactly as in DB:", "", key="q4_city")
+    if not city_for_q4:
+        st.info("Enter a city above to run this query.")
+        return
+    df = memo_q_df(sql, (city_for_q4,), city=city_for_q4)
+    st.dataframe(df, use_container_width=True, key=f"report_{title[:2]}")
+    st.caption(f"SQL: {sql.strip()[:200]}{'...' if len(sql.strip())>200 else ''}")
+    export_controls(sql, (city_for_q4,), key=f"report_{title.split('.')[0]}", city=city_for_q4)
+    query_badge("query 4")
+
+@st.fragment
+def drill_view(cube):
+    from cube import DIMS, MEASURES
+    begin_interaction()
+    measure = st.selectbox("Measure", MEASURES, index=MEASURES.index("Quantity"), key="drill_measure")
+    path = st.multiselect("Drill path", DIMS, default=["Location", "Food_Type", "Meal_Type"], key="drill_path")
+
+    # walk the path: each picked value slices the cube, the first "All" is the level we chart
+    filters, level = {}, None
+    cols = st.columns(max(len(path), 1))
+    for col, dim in zip(cols, path):
+        pick = col.selectbox(dim, ["All"] + cube.members(dim, filters), key=f"drill_{dim}")
+        if pick == "All":
+            level = dim
+            break
+        filters[dim] = pick
+
+    if level:
+        df = cube.query([level], filters).sort_values(measure, ascending=False)
+        df["Fill_Rate_%"] = (100 * df["Completed"] / df["Claims"].where(df["Claims"] > 0)).round(1)
+        st.bar_chart(df.head(30).set_index(level)[measure])
+        st.dataframe(df, use_container_width=True, key="drill_table")
+    else:
+        st.dataframe(cube.query((), filters), use_container_width=True, key="drill_total")
+
+    st.markdown("**By month**")
+    st.line_chart(cube.query(["Month"], filters).sort_values("Month").set_index("Month")[[measure]])
+    query_badge("drill-down, served from the cube")
+
+# ------------------------------------------------------------
+# UI
+# ------------------------------------------------------------
+warmup = warm_up()
+
+st.title("Local Food Wastage Management System")
+page = st.sidebar.radio("Go to", ["Browse & Filter", "CRUD", "Reports & Insights", "Drill-down"], key="nav_radio")
+if not warmup.ready:
+    st.sidebar.caption("⏳ warming up (DB pool, caches)…")
+if "_flash" in st.session_state:
+    kind, msg = st.session_state.pop("_flash")
+    getattr(st, kind)(msg)
+
+# every page reads the app's tables, which a fresh database only has once the schema task has run:
+# the shell above is painted regardless, the page waits in schema_pending()
+if not warmup.wait("schema", timeout=0):
+    schema_pending()
+
+# ==================== BROWSE & FILTER ====================
+elif page == "Browse & Filter":
+    st.subheader("Filter food donations")
+
+    browse_results()
+    contact_provider()
+    contact_lookup()
+    st.divider()
+    quick_claim()
 
 # ==================== CRUD ====================
 elif page == "CRUD":
+    from queries import CRUD_TABLES
     st.subheader("Create / Update / Delete records")
-    table = st.selectbox("Choose table", ["providers", "receivers", "food_listings", "claims"], key="crud_table")
-
-    if table == "providers":
-        st.markdown("**Add / Update Provider**")
-        pid     = st.number_input("Provider_ID", step=1, min_value=0, key="prov_pid")
-        name    = st.text_input("Name", key="prov_name")
-        typ     = st.text_input("Type", key="prov_type")
-        addr    = st.text_input("Address", key="prov_addr")
-        city    = st.text_input("City", key="prov_city")
-        contact = st.text_input("Contact", key="prov_contact")
-        c1, c2 = st.columns(2)
-        if c1.button("Upsert Provider", key="btn_upsert_provider"):
-            run_exec("""
-                INSERT INTO providers(Provider_ID,Name,Type,Address,City,Contact)
-                VALUES(%s,%s,%s,%s,%s,%s)
-                ON DUPLICATE KEY UPDATE Name=VALUES(Name), Type=VALUES(Type),
-                                         Address=VALUES(Address), City=VALUES(City), Contact=VALUES(Contact)
-            """, (pid, name, typ, addr, city, contact))
-            st.success("Upserted.")
-        if c2.button("Delete Provider", key="btn_delete_provider"):
-            run_exec("DELETE FROM providers WHERE Provider_ID=%s", (pid,))
-            st.warning("Deleted (if existed).")
-
-    if table == "receivers":
-        st.markdown("**Add / Update Receiver**")
-        rid     = st.number_input("Receiver_ID", step=1, min_value=0, key="rec_rid")
-        name    = st.text_input("Name", key="rec_name")
-        typ     = st.text_input("Type", key="rec_type")
-        city    = st.text_input("City", key="rec_city")
-        contact = st.text_input("Contact", key="rec_contact")
-        c1, c2 = st.columns(2)
-        if c1.button("Upsert Receiver", key="btn_upsert_receiver"):
-            run_exec("""
-                INSERT INTO receivers(Receiver_ID,Name,Type,City,Contact)
-                VALUES(%s,%s,%s,%s,%s)
-                ON DUPLICATE KEY UPDATE Name=VALUES(Name), Type=VALUES(Type),
-                                         City=VALUES(City), Contact=VALUES(Contact)
-            """, (rid, name, typ, city, contact))
-            st.success("Upserted.")
-        if c2.button("Delete Receiver", key="btn_delete_receiver"):
-            run_exec("DELETE FROM receivers WHERE Receiver_ID=%s", (rid,))
-            st.warning("Deleted (if existed).")
-
-    if table == "food_listings":
-        st.markdown("**Add / Update Food Listing**")
-        fid   = st.number_input("Food_ID", step=1, min_value=0, key="fl_fid")
-        fname = st.text_input("Food_Name", key="fl_fname")
-        qty   = st.number_input("Quantity", step=1, min_value=0, key="fl_qty")
-        exp   = st.date_input("Expiry_Date", key="fl_exp")
-        pid   = st.number_input("Provider_ID", step=1, min_value=0, key="fl_pid")
-        ptype = st.text_input("Provider_Type", key="fl_ptype")
-        loc   = st.text_input("Location", key="fl_loc")
-        ftype = st.text_input("Food_Type", key="fl_ftype")
-        mtype = st.text_input("Meal_Type", key="fl_mtype")
-        c1, c2 = st.columns(2)
-        if c1.button("Upsert Food", key="btn_upsert_food"):
-            run_exec("""
-                INSERT INTO food_listings(Food_ID,Food_Name,Quantity,Expiry_Date,Provider_ID,Provider_Type,Location,Food_Type,Meal_Type)
-                VALUES(%s,%s,%s,%s,%s,%s,%s,%s,%s)
-                ON DUPLICATE KEY UPDATE Food_Name=VALUES(Food_Name), Quantity=VALUES(Quantity),
-                    Expiry_Date=VALUES(Expiry_Date), Provider_ID=VALUES(Provider_ID), Provider_Type=VALUES(Provider_Type),
-                    Location=VALUES(Location), Food_Type=VALUES(Food_Type), Meal_Type=VALUES(Meal_Type)
-            """, (fid, fname, qty, exp, pid, ptype, loc, ftype, mtype))
-            st.success("Upserted.")
-        if c2.button("Delete Food", key="btn_delete_food"):
-            run_exec("DELETE FROM food_listings WHERE Food_ID=%s", (fid,))
-            st.warning("Deleted (if existed).")
-
-    if table == "claims":
-        st.markdown("**Add / Update Claim**")
-        st.caption("Tip: leave Claim_ID as 0 to create a NEW claim. Any positive Claim_ID will UPDATE that claim.")
-        cid    = st.number_input("Claim_ID (0 = create new)", step=1, min_value=0, value=0, key="cl_cid")
-        fid    = st.number_input("Food_ID", step=1, min_value=0, key="cl_fid")
-        rid    = st.number_input("Receiver_ID", step=1, min_value=0, key="cl_rid")
-        status = st.selectbox("Status", ["Pending", "Completed", "Cancelled"], key="cl_status")
-        c1, c2 = st.columns(2)
-        if c1.button("Save Claim", key="btn_save_claim"):
-            try:
-                if cid == 0:
-                    new_id = next_claim_id()
-                    run_exec(
-                        "INSERT INTO claims(Claim_ID, Food_ID, Receiver_ID, Status, Timestamp) VALUES (%s,%s,%s,%s,NOW())",
-                        (new_id, fid, rid, status),
-                    )
-                    st.success(f"New claim created with Claim_ID {new_id}.")
-                else:
-                    run_exec(
-                        "UPDATE claims SET Food_ID=%s, Receiver_ID=%s, Status=%s, Timestamp=NOW() WHERE Claim_ID=%s",
-                        (fid, rid, status, cid),
-                    )
-                    st.success(f"Claim {cid} updated.")
-            except mysql.connector.Error as e:
-                st.error(f"Could not save claim: {e}")
-        if c2.button("Delete Claim", key="btn_delete_claim"):
-            if cid == 0:
-                st.warning("Enter a Claim_ID > 0 to delete.")
-            else:
-                run_exec("DELETE FROM claims WHERE Claim_ID=%s", (cid,))
-                st.warning(f"Claim {cid} deleted (if it existed).")
+    table = st.selectbox("Choose table", CRUD_TABLES, key="crud_table")
+
+    CRUD_FORMS[table]()
 
     st.divider()
-    st.markdown("**Preview Table**")
-    st.dataframe(run_q_df(f"SELECT * FROM {table} LIMIT 200"), use_container_width=True, key=f"crud_preview_{table}")
+    crud_preview(table)
 
 # ==================== REPORTS & INSIGHTS ====================
 elif page == "Reports & Insights":
+    from queries import QUERIES, SHARDED
     st.subheader("SQL-powered insights (15 queries)")
 
-    QUERIES = {
-        "1. Providers per city":
-            "SELECT city, COUNT(provider_id) AS no_of_food_providers FROM providers GROUP BY city ORDER BY 2 DESC;",
-        "2. Receivers per city":
-            "SELECT city, COUNT(receiver_id) AS no_of_receivers FROM receivers GROUP BY city ORDER BY 2 DESC;",
-        "3. Top provider types by quantity":
-            "SELECT provider_type, SUM(quantity) AS total_quantity FROM food_listings GROUP BY 1 ORDER BY 2 DESC;",
-        "4. Provider contacts in a city (enter city below)":
-            "SELECT name, type, address, city, contact FROM providers WHERE city = %s ORDER BY name;",
-        "5. Top receivers by successful claims":
-            "SELECT r.receiver_id, r.name, COUNT(*) AS successful_claims FROM claims c INNER JOIN receivers r ON r.receiver_id=c.receiver_id WHERE status='Completed' GROUP BY 1,2 ORDER BY 3 DESC;",
-        "6. Total quantity available":
-            "SELECT SUM(quantity) AS total_quantity_available FROM food_listings;",
-        "7. Listings count by city":
-            "SELECT location AS city, COUNT(*) AS listings_count FROM food_listings GROUP BY 1 ORDER BY 2 DESC;",
-        "8. Most common food types":
-            "SELECT food_type, COUNT(*) AS occurrences FROM food_listings GROUP BY 1 ORDER BY 2 DESC;",
-        "9. Claims per food item":
-            "SELECT fl.food_id, fl.food_name, COUNT(c.claim_id) AS claims_count FROM food_listings fl LEFT JOIN claims c ON c.food_id=fl.food_id GROUP BY 1,2 ORDER BY 3 DESC;",
-        "10. Provider with most completed claims":
-            "SELECT p.provider_id, p.name, COUNT(*) AS successful_claims FROM claims c JOIN food_listings fl ON fl.food_id=c.food_id JOIN providers p ON p.provider_id=fl.provider_id WHERE status='Completed' GROUP BY 1,2 ORDER BY 3 DESC;",
-        "11. Claims status % split":
-            "SELECT status, ROUND(COUNT(*)*100.0/(SELECT COUNT(*) FROM claims),2) AS percentage FROM claims GROUP BY 1;",
-        "12. Avg quantity claimed per receiver":
-            """
-            WITH successful_claims AS (
-              SELECT receiver_id, food_id FROM claims WHERE status='Completed'
-            )
-            SELECT r.receiver_id, r.name, ROUND(AVG(fl.quantity),2) AS avg_quantity_claimed
-            FROM successful_claims sc
-            JOIN receivers r ON r.receiver_id=sc.receiver_id
-            JOIN food_listings fl ON fl.food_id=sc.food_id
-            GROUP BY 1,2 ORDER BY 3 DESC;
-            """,
-        "13. Most-claimed meal types":
-            "SELECT fl.meal_type, COUNT(*) AS successful_claims FROM claims c JOIN food_listings fl ON fl.food_id=c.food_id WHERE status='Completed' GROUP BY 1 ORDER BY 2 DESC;",
-        "14. Total quantity donated by provider":
-            "SELECT p.provider_id, p.name, SUM(fl.quantity) AS total_qty_donated FROM food_listings fl INNER JOIN providers p ON p.provider_id=fl.provider_id GROUP BY 1,2 ORDER BY 3 DESC;",
-        "15. Highest demand locations (completed claims)":
-            "SELECT fl.Location, COUNT(*) AS completed_claims FROM claims c JOIN food_listings fl ON fl.food_id=c.food_id WHERE c.Status='Completed' GROUP BY fl.Location ORDER BY 2 DESC;",
-        "16. Monthly claim trend (count)":
-            "SELECT DATE_FORMAT(Timestamp, '%Y-%m') AS month, COUNT(*) AS claims FROM claims GROUP BY 1 ORDER BY 1;"
-    }
-
-    city_for_q4 = st.text_input("For Query 4 (contacts by city), type a city exactly as in DB:", "", key="q4_city")
-
     for title, sql in QUERIES.items():
         st.markdown(f"**{title}**")
-        if title.startswith("4.") and city_for_q4:
-            df = run_q_df(sql, (city_for_q4,))
-        elif title.startswith("4.") and not city_for_q4:
-            st.info("Enter a city above to run this query.")
+        if title.startswith("4."):
+            report_contacts_by_city(title, sql)
             continue
-        else:
-            df = run_q_df(sql)
+        route = {}
+        if sharded():  # per-shard SQL, merged (see queries.SHARDED)
+            sql, route["merge"] = SHARDED[title]
+        df = memo_q_df(sql, **route)
         st.dataframe(df, use_container_width=True, key=f"report_{title[:2]}")
         st.caption(f"SQL: {sql.strip()[:200]}{'...' if len(sql.strip())>200 else ''}")
+        export_controls(sql, None, key=f"report_{title.split('.')[0]}", **route)
+
+    st.markdown("**Time to completion** (from the claim event log)")
+    ct = catch_up_completion_times()
+    st.dataframe(pd.DataFrame(ct.summary()), use_container_width=True, hide_index=True, key="report_ttc")
+    st.caption(f"Hours from creation to first Completed / Cancelled status · events up to #{ct.offset:,}")
+
+# ==================== DRILL-DOWN ====================
+elif page == "Drill-down":
+    st.subheader("Supply / demand drill-down")
+    st.caption("Listings are bucketed by expiry month, claims by claim month.")
+    cube = supply_cube()
+    c0, c1 = st.columns([4, 1])
+    if c1.button("Rebuild cube", key="btn_cube_rebuild"):
+        with snapshots() as readers:
+            cube.build(readers)     # picks up listing edits
+    else:
+        cube.refresh(event_readers())  # cheap: only claim events after the cube's offset
+    c0.caption(f"{cube.n:,} cells · claim events up to #{cube.offset:,}")
+
+    drill_view(cube)
+
+st.session_state["_full_run"] = False
+st.sidebar.caption(f"⚡ {st.session_state['_q_count']} queries issued on this full run")
+if startup.PROFILE:
+    with st.sidebar.expander("Startup profile"):
+        st.write({name: f"{secs * 1000:.1f} ms" for name, secs in startup.PHASES})
+        st.write(warmup.readiness())
+startup.report()
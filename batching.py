@@ -0,0 +1,117 @@
+# batching.py — adaptive batch sizing + backpressure for bulk upserts
+import time
+import mysql.connector
+
+# errno's worth retrying with a smaller batch:
+# 1205 lock wait timeout, 1213 deadlock, 2006 server gone away,
+# 2013 lost connection during query, 2055 lost connection (ssl/proxy), 1153 packet too large
+RETRYABLE = {1205, 1213, 2006, 2013, 2055, 1153}
+
+def row_bytes(row) -> int:
+    """Rough size of one VALUES(...) tuple once the connector has rendered it."""
+    return 4 + sum(6 if v is None else len(str(v)) + 3 for v in row)
+
+class AdaptiveBatcher:
+    """
+    Hill-climbs the batch size on measured rows/sec.
+    - grows (x1.5) only while throughput keeps improving
+    - holds its size while throughput stays within `tolerance` of the last batch
+    - falls back towards the best size seen when throughput drops further
+    - halves on timeouts / lock waits / dropped connections
+    - never builds a statement bigger than ~80% of max_allowed_packet
+    """
+
+    def __init__(self, start=100, min_size=10, max_size=5000, max_packet=None,
+                 grow=1.5, tolerance=0.95):
+        self.size = start
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_packet = max_packet
+        self.grow = grow
+        self.tolerance = tolerance
+        self.best_rps = 0.0
+        self.best_size = start
+        self.last_rps = 0.0
+        self.avg_row_bytes = None
+        self.batches = 0
+        self.errors = 0
+        self.rows = 0
+        self.seconds = 0.0
+
+    # ---- sizing ----
+    def _packet_cap(self) -> int:
+        if not self.max_packet or not self.avg_row_bytes:
+            return self.max_size
+        return max(self.min_size, int(self.max_packet * 0.8 / self.avg_row_bytes))
+
+    def next_size(self) -> int:
+        return max(self.min_size, min(self.size, self.max_size, self._packet_cap()))
+
+    # ---- feedback ----
+    def record(self, n_rows: int, seconds: float, nbytes: int):
+        """Feed back one successful batch (nbytes = size of its VALUES rows)."""
+        self.batches += 1
+        self.rows += n_rows
+        self.seconds += seconds
+        per_row = nbytes / max(n_rows, 1)
+        self.avg_row_bytes = per_row if self.avg_row_bytes is None else 0.8 * self.avg_row_bytes + 0.2 * per_row
+
+        rps = n_rows / max(seconds, 1e-6)
+        if rps >= self.best_rps:
+            self.best_rps, self.best_size = rps, n_rows
+        if rps > self.last_rps:
+            self.size = int(self.size * self.grow) + 1
+        elif rps >= self.last_rps * self.tolerance:
+            pass  # about the same (noise): keep the size
+        else:
+            # got slower: step back towards the best size we've seen
+            self.size = max(self.min_size, (self.size + self.best_size) // 2)
+        self.last_rps = rps
+        self.size = min(self.size, self.max_size, self._packet_cap())
+
+    def backoff(self):
+        """Feed back a failed batch (timeout, lock wait, lost connection)."""
+        self.errors += 1
+        self.size = max(self.min_size, self.size // 2)
+        self.best_size = min(self.best_size, self.size)
+        self.last_rps = 0.0
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    @property
+    def error_rate(self) -> float:
+        total = self.batches + self.errors
+        return self.errors / total if total else 0.0
+
+def load_batched(sql, rows, exec_fn, batcher, on_progress=None, max_retries=5, retry_sleep=0.5):
+    """
+    Send `rows` through exec_fn(sql, chunk) in chunks sized by `batcher`.
+    A retryable failure shrinks the batch and retries the same rows;
+    anything else (or too many retries in a row) is raised.
+    on_progress(done, total, batch_size, rows_per_sec) is called after each batch.
+    """
+    total = len(rows)
+    done = 0
+    retries = 0
+    while done < total:
+        n = batcher.next_size()
+        chunk = rows[done:done + n]
+        nbytes = sum(row_bytes(r) for r in chunk)
+        t0 = time.perf_counter()
+        try:
+            exec_fn(sql, chunk)
+        except mysql.connector.Error as e:
+            if e.errno not in RETRYABLE or retries >= max_retries:
+                raise
+            retries += 1
+            batcher.backoff()
+            time.sleep(retry_sleep * retries)
+            continue
+        retries = 0
+        batcher.record(len(chunk), time.perf_counter() - t0, nbytes)
+        done += len(chunk)
+        if on_progress:
+            on_progress(done, total, len(chunk), batcher.rows_per_sec)
+    return batcher
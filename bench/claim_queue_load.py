@@ -0,0 +1,151 @@
+# bench/claim_queue_load.py — claims/sec and commit count: per-click INSERTs vs the group-commit queue
+#
+#   python -m bench.claim_queue_load --submitters 200 --per-submitter 5
+#   python -m bench.claim_queue_load --mode queue --window-ms 5
+#
+# Run against a LOCAL scratch database (it inserts real claims; --cleanup removes them).
+import argparse
+import json
+import statistics
+import threading
+import time
+
+import mysql.connector
+
+from claim_queue import ClaimWriteQueue
+from db import _Pool, _checkout, _cfg, allocate_ids, connect, reserve_ids
+
+def _status(conn, name):
+    cur = conn.cursor()
+    cur.execute("SHOW GLOBAL STATUS LIKE %s", (name,))
+    row = cur.fetchone()
+    cur.close()
+    return int(row[1]) if row else 0
+
+def _max_claim(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT COALESCE(MAX(Claim_ID), 0) FROM claims")
+    v = int(cur.fetchone()[0])
+    cur.close()
+    conn.commit()
+    return v
+
+POOL_SIZE = 6  # same as db._pool()
+
+def _baseline_worker(pool, n, latencies, errors, start):
+    """What the page did per click: pool checkout + ping, MAX()+1, INSERT, COMMIT."""
+    start.wait()
+    for _ in range(n):
+        t0 = time.perf_counter()
+        try:
+            conn = _checkout(pool)  # waits for a free slot like db.get_conn()
+            try:
+                for _ in range(20):  # racing MAX()+1 collides; retry like a user would
+                    cur = conn.cursor()
+                    try:
+                        cur.execute("SELECT COALESCE(MAX(Claim_ID)+1,1) FROM claims")
+                        cid = int(cur.fetchone()[0])
+                        cur.execute(
+                            "INSERT INTO claims(Claim_ID, Food_ID, Receiver_ID, Status, Timestamp) VALUES (%s,%s,%s,%s,NOW())",
+                            (cid, 1, 1, "Pending"),
+                        )
+                        conn.commit()
+                        break
+                    except mysql.connector.IntegrityError:
+                        conn.rollback()
+                    finally:
+                        cur.close()
+                else:
+                    raise RuntimeError("gave up after 20 duplicate-key retries")
+            finally:
+                conn.close()  # back to the pool
+            latencies.append(time.perf_counter() - t0)
+        except Exception:
+            errors.append(1)
+
+def _queue_worker(q, n, latencies, errors, start):
+    start.wait()
+    for _ in range(n):
+        t0 = time.perf_counter()
+        try:
+            q.create(1, 1, "Pending", timeout=30)
+            latencies.append(time.perf_counter() - t0)
+        except Exception:
+            errors.append(1)
+
+def run(mode, submitters, per_submitter, window_ms=10, max_batch=200):
+    admin = connect()
+    first_id = _max_claim(admin) + 1
+    commits0 = _status(admin, "Com_commit")
+
+    latencies, errors = [], []
+    start = threading.Event()
+    reserve_ids("claims", first_id - 1)  # the baseline's MAX()+1 rows are outside the sequence
+    q = ClaimWriteQueue(connect, lambda n: allocate_ids("claims", n), window_ms=window_ms,
+                        max_batch=max_batch) if mode == "queue" else None
+    if q:
+        target, args = _queue_worker, (q,)
+    else:
+        pool = _Pool(pool_name="bench_baseline", pool_size=POOL_SIZE, **_cfg())  # as db._pool()
+        target, args = _baseline_worker, (pool,)
+    threads = [
+        threading.Thread(target=target, args=(*args, per_submitter, latencies, errors, start))
+        for _ in range(submitters)
+    ]
+    for t in threads:
+        t.start()
+    t0 = time.perf_counter()
+    start.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    if q:
+        q.close()
+
+    commits = _status(admin, "Com_commit") - commits0
+    lat = sorted(latencies)
+    result = {
+        "mode": mode,
+        "submitters": submitters,
+        "claims": len(lat),
+        "errors": len(errors),
+        "seconds": round(elapsed, 3),
+        "claims_per_sec": round(len(lat) / elapsed, 1) if elapsed else 0.0,
+        "commits": commits,
+        "claims_per_commit": round(len(lat) / commits, 1) if commits else None,
+        "p50_ms": round(statistics.median(lat) * 1000, 2) if lat else None,
+        "p99_ms": round(lat[int(len(lat) * 0.99) - 1] * 1000, 2) if lat else None,
+        "first_claim_id": first_id,
+    }
+    admin.close()
+    return result
+
+def cleanup(first_id):
+    conn = connect()
+    cur = conn.cursor()
+    cur.execute("DELETE FROM claims WHERE Claim_ID >= %s", (first_id,))
+    conn.commit()
+    cur.close()
+    conn.close()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Load-test claim creation: per-click INSERTs vs group commit.")
+    ap.add_argument("--mode", choices=["both", "baseline", "queue"], default="both")
+    ap.add_argument("--submitters", type=int, default=200)
+    ap.add_argument("--per-submitter", type=int, default=5)
+    ap.add_argument("--window-ms", type=int, default=10)
+    ap.add_argument("--max-batch", type=int, default=200)
+    ap.add_argument("--cleanup", action="store_true", help="delete the claims this run inserted")
+    args = ap.parse_args(argv)
+
+    modes = ["baseline", "queue"] if args.mode == "both" else [args.mode]
+    results = []
+    for m in modes:
+        r = run(m, args.submitters, args.per_submitter, args.window_ms, args.max_batch)
+        results.append(r)
+        if args.cleanup:
+            cleanup(r["first_claim_id"])
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+# bench/load_sessions.py — concurrent-session load test for app.py using Streamlit's AppTest
+#
+#   python -m bench.load_sessions --levels 1,5,10,20 --duration 30 --label main
+#   python -m bench.load_sessions --compare bench/results/main-*.json bench/results/pr-*.json
+#
+# Every simulated session is one AppTest in its own (spawned) process: AppTest keeps a process-global
+# Runtime, so instances can't safely share a process. Sessions therefore don't share st.cache_resource /
+# st.cache_data — each behaves like a one-user app instance, all against the same database — which makes
+# this a DB / pool load test; per-process cache hits are lower than on one busy server.
+# Run it against a LOCAL database loaded with bulk_load.py: Quick claim and CRUD actions write rows.
+# Scratch providers written by crud_upsert are deleted when the run ends.
+import argparse
+import json
+import multiprocessing as mp
+import os
+import random
+import statistics
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+SCRATCH_IDS = (900_000, 999_999)  # provider IDs crud_upsert writes, away from the sample data
+SCRATCH_CITY = "Loadville"
+START_TIMEOUT = 120  # seconds to wait for every session process to import the app and do its first run
+
+# realistic-ish mix: mostly browsing, some lookups, few writes
+MIX = {"browse_filter": 40, "contact_lookup": 25, "report_view": 15, "quick_claim": 12, "crud_upsert": 8}
+
+# ---------- actions ----------
+# prepare(at) puts the session on the action's page (untimed); the action is one timed AppTest.run(),
+# i.e. one user interaction.
+def _goto(at, page):
+    if at.sidebar.radio(key="nav_radio").value != page:
+        at.sidebar.radio(key="nav_radio").set_value(page).run()
+
+def _on_providers(at):
+    _goto(at, "CRUD")
+    if at.selectbox(key="crud_table").value != "providers":
+        at.selectbox(key="crud_table").set_value("providers").run()
+
+def browse_filter(at, rng):
+    box = at.selectbox(key="filter_loc")
+    box.set_value(rng.choice(box.options)).run()
+
+def contact_lookup(at, rng):
+    at.number_input(key="bf_selected_id").set_value(rng.randint(1, 1000))
+    at.button(key="btn_show_contact").click().run()
+
+def quick_claim(at, rng):
+    at.number_input(key="claim_fid").set_value(rng.randint(1, 1000))
+    at.number_input(key="claim_rid").set_value(rng.randint(1, 1000))
+    at.button(key="btn_create_claim").click().run()
+
+def crud_upsert(at, rng):
+    pid = rng.randint(*SCRATCH_IDS)
+    at.number_input(key="prov_pid").set_value(pid)
+    at.text_input(key="prov_name").input(f"Load test {pid}")
+    at.text_input(key="prov_city").input(SCRATCH_CITY)
+    at.text_input(key="prov_contact").input(f"+1-555-{pid % 10_000:04d}")
+    at.button(key="btn_upsert_provider").click().run()
+
+def report_view(at, rng):
+    at.sidebar.radio(key="nav_radio").set_value("Reports & Insights").run()  # a full Reports page render
+
+ACTIONS = {f.__name__: f for f in (browse_filter, contact_lookup, report_view, quick_claim, crud_upsert)}
+PREPARE = {
+    "browse_filter": lambda at: _goto(at, "Browse & Filter"),
+    "contact_lookup": lambda at: _goto(at, "Browse & Filter"),
+    "quick_claim": lambda at: _goto(at, "Browse & Filter"),
+    "crud_upsert": _on_providers,
+    "report_view": lambda at: _goto(at, "CRUD"),  # leave Reports so the timed run renders it afresh
+}
+
+# ---------- driver ----------
+def _error(at):
+    if at.exception:
+        return at.exception[0].value
+    if at.error:
+        return at.error[0].value
+    return None
+
+def _session(seed, duration, timeout, start):
+    """One simulated session (runs in its own process); returns (samples, pool waits in s)."""
+    from streamlit.testing.v1 import AppTest
+    import db
+
+    rng = random.Random(seed)
+    names, weights = zip(*MIX.items())
+    samples = []
+    try:
+        at = AppTest.from_file(APP, default_timeout=timeout)
+        at.run()
+    except Exception as e:
+        samples.append(("session_start", 0.0, f"{type(e).__name__}: {e}"))
+        at = None
+    try:
+        start.wait(START_TIMEOUT)  # every session starts its clock together, after the cold first run
+    except threading.BrokenBarrierError:
+        pass  # a sibling never got going; run anyway, its own session_start error is recorded
+    if at is None:
+        return samples, []
+    db.POOL_WAITS.clear()
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        name = rng.choices(names, weights)[0]
+        try:
+            PREPARE[name](at)
+        except Exception as e:
+            samples.append((name, 0.0, f"prepare: {type(e).__name__}: {e}"))
+            continue
+        t0 = time.perf_counter()
+        err = None
+        try:
+            ACTIONS[name](at, rng)
+            err = _error(at)
+        except Exception as e:
+            err = f"{type(e).__name__}: {e}"
+        samples.append((name, time.perf_counter() - t0, err))
+    return samples, list(db.POOL_WAITS)
+
+def _pct(xs, p):
+    if not xs:
+        return None
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(p / 100 * (len(xs) - 1))))]
+
+def _summarize(samples, seconds):
+    by = defaultdict(list)
+    for name, lat, err in samples:
+        by[name].append((lat, err))
+    out = {}
+    for name, rows in sorted(by.items()):
+        lats = [lat * 1000 for lat, err in rows if err is None]
+        out[name] = {
+            "count": len(rows),
+            "errors": sum(1 for _, err in rows if err is not None),
+            "error_rate": round(sum(1 for _, err in rows if err is not None) / len(rows), 4),
+            "p50_ms": _round(_pct(lats, 50)),
+            "p95_ms": _round(_pct(lats, 95)),
+            "p99_ms": _round(_pct(lats, 99)),
+            "per_sec": round(len(rows) / seconds, 2),
+            "sample_error": next((err for _, err in rows if err is not None), None),
+        }
+    return out
+
+def _round(v):
+    return None if v is None else round(v, 1)
+
+def run_level(n, duration, timeout):
+    ctx = mp.get_context("spawn")  # a clean interpreter (and Streamlit runtime) per session
+    with ctx.Manager() as manager, ProcessPoolExecutor(max_workers=n, mp_context=ctx) as pool:
+        start = manager.Barrier(n)
+        futures = [pool.submit(_session, i, duration, timeout, start) for i in range(n)]
+        samples, waits = [], []
+        for f in futures:
+            s, w = f.result()
+            samples.extend(s)
+            waits.extend(x * 1000 for x in w)
+    seconds = duration  # every session is measured for `duration` from the shared start
+    total = len([s for s in samples if s[0] != "session_start"])
+    return {
+        "sessions": n,
+        "seconds": round(seconds, 2),
+        "interactions": total,
+        "throughput_per_sec": round(total / seconds, 2),
+        "error_rate": round(sum(1 for s in samples if s[2] is not None) / max(len(samples), 1), 4),
+        "pool_wait_ms": {
+            "checkouts": len(waits),
+            "mean": _round(statistics.fmean(waits)) if waits else None,
+            "p95": _round(_pct(waits, 95)),
+            "p99": _round(_pct(waits, 99)),
+        },
+        "actions": _summarize(samples, seconds),
+    }
+
+def cleanup():
+    """Delete the scratch providers crud_upsert wrote."""
+    import db
+    db.run_exec("DELETE FROM providers WHERE Provider_ID BETWEEN %s AND %s AND City = %s",
+                (*SCRATCH_IDS, SCRATCH_CITY), city=SCRATCH_CITY)
+
+def compare(paths):
+    runs = []
+    for p in paths:
+        with open(p) as f:
+            runs.append(json.load(f))
+    print(f"{'sessions':>8} " + " ".join(f"{r['label'][:18]:>34}" for r in runs))
+    levels = sorted({lvl["sessions"] for r in runs for lvl in r["levels"]})
+    for n in levels:
+        cells = []
+        for r in runs:
+            lvl = next((x for x in r["levels"] if x["sessions"] == n), None)
+            if lvl is None:
+                cells.append(f"{'-':>34}")
+                continue
+            p95 = max((a["p95_ms"] or 0) for a in lvl["actions"].values()) if lvl["actions"] else 0
+            cells.append(f"{lvl['throughput_per_sec']:>8.1f}/s p95max {p95:>8.0f}ms err {lvl['error_rate']:>5.1%}")
+        print(f"{n:>8} " + " ".join(cells))
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Concurrent-session load test for the Streamlit app.")
+    ap.add_argument("--levels", default="1,5,10,20", help="comma-separated session counts")
+    ap.add_argument("--duration", type=float, default=30, help="seconds per concurrency level")
+    ap.add_argument("--timeout", type=float, default=30, help="AppTest per-run timeout (s)")
+    ap.add_argument("--label", default="run", help="name for this build in the results file")
+    ap.add_argument("--compare", nargs="+", metavar="RESULT_JSON", help="print saved runs side by side and exit")
+    args = ap.parse_args(argv)
+
+    if args.compare:
+        compare(args.compare)
+        return
+
+    result = {"label": args.label, "started": time.strftime("%Y-%m-%dT%H:%M:%S"), "mix": MIX, "levels": []}
+    try:
+        for n in (int(x) for x in args.levels.split(",")):
+            lvl = run_level(n, args.duration, args.timeout)
+            result["levels"].append(lvl)
+            print(f"{n:>4} sessions: {lvl['throughput_per_sec']:.1f} interactions/s, "
+                  f"errors {lvl['error_rate']:.1%}, pool wait p95 {lvl['pool_wait_ms']['p95']} ms")
+    finally:
+        cleanup()
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{args.label}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2, default=str)
+    print(f"saved {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# bench/prepared_stmts.py — per-call latency and server CPU of the hot statements: text vs prepared
+#
+#   python -m bench.prepared_stmts --iterations 2000
+#   python -m bench.prepared_stmts --iterations 500 --writes     # also the provider upsert (scratch IDs)
+#
+# Each mode runs on its own fresh connection; server-side cost is read from performance_schema
+# for that connection's thread only (CPU_TIME needs MySQL 8.0.28+, otherwise it is reported as null).
+import argparse
+import json
+import os
+import random
+import statistics
+import time
+
+import db
+from ingest import UPSERT_SQL
+from queries import browse_sql
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+SCRATCH_ID = 900_000  # provider IDs used by --writes, deleted afterwards
+
+def _statements(conn, writes):
+    rows = db._fetch(conn, "SELECT DISTINCT Location FROM food_listings", None)
+    locs = [r["Location"] for r in rows] or ["(none)"]
+    ids = [r["Food_ID"] for r in db._fetch(conn, "SELECT Food_ID FROM food_listings", None)] or [1]
+    browse_all, _ = browse_sql()
+    browse_loc, _ = browse_sql(loc="any")  # SQL shape only; the value comes from make_params
+    stmts = {
+        "browse_all": (browse_all, lambda rng: None),
+        "browse_by_location": (browse_loc, lambda rng: (rng.choice(locs),)),
+        "listing_by_food_id": ("SELECT * FROM food_listings WHERE Food_ID = %s", lambda rng: (rng.choice(ids),)),
+        "filter_locations": ("SELECT DISTINCT Location FROM food_listings ORDER BY 1", lambda rng: None),
+    }
+    if writes:
+        stmts["provider_upsert"] = (UPSERT_SQL["providers"], lambda rng: (
+            SCRATCH_ID + rng.randrange(1000), "Bench provider", "Bench", "1 Bench St", "Benchville",
+            "555-0100", "+15550100", None, None, "phone"))
+    return stmts
+
+def _thread_id(conn):
+    row = db._fetch(conn, "SELECT THREAD_ID FROM performance_schema.threads WHERE PROCESSLIST_ID = CONNECTION_ID()", None)
+    return row[0]["THREAD_ID"] if row else None
+
+def _server_cost(admin, thread_id):
+    """(statement wall time ms, CPU ms or None, statements) accumulated by one server thread."""
+    base = ("FROM performance_schema.events_statements_summary_by_thread_by_event_name "
+            "WHERE THREAD_ID = %s")
+    try:
+        r = db._fetch(admin, f"SELECT SUM(SUM_TIMER_WAIT) AS w, SUM(SUM_CPU_TIME) AS c, SUM(COUNT_STAR) AS n {base}",
+                      (thread_id,))[0]
+    except Exception:  # no CPU_TIME column before 8.0.28
+        r = dict(db._fetch(admin, f"SELECT SUM(SUM_TIMER_WAIT) AS w, SUM(COUNT_STAR) AS n {base}", (thread_id,))[0],
+                 c=None)
+    ps = 1e9  # picoseconds per ms
+    return (float(r["w"] or 0) / ps, None if r["c"] is None else float(r["c"]) / ps, int(r["n"] or 0))
+
+def _pct(xs, p):
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(round(p / 100 * (len(xs) - 1))))]
+
+def run_mode(mode, iterations, writes, seed=1):
+    admin = db.connect()
+    conn = db.connect()
+    try:
+        stmts = _statements(conn, writes)
+        tid = _thread_id(conn)
+        before = _server_cost(admin, tid)
+        rng = random.Random(seed)
+        lat = {name: [] for name in stmts}
+        t_start = time.perf_counter()
+        for _ in range(iterations):
+            for name, (sql, make_params) in stmts.items():
+                params = make_params(rng)
+                t0 = time.perf_counter()
+                if mode == "prepared":
+                    db._run_prepared(conn, sql, params)
+                else:
+                    db._fetch(conn, sql, params)
+                lat[name].append((time.perf_counter() - t0) * 1000)
+            conn.commit()
+        wall = time.perf_counter() - t_start
+        after = _server_cost(admin, tid)
+    finally:
+        conn.close()
+        admin.close()
+    calls = sum(len(v) for v in lat.values())
+    return {
+        "mode": mode,
+        "calls": calls,
+        "seconds": round(wall, 3),
+        "server_ms_per_call": round((after[0] - before[0]) / calls, 4),
+        "server_cpu_ms_per_call": None if after[1] is None else round((after[1] - before[1]) / calls, 4),
+        "server_statements": after[2] - before[2],
+        "statements": {
+            name: {"p50_ms": round(statistics.median(v), 3), "p99_ms": round(_pct(v, 99), 3)}
+            for name, v in lat.items()
+        },
+    }
+
+def cleanup():
+    conn = db.connect()
+    try:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM providers WHERE Provider_ID BETWEEN %s AND %s", (SCRATCH_ID, SCRATCH_ID + 999))
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Text vs server-side prepared statements for the app's hot queries.")
+    ap.add_argument("--iterations", type=int, default=1000, help="rounds over the statement set per mode")
+    ap.add_argument("--writes", action="store_true", help="include the provider upsert (scratch IDs, cleaned up)")
+    ap.add_argument("--label", default="prepared", help="name for the results file")
+    args = ap.parse_args(argv)
+
+    try:
+        results = [run_mode(m, args.iterations, args.writes) for m in ("text", "prepared")]
+    finally:
+        if args.writes:
+            cleanup()
+    results.append({"stmt_cache": dict(db.STMT_STATS)})
+    print(json.dumps(results, indent=2))
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{args.label}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"saved {path}")
+
+if __name__ == "__main__":
+    main()
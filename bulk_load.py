@@ -0,0 +1,248 @@
+# bulk_load.py — headless parallel loader for the four CSVs
+#
+#   python bulk_load.py data/                 # JSON summary on stdout
+#   python bulk_load.py data/ --workers 4 --out load_summary.json
+#
+#   MYSQL_HOST=db MYSQL_USER=app MYSQL_PASSWORD=... MYSQL_DATABASE=food python bulk_load.py data/
+#
+# Credentials come from --host/--port/--user/--database or the matching MYSQL_* env vars, the password from
+# $MYSQL_PASSWORD only (never a flag: it would show in ps and shell history). That path never imports streamlit
+# and creates/migrates the tables first (schema.setup_database), so a fresh database loads. With no host, the
+# [mysql] secrets db.py uses (.streamlit/secrets.toml) are read instead, and with [sharding] enabled each
+# table's rows are split by city and loaded into their shards.
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+
+from batching import AdaptiveBatcher, load_batched
+from claim_events import MAIN
+from ingest import LOAD_STAGES, UPSERT_SQL, parse_csv
+
+CONN_ENV = {"host": "MYSQL_HOST", "port": "MYSQL_PORT", "user": "MYSQL_USER",
+            "password": "MYSQL_PASSWORD", "database": "MYSQL_DATABASE"}
+
+def discover(data_dir: str) -> dict:
+    """Map each table to its CSV, e.g. data/providers_data.csv -> providers."""
+    found = {}
+    for table in UPSERT_SQL:
+        hits = sorted(glob.glob(os.path.join(data_dir, f"*{table}*.csv")))
+        if hits:
+            found[table] = hits[0]
+    return found
+
+def conn_settings(args=None) -> dict | None:
+    """Connection settings from CLI flags, else MYSQL_* env vars (password: env only); None -> use the app's secrets."""
+    cfg = {k: getattr(args, k, None) or os.environ.get(env) for k, env in CONN_ENV.items()}
+    if not cfg["host"]:
+        return None
+    missing = [CONN_ENV[k] for k in ("user", "database") if not cfg[k]]
+    if missing:
+        raise SystemExit(f"bulk_load: set {', '.join(missing)} (or the matching --flags) along with the host")
+    cfg["port"] = int(cfg["port"] or 3306)
+    cfg["password"] = cfg["password"] or ""
+    return {**cfg, "connection_timeout": 10, "charset": "utf8mb4"}
+
+def setup(settings):
+    """Create/migrate the tables and the claim event log on the database named by explicit settings."""
+    import mysql.connector
+    from schema import setup_database
+    conn = mysql.connector.connect(**settings)
+
+    def q(sql, params=None, primary=False):
+        cur = conn.cursor(dictionary=True)
+        try:
+            cur.execute(sql, params or ())
+            return cur.fetchall()
+        finally:
+            cur.close()
+
+    def ex(sql, params=None):
+        cur = conn.cursor()
+        try:
+            if isinstance(params, list):
+                cur.executemany(sql, params)
+            else:
+                cur.execute(sql, params or ())
+            conn.commit()
+        finally:
+            cur.close()
+
+    @contextmanager
+    def tx():
+        conn.start_transaction()
+        cur = conn.cursor(dictionary=True)
+        try:
+            yield cur
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+    try:
+        setup_database(q, ex, tx)
+    finally:
+        conn.close()
+
+def _reserve(settings, name, upto):
+    """db.reserve_ids() on the database named by explicit settings."""
+    import mysql.connector
+    from schema import RESERVE_SQL
+    conn = mysql.connector.connect(**settings)
+    try:
+        cur = conn.cursor()
+        cur.execute(RESERVE_SQL, (name, int(upto)))
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
+
+def _parse(table, path):
+    t0 = time.perf_counter()
+    rows = parse_csv(path, table)
+    return rows, time.perf_counter() - t0
+
+def _conn_exec(conn, table=None):
+    """exec_fn for load_batched on a dedicated connection (one commit per batch)."""
+    import claim_events
+
+    def _exec(sql, chunk):
+        conn.ping(reconnect=True, attempts=3, delay=2)
+        cur = conn.cursor(dictionary=True)
+        try:
+            if table == "claims":
+                claim_events.upsert_rows(cur, sql, chunk)  # events commit with their batch
+            else:
+                cur.executemany(sql, chunk)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+    return _exec
+
+def _load_into(conn, table, rows, start_batch):
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT @@max_allowed_packet")
+        packet = int(cur.fetchone()[0])
+        cur.close()
+        batcher = AdaptiveBatcher(start=start_batch, max_packet=packet)
+        load_batched(UPSERT_SQL[table], rows, _conn_exec(conn, table), batcher)
+    finally:
+        conn.close()
+    return batcher
+
+def _load(table, rows, start_batch, settings=None):
+    t0 = time.perf_counter()
+    if settings:  # explicit settings: one database, plain mysql.connector, no streamlit
+        import mysql.connector
+        connect, sharded = partial(mysql.connector.connect, **settings), False
+    else:
+        # imported lazily so parse workers never touch db/streamlit
+        from db import connect, sharded
+        sharded = sharded()
+    if sharded:  # each shard gets its rows on its own connection (sharding.partition)
+        from db import shard_cfgs
+        from sharding import partition
+        parts = {name: (shard_cfgs()[name], part) for name, part in partition(table, rows).items()}
+    else:
+        parts = {MAIN: ({}, rows)}
+    batchers = [_load_into(connect(**cfg), table, part, start_batch) for cfg, part in parts.values()]
+    if table == "claims" and rows:  # new claims are numbered after the imported ones
+        if settings:
+            _reserve(settings, "claims", max(r[0] for r in rows))
+        else:
+            from db import reserve_ids
+            reserve_ids("claims", max(r[0] for r in rows))
+    seconds = sum(b.seconds for b in batchers)
+    out = {
+        "load_s": round(time.perf_counter() - t0, 3),
+        "rows_per_sec": round(sum(b.rows for b in batchers) / seconds, 1) if seconds else 0.0,
+        "batches": sum(b.batches for b in batchers),
+        "retries": sum(b.errors for b in batchers),
+        "final_batch": batchers[-1].next_size() if batchers else start_batch,
+    }
+    if sharded:
+        out["shards"] = {name: len(part) for name, (_, part) in parts.items()}
+    return out
+
+def run(data_dir, workers=None, start_batch=100, settings=None):
+    t_start = time.perf_counter()
+    files = discover(data_dir)
+    summary = {"data_dir": os.path.abspath(data_dir), "tables": {}, "stages": [], "ok": True}
+    for table in UPSERT_SQL:
+        summary["tables"][table] = {"file": files.get(table), "status": "missing" if table not in files else "pending"}
+    if settings:  # the app's path runs db.ensure_schema() at startup; a bare database needs it here
+        try:
+            setup(settings)
+        except Exception as e:
+            summary.update(ok=False, error=f"schema: {e}", total_s=round(time.perf_counter() - t_start, 3))
+            return summary
+
+    # 1) parse + clean every file at once in a process pool (no ordering needed here)
+    with ProcessPoolExecutor(max_workers=workers) as pp:
+        parsed = {t: pp.submit(_parse, t, p) for t, p in files.items()}
+
+        # 2) load stage by stage; tables inside a stage go in parallel on their own connections
+        with ThreadPoolExecutor(max_workers=max(len(s) for s in LOAD_STAGES)) as tp:
+            for stage in LOAD_STAGES:
+                tables = [t for t in stage if t in files]
+                if not tables:
+                    continue
+                s0 = time.perf_counter()
+                jobs = {}
+                for t in tables:
+                    info = summary["tables"][t]
+                    try:
+                        rows, parse_s = parsed[t].result()
+                    except Exception as e:
+                        info.update(status="error", error=f"parse: {e}")
+                        summary["ok"] = False
+                        continue
+                    info.update(rows=len(rows), parse_s=round(parse_s, 3))
+                    jobs[t] = tp.submit(_load, t, rows, start_batch, settings)
+                for t, fut in jobs.items():
+                    info = summary["tables"][t]
+                    try:
+                        info.update(fut.result(), status="loaded")
+                    except Exception as e:
+                        info.update(status="error", error=f"load: {e}")
+                        summary["ok"] = False
+                summary["stages"].append({"tables": tables, "seconds": round(time.perf_counter() - s0, 3)})
+                if not summary["ok"]:
+                    break  # later stages reference rows this one failed to load
+
+    summary["total_s"] = round(time.perf_counter() - t_start, 3)
+    return summary
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Load providers/receivers/food_listings/claims CSVs into MySQL.")
+    ap.add_argument("data_dir", help="directory holding *providers*.csv, *receivers*.csv, *food_listings*.csv, *claims*.csv")
+    ap.add_argument("--workers", type=int, default=None, help="parse processes (default: CPU count)")
+    ap.add_argument("--batch", type=int, default=100, help="starting batch size (tuned adaptively)")
+    ap.add_argument("--out", help="also write the JSON summary to this file")
+    for key, env in CONN_ENV.items():
+        if key == "password":
+            continue  # $MYSQL_PASSWORD only
+        ap.add_argument(f"--{key}", help=f"MySQL {key} (default: ${env}; without a host, the app's [mysql] secrets)")
+    args = ap.parse_args(argv)
+
+    summary = run(args.data_dir, workers=args.workers, start_batch=args.batch, settings=conn_settings(args))
+    text = json.dumps(summary, indent=2, default=str)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text)
+    return 0 if summary["ok"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+# claim_events.py — append-only claim history + incremental consumers
+#
+# Every claim create / update / delete appends one row to `claim_events` in the SAME transaction
+# as the change, with before and after images (Prev_* / current columns).
+#
+# Seq is handed out from a one-row counter (claim_event_seq) that is locked until the writer
+# commits, so events become visible strictly in Seq order: a reader that has seen Seq N has seen
+# every event <= N. Consumers therefore only need to remember one number, their offset.
+#
+#   consumer.offset -> poll(consumer, run_q) -> consumer.apply(new events) -> offset advances
+#
+# durable consumers keep the offset in `event_offsets` (exports, jobs); in-process ones
+# (the drill-down cube, metrics) start from a snapshot or from 0 on each process start.
+# In sharded mode every shard has its own log ("stream"); a consumer keeps one offset per stream.
+import statistics
+import threading
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS claim_events (
+      Seq BIGINT PRIMARY KEY,
+      Claim_ID INT NOT NULL,
+      Event VARCHAR(10) NOT NULL,
+      Food_ID INT,
+      Receiver_ID INT,
+      Status VARCHAR(20),
+      Claim_Time DATETIME,
+      Prev_Food_ID INT,
+      Prev_Receiver_ID INT,
+      Prev_Status VARCHAR(20),
+      Prev_Claim_Time DATETIME,
+      Recorded_At DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+      INDEX ix_claim_events_claim (Claim_ID, Seq)
+    ) ENGINE=InnoDB;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS claim_event_seq (
+      id TINYINT PRIMARY KEY,
+      seq BIGINT NOT NULL
+    ) ENGINE=InnoDB;
+    """,
+    "INSERT IGNORE INTO claim_event_seq (id, seq) VALUES (1, 0)",
+    """
+    CREATE TABLE IF NOT EXISTS event_offsets (
+      Consumer VARCHAR(64) PRIMARY KEY,
+      Seq BIGINT NOT NULL,
+      Updated_At DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB;
+    """,
+)
+
+IMAGE = ("Food_ID", "Receiver_ID", "Status", "Claim_Time")
+EVENT_COLUMNS = ("Seq", "Claim_ID", "Event", *IMAGE, *(f"Prev_{c}" for c in IMAGE))
+
+INSERT_SQL = (
+    f"INSERT INTO claim_events ({','.join(EVENT_COLUMNS)}) "
+    f"VALUES ({','.join(['%s'] * len(EVENT_COLUMNS))})"
+)
+READ_SQL = "SELECT * FROM claim_events WHERE Seq > %s ORDER BY Seq LIMIT %s"
+HEAD_SQL = "SELECT seq FROM claim_event_seq WHERE id = 1"
+BATCH = 1000
+MAIN = "main"  # the one stream when sharding is off
+
+# ---------- writing (always on a cursor inside the caller's transaction) ----------
+def _allocate(cur, n):
+    """Reserve n consecutive Seq values; the counter row stays locked until the caller commits."""
+    cur.execute("UPDATE claim_event_seq SET seq = LAST_INSERT_ID(seq + %s) WHERE id = 1", (n,))
+    cur.execute("SELECT LAST_INSERT_ID() AS last")
+    return int(cur.fetchone()["last"]) - n + 1
+
+def append(cur, events):
+    """
+    events: [(Claim_ID, Event, after_image, before_image)] with images as
+    (Food_ID, Receiver_ID, Status, Claim_Time) tuples or None.
+    """
+    if not events:
+        return 0
+    first = _allocate(cur, len(events))
+    none = (None,) * len(IMAGE)
+    cur.executemany(INSERT_SQL, [
+        (first + k, cid, kind, *(after or none), *(before or none))
+        for k, (cid, kind, after, before) in enumerate(events)
+    ])
+    return first + len(events) - 1
+
+def _images(cur, claim_ids, lock=False):
+    if not claim_ids:
+        return {}
+    marks = ",".join(["%s"] * len(claim_ids))
+    cur.execute(
+        f"SELECT Claim_ID, Food_ID, Receiver_ID, Status, Timestamp FROM claims WHERE Claim_ID IN ({marks})"
+        + (" FOR UPDATE" if lock else ""),
+        tuple(claim_ids),
+    )
+    return {r["Claim_ID"]: (r["Food_ID"], r["Receiver_ID"], r["Status"], r["Timestamp"]) for r in cur.fetchall()}
+
+def logged(cur, claim_ids, change):
+    """
+    Run change() (statements on `cur`) and append one event per claim it actually changed,
+    by diffing the before/after rows of `claim_ids`. Returns the number of events.
+    """
+    ids = sorted({int(i) for i in claim_ids})
+    before = _images(cur, ids, lock=True)
+    change()
+    after = _images(cur, ids)
+    events = []
+    for cid in ids:
+        b, a = before.get(cid), after.get(cid)
+        if b == a:
+            continue
+        kind = "create" if b is None else "delete" if a is None else "update"
+        events.append((cid, kind, a, b))
+    append(cur, events)
+    return len(events)
+
+def update_claim(cur, claim_id, food_id, receiver_id, status):
+    """CRUD edit (Timestamp stays the creation time; the change time is the event's). False if no such claim."""
+    if not _images(cur, [claim_id], lock=True):
+        return False
+    logged(cur, [claim_id], lambda: cur.execute(
+        "UPDATE claims SET Food_ID=%s, Receiver_ID=%s, Status=%s WHERE Claim_ID=%s",
+        (food_id, receiver_id, status, claim_id),
+    ))
+    return True
+
+def delete_claim(cur, claim_id):
+    logged(cur, [claim_id], lambda: cur.execute("DELETE FROM claims WHERE Claim_ID=%s", (claim_id,)))
+
+def upsert_rows(cur, sql, rows):
+    """Bulk import batch: the claims UPSERT plus its events (rows start with Claim_ID)."""
+    logged(cur, [r[0] for r in rows], lambda: cur.executemany(sql, rows))
+
+def bootstrap(cur):
+    """First run on an existing database: one 'create' event per claim already there."""
+    cur.execute("SELECT seq FROM claim_event_seq WHERE id = 1 FOR UPDATE")
+    if int(cur.fetchone()["seq"]) != 0:
+        return 0
+    cur.execute("SELECT COUNT(*) AS n FROM claims")
+    n = int(cur.fetchone()["n"])
+    if n == 0:
+        return 0
+    first = _allocate(cur, n)
+    cur.execute(
+        "INSERT INTO claim_events (Seq, Claim_ID, Event, Food_ID, Receiver_ID, Status, Claim_Time) "
+        "SELECT %s + ROW_NUMBER() OVER (ORDER BY Claim_ID) - 1, Claim_ID, 'create', "
+        "Food_ID, Receiver_ID, Status, Timestamp FROM claims",
+        (first,),
+    )
+    return n
+
+# ---------- consuming ----------
+class Consumer:
+    """
+    Something derived from the event log. Subclasses implement apply(events);
+    `sql` may be overridden to join extra columns (it must filter Seq > %s, ORDER BY Seq, LIMIT %s).
+    """
+    name = None
+    durable = False   # keep the offset in event_offsets across restarts
+    sql = READ_SQL
+
+    def __init__(self):
+        self.offsets = {}  # stream -> last Seq applied
+        # held by poll() across read -> apply -> advance, so two sessions polling one process-wide
+        # consumer can't both apply the same events; reentrant so methods can poll under it
+        self._lock = threading.RLock()
+
+    @property
+    def offset(self):
+        """Events consumed over all streams (Seq is gap-free, so with one stream: its last Seq)."""
+        return sum(self.offsets.values())
+
+    def apply(self, events):
+        raise NotImplementedError
+
+def head(run_q):
+    """Highest Seq handed out so far."""
+    rows = run_q(HEAD_SQL, None)
+    return int(rows[0]["seq"]) if rows else 0
+
+def load_offset(run_q, name):
+    rows = run_q("SELECT Seq FROM event_offsets WHERE Consumer = %s", (name,))
+    return int(rows[0]["Seq"]) if rows else 0
+
+def save_offset(run_exec, name, seq):
+    run_exec(
+        "INSERT INTO event_offsets (Consumer, Seq) VALUES (%s, %s) ON DUPLICATE KEY UPDATE Seq = VALUES(Seq)",
+        (name, seq),
+    )
+
+def poll(consumer, run_q, run_exec=None, limit=BATCH, stream=MAIN):
+    """
+    Feed `consumer` every event of `stream` after its offset there, in batches (run_q/run_exec
+    must read/write that stream's database). Returns the number applied.
+    """
+    with consumer._lock:
+        offset = consumer.offsets.get(stream, 0)
+        if consumer.durable and offset == 0:
+            offset = load_offset(run_q, consumer.name)
+        n = 0
+        while True:
+            events = run_q(consumer.sql, (offset, limit))
+            if not events:
+                break
+            consumer.apply(events)
+            offset = consumer.offsets[stream] = int(events[-1]["Seq"])
+            n += len(events)
+            if len(events) < limit:
+                break
+        consumer.offsets[stream] = offset
+        if n and consumer.durable:
+            save_offset(run_exec, consumer.name, offset)
+        return n
+
+class CompletionTimes(Consumer):
+    """Time from claim creation to its first Completed / Cancelled status."""
+    name = "completion_times"
+    OUTCOMES = ("Completed", "Cancelled")
+
+    def __init__(self):
+        super().__init__()
+        self.created = {}                     # open claims: Claim_ID -> creation time
+        self.hours = {o: [] for o in self.OUTCOMES}
+
+    def apply(self, events):
+        for e in events:
+            cid = e["Claim_ID"]
+            if e["Event"] == "create":
+                if e["Status"] in self.OUTCOMES:  # imported already settled: no timing available
+                    continue
+                self.created[cid] = e["Claim_Time"] or e["Recorded_At"]
+            elif e["Event"] == "delete":
+                self.created.pop(cid, None)
+            elif e["Status"] in self.OUTCOMES and cid in self.created:
+                start = self.created.pop(cid)
+                self.hours[e["Status"]].append((e["Recorded_At"] - start).total_seconds() / 3600)
+
+    def summary(self):
+        with self._lock:
+            hours = {o: list(hrs) for o, hrs in self.hours.items()}
+        out = []
+        for outcome, hrs in hours.items():
+            out.append({
+                "Outcome": outcome,
+                "Claims": len(hrs),
+                "Median_h": round(statistics.median(hrs), 2) if hrs else None,
+                "P90_h": round(statistics.quantiles(hrs, n=10)[-1], 2) if len(hrs) > 1 else None,
+                "Mean_h": round(statistics.fmean(hrs), 2) if hrs else None,
+            })
+        out.append({"Outcome": "Still open", "Claims": len(self.created),
+                    "Median_h": None, "P90_h": None, "Mean_h": None})
+        return out
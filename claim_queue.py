@@ -0,0 +1,245 @@
+# claim_queue.py — group-commit write queue for claim creation
+#
+# Concurrent sessions submit claims; one writer thread collects them for up to
+# `window_ms` (or `max_batch` claims), assigns Claim_IDs and inserts the whole
+# group in ONE transaction on ONE connection, then hands each caller its ID.
+#
+# Claim_IDs come from the id_sequences row for "claims" (db.allocate_ids), reserved before the group's
+# transaction, so queues in different app processes never hand out the same ID. Sharded mode: one
+# queue per shard, all numbering from the directory's sequence.
+#
+# durability ([claim_queue] durability), i.e. when a caller's Future resolves:
+#   "commit"  (default) — once COMMIT returns on the primary
+#   "flush"   — as "commit", but the writer refuses to run unless the server flushes on every
+#               commit (innodb_flush_log_at_trx_commit = 1, and sync_binlog = 1 with the binlog on)
+#   "replica" — after COMMIT, also wait (up to replica_timeout s) until a healthy replica has
+#               applied the group's GTIDs; slower groups, but an ack survives losing the primary
+#
+# A claim that may have landed without the caller hearing so (create() timed out, the connection
+# dropped during COMMIT and couldn't be checked, the replica wait ran out) raises a TimeoutError;
+# page code reports it as pending.
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import mysql.connector
+import streamlit as st
+
+import claim_events
+
+DURABILITY = ("commit", "flush", "replica")
+LOST = (2006, 2013)  # server gone / lost connection: a COMMIT in flight may or may not have landed
+
+INSERT_SQL = "INSERT INTO claims(Claim_ID, Food_ID, Receiver_ID, Status, Timestamp) VALUES (%s,%s,%s,%s,%s)"
+
+class CommitUnknown(TimeoutError):
+    """The group may have committed, but the writer couldn't confirm it (or its replica copy) in time."""
+
+class ClaimWriteQueue:
+    def __init__(self, connect, allocate_ids, window_ms=10, max_batch=200, durability="commit",
+                 replica_connect=None, replica_timeout=2.0):
+        if durability not in DURABILITY:
+            raise ValueError(f"durability must be one of {DURABILITY}, got {durability!r}")
+        if durability == "replica" and replica_connect is None:
+            raise ValueError('durability = "replica" needs read replicas ([[mysql.replicas]])')
+        self._connect = connect
+        self._allocate_ids = allocate_ids  # n -> first of n new Claim_IDs
+        self.durability = durability
+        self._replica_connect = replica_connect  # -> pooled replica connection, or None if none is healthy
+        self.replica_timeout = replica_timeout
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._q = queue.Queue()
+        self._conn = None
+        self._stop = threading.Event()
+        self.stats = {"claims": 0, "groups": 0, "commits": 0, "errors": 0}
+        self._thread = threading.Thread(target=self._run, name="claim-writer", daemon=True)
+        self._thread.start()
+
+    # ---------- public ----------
+    def submit(self, food_id, receiver_id, status="Pending") -> Future:
+        """Queue one claim; the Future resolves to its Claim_ID (or raises the DB error)."""
+        fut = Future()
+        self._q.put(((int(food_id), int(receiver_id), str(status)[:20]), fut))
+        return fut
+
+    def create(self, food_id, receiver_id, status="Pending", timeout=10) -> int:
+        """Blocking helper for page code: returns the new Claim_ID.
+
+        Raises TimeoutError if the group hasn't committed within `timeout`; the claim may still commit.
+        """
+        return self.submit(food_id, receiver_id, status).result(timeout=timeout)
+
+    def close(self, timeout=5):
+        self._stop.set()
+        self._thread.join(timeout)
+        if self._conn is not None:
+            self._conn.close()
+
+    # ---------- writer thread ----------
+    def _collect(self):
+        try:
+            first = self._q.get(timeout=0.2)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            left = deadline - time.monotonic()
+            if left <= 0:
+                break
+            try:
+                batch.append(self._q.get(timeout=left))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not (self._stop.is_set() and self._q.empty()):
+            batch = self._collect()
+            if not batch:
+                continue
+            try:
+                first = self._allocate_ids(len(batch))
+            except Exception as e:
+                self._fail(batch, e)
+                continue
+            ids = list(range(first, first + len(batch)))
+            try:
+                self._commit(batch, ids)
+            except mysql.connector.Error as e:
+                if len(batch) == 1:
+                    self._fail(batch, e)
+                    continue
+                # isolate the bad claim(s): retry one by one so the rest still land. Each keeps its
+                # reserved ID, so a first attempt that did land shows up as a duplicate, not a second row
+                for item, cid in zip(batch, ids):
+                    try:
+                        self._commit([item], [cid])
+                    except Exception as e1:
+                        self._fail([item], e1)
+            except Exception as e:  # never let the writer thread die
+                self._fail(batch, e)
+
+    def _commit(self, batch, ids):
+        """Write the group and resolve its callers; after a lost connection, check before calling it failed."""
+        try:
+            self._write(batch, ids)
+        except mysql.connector.Error as e:
+            if e.errno not in LOST:
+                raise
+            try:
+                landed = self._landed(ids)
+            except mysql.connector.Error:
+                raise CommitUnknown("lost the connection during COMMIT and could not check the outcome") from e
+            if not landed:
+                raise
+        if self.durability == "replica":
+            try:
+                self._wait_replica()
+            except mysql.connector.Error as e:  # committed: must not fall into the one-by-one replay
+                raise CommitUnknown(f"committed on the primary; replica check failed: {e}") from e
+        self._resolve(batch, ids)
+
+    def _landed(self, ids):
+        """Did the group with these (reserved, so unique) Claim_IDs commit? All or none: one transaction."""
+        conn = self._get_conn()
+        cur = conn.cursor()
+        try:
+            cur.execute(f"SELECT COUNT(*) FROM claims WHERE Claim_ID IN ({','.join(['%s'] * len(ids))})", ids)
+            n = int(cur.fetchone()[0])
+            conn.commit()
+            return n > 0
+        finally:
+            cur.close()
+
+    def _wait_replica(self):
+        conn = self._get_conn()
+        cur = conn.cursor()
+        cur.execute("SELECT @@GLOBAL.gtid_executed")  # includes the group just committed
+        gtid = cur.fetchone()[0]
+        cur.close()
+        rep = self._replica_connect()
+        if rep is None:
+            raise CommitUnknown("committed on the primary, but no healthy replica to confirm it on")
+        try:
+            cur = rep.cursor()
+            cur.execute("SELECT WAIT_FOR_EXECUTED_GTID_SET(%s, %s)", (gtid, self.replica_timeout))
+            caught_up = cur.fetchone()[0] == 0
+            cur.close()
+        finally:
+            rep.close()
+        if not caught_up:
+            raise CommitUnknown(f"committed on the primary; not on a replica within {self.replica_timeout:g} s")
+
+    def _get_conn(self):
+        if self._conn is None:
+            conn = self._connect()
+            if self.durability == "flush":
+                self._check_flush(conn)
+            self._conn = conn
+        self._conn.ping(reconnect=True, attempts=3, delay=1)
+        return self._conn
+
+    @staticmethod
+    def _check_flush(conn):
+        cur = conn.cursor()
+        cur.execute("SELECT @@innodb_flush_log_at_trx_commit, @@sync_binlog, @@log_bin")
+        flush, sync, log_bin = (int(v) for v in cur.fetchone())
+        cur.close()
+        if flush != 1 or (log_bin and sync != 1):
+            conn.close()
+            raise RuntimeError(
+                'durability = "flush" needs innodb_flush_log_at_trx_commit = 1 and sync_binlog = 1 '
+                f"(server has {flush} and {sync}); COMMIT would return before the group is on disk"
+            )
+
+    def _write(self, batch, ids):
+        conn = self._get_conn()
+        cur = conn.cursor(dictionary=True)
+        try:
+            conn.start_transaction()
+            cur.execute("SELECT NOW() AS now")
+            now = cur.fetchone()["now"]
+            rows = [(cid, *row, now) for cid, (row, _) in zip(ids, batch)]
+            cur.executemany(INSERT_SQL, rows)
+            claim_events.append(cur, [(row[0], "create", row[1:], None) for row in rows])
+            conn.commit()
+            self.stats["commits"] += 1
+        except Exception:
+            try:
+                conn.rollback()
+            except mysql.connector.Error:
+                pass
+            raise
+        finally:
+            cur.close()
+
+    def _resolve(self, batch, ids):
+        self.stats["groups"] += 1
+        self.stats["claims"] += len(batch)
+        for cid, (_, fut) in zip(ids, batch):
+            fut.set_result(cid)
+
+    def _fail(self, batch, exc):
+        self.stats["errors"] += len(batch)
+        for _, fut in batch:
+            if not fut.done():
+                fut.set_exception(exc)
+
+@st.cache_resource
+def get_claim_queue(shard=None):
+    """One queue (and writer connection) per app process, per shard when sharded; tune via [claim_queue]."""
+    from db import allocate_ids, connect, replica_conn, shard_cfgs
+    cfg = st.secrets.get("claim_queue", {})
+    return ClaimWriteQueue(
+        connect if shard is None else (lambda: connect(**shard_cfgs()[shard])),
+        lambda n: allocate_ids("claims", n),
+        window_ms=int(cfg.get("window_ms", 10)),
+        max_batch=int(cfg.get("max_batch", 200)),
+        durability=cfg.get("durability", "commit"),
+        # replicas aren't used in sharded mode
+        replica_connect=replica_conn if shard is None and st.secrets["mysql"].get("replicas") else None,
+        replica_timeout=float(cfg.get("replica_timeout", 2)),
+    )
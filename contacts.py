@@ -0,0 +1,116 @@
+# contacts.py — free-form `Contact` -> structured, indexed fields (computed once, at import/upsert time)
+#
+#   Contact_E164   '+19252838901'        phone in E.164 (national numbers get DEFAULT_CC)
+#   Contact_Ext    '6297'                extension, if any
+#   Contact_Email  'ops@foodbank.org'    lower-cased email
+#   Contact_Kind   'phone' | 'email' | 'other'
+#
+# Everything is vectorized with pandas .str so a 100k-row CSV is normalized in one pass.
+import pandas as pd
+
+DEFAULT_CC = "1"         # country code for numbers written without one (sample data is NANP)
+NATIONAL_DIGITS = 10
+COLUMNS = ("Contact_E164", "Contact_Ext", "Contact_Email", "Contact_Kind")
+KEY_COLUMN = {"phone": "Contact_E164", "email": "Contact_Email"}
+
+_EMAIL = r"[^@\s]+@[^@\s]+\.[^@\s]+"
+_PHONE = r"^(?P<num>.*?)(?:\s*(?:x|ext\.?|#)\s*(?P<ext>\d+))?\s*$"
+
+def normalize(contact: pd.Series, default_cc=DEFAULT_CC) -> pd.DataFrame:
+    """Contact strings -> DataFrame[COLUMNS] on the same index (None where not applicable)."""
+    raw = contact.astype("string").fillna("").str.strip()
+    low = raw.str.lower()
+    is_email = low.str.fullmatch(_EMAIL).fillna(False)
+
+    parts = low.str.extract(_PHONE)
+    num = parts["num"].fillna("")
+    digits = num.str.replace(r"\D", "", regex=True)
+    plus = num.str.startswith("+")
+    intl = ~plus & digits.str.startswith("00")          # 001-517-... style international prefix
+    digits = digits.mask(intl, digits.str[2:])
+    n = digits.str.len()
+    national = ~plus & ~intl
+
+    e164 = pd.Series(pd.NA, index=raw.index, dtype="string")
+    e164 = e164.mask((plus | intl) & n.between(8, 15), "+" + digits)
+    e164 = e164.mask(national & (n == NATIONAL_DIGITS), f"+{default_cc}" + digits)
+    e164 = e164.mask(national & (n == NATIONAL_DIGITS + len(default_cc)) & digits.str.startswith(default_cc),
+                     "+" + digits)
+    is_phone = e164.notna() & ~is_email
+
+    kind = pd.Series(pd.NA, index=raw.index, dtype="string")
+    kind = kind.mask(raw != "", "other").mask(is_phone, "phone").mask(is_email, "email")
+
+    out = pd.DataFrame({
+        "Contact_E164": e164.where(is_phone),
+        "Contact_Ext": parts["ext"].astype("string").where(is_phone),
+        "Contact_Email": low.where(is_email),
+        "Contact_Kind": kind,
+    })
+    return out.astype(object).where(out.notna(), None)
+
+def normalize_one(contact) -> tuple:
+    """Single value (CRUD forms) -> (e164, ext, email, kind)."""
+    return tuple(normalize(pd.Series([contact])).iloc[0])
+
+# ---------- reverse lookup ----------
+LOOKUP_SQL = {
+    "providers": "SELECT * FROM providers WHERE {col} = %s",
+    "receivers": "SELECT * FROM receivers WHERE {col} = %s",
+    "listings": """
+        SELECT fl.*, p.Name AS Provider_Name
+        FROM providers p
+        JOIN food_listings fl ON fl.Provider_ID = p.Provider_ID
+        WHERE p.{col} = %s
+        ORDER BY fl.Expiry_Date
+    """,
+    # claims ON listings of a provider with this contact (claims BY receivers: see reverse_lookup)
+    "claims": """
+        SELECT c.*, p.Name AS Party, 'provider' AS Matched_As
+        FROM providers p
+        JOIN food_listings fl ON fl.Provider_ID = p.Provider_ID
+        JOIN claims c ON c.Food_ID = fl.Food_ID
+        WHERE p.{col} = %s
+    """,
+}
+# by receiver ID rather than a join: in sharded mode a receiver's claims sit on other shards
+RECEIVER_CLAIMS_SQL = "SELECT * FROM claims WHERE Receiver_ID IN ({marks})"
+
+def lookup_key(contact):
+    """Free-form phone/email -> (indexed column, normalized value), or None if it isn't one."""
+    e164, _, email, kind = normalize_one(contact)
+    if kind not in KEY_COLUMN:
+        return None
+    return KEY_COLUMN[kind], (e164 if kind == "phone" else email)
+
+def reverse_lookup(run_q, contact) -> dict:
+    """{'providers'|'receivers'|'listings'|'claims': rows} for one phone number or email (index lookups)."""
+    key = lookup_key(contact)
+    if key is None:
+        return {name: [] for name in LOOKUP_SQL}
+    col, value = key
+    found = {name: run_q(sql.format(col=col), (value,)) for name, sql in LOOKUP_SQL.items()}
+    receivers = {r["Receiver_ID"]: r["Name"] for r in found["receivers"]}
+    if receivers:
+        sql = RECEIVER_CLAIMS_SQL.format(marks=",".join(["%s"] * len(receivers)))
+        found["claims"] = [
+            dict(c, Party=receivers[c["Receiver_ID"]], Matched_As="receiver") for c in run_q(sql, tuple(receivers))
+        ] + found["claims"]
+    return found
+
+# ---------- backfill for rows written before these columns existed ----------
+def backfill(run_q, run_exec, table, id_col, batch=1000):
+    """Normalize rows whose Contact_Kind is still NULL; returns the number updated."""
+    rows = run_q(
+        f"SELECT {id_col}, Contact FROM {table} WHERE Contact_Kind IS NULL AND Contact IS NOT NULL AND Contact <> ''",
+        primary=True,
+    )
+    if not rows:
+        return 0
+    df = pd.DataFrame(rows)
+    norm = normalize(df["Contact"])
+    params = [(*vals, int(i)) for vals, i in zip(norm.itertuples(index=False, name=None), df[id_col])]
+    sql = f"UPDATE {table} SET " + ", ".join(f"{c}=%s" for c in COLUMNS) + f" WHERE {id_col}=%s"
+    for k in range(0, len(params), batch):
+        run_exec(sql, params[k:k + batch])
+    return len(params)
@@ -0,0 +1,181 @@
+# cube.py — in-memory supply/demand cube over (Location, Food_Type, Meal_Type, Provider_Type, Month)
+#
+# Cells are stored sparsely as two NumPy arrays:
+#   codes  int32 [n_cells, n_dims]     dictionary-encoded dimension values
+#   values int64 [n_cells, n_measures] pre-aggregated measures
+# Listings land in the month of their Expiry_Date, claims in the month of their Timestamp
+# (claims take the other four dimensions from the listing they claim).
+# After a build the cube is a claim_events consumer: refresh() folds in only the new events
+# (minus the before image, plus the after image), so status changes and deletes show up too.
+# Sharded: every shard's tables and log are added into the one cube, each with its own offset.
+import time
+
+import numpy as np
+import pandas as pd
+
+from claim_events import MAIN, Consumer, head, poll
+
+DIMS = ("Location", "Food_Type", "Meal_Type", "Provider_Type", "Month")
+MEASURES = ("Quantity", "Listings", "Claims", "Pending", "Completed", "Cancelled")
+STATUS_MEASURE = {"Pending": "Pending", "Completed": "Completed", "Cancelled": "Cancelled"}
+
+LISTINGS_SQL = """
+    SELECT COALESCE(Location,'(none)') AS Location, COALESCE(Food_Type,'(none)') AS Food_Type,
+           COALESCE(Meal_Type,'(none)') AS Meal_Type, COALESCE(Provider_Type,'(none)') AS Provider_Type,
+           COALESCE(DATE_FORMAT(Expiry_Date, '%Y-%m'),'(none)') AS Month,
+           SUM(Quantity) AS Quantity, COUNT(*) AS Listings
+    FROM food_listings
+    GROUP BY 1,2,3,4,5
+"""
+
+CLAIMS_SQL = """
+    SELECT COALESCE(fl.Location,'(none)') AS Location, COALESCE(fl.Food_Type,'(none)') AS Food_Type,
+           COALESCE(fl.Meal_Type,'(none)') AS Meal_Type, COALESCE(fl.Provider_Type,'(none)') AS Provider_Type,
+           COALESCE(DATE_FORMAT(c.Timestamp, '%Y-%m'),'(none)') AS Month,
+           c.Status, COUNT(*) AS n
+    FROM claims c
+    JOIN food_listings fl ON fl.Food_ID = c.Food_ID
+    GROUP BY 1,2,3,4,5,6
+"""
+
+# events with the cube dimensions of their after (a) and before (b) images
+EVENTS_SQL = """
+    SELECT e.Seq, e.Status, e.Prev_Status,
+           a.Food_ID IS NOT NULL AS has_after, b.Food_ID IS NOT NULL AS has_before,
+           COALESCE(a.Location,'(none)') AS Location, COALESCE(a.Food_Type,'(none)') AS Food_Type,
+           COALESCE(a.Meal_Type,'(none)') AS Meal_Type, COALESCE(a.Provider_Type,'(none)') AS Provider_Type,
+           COALESCE(DATE_FORMAT(e.Claim_Time, '%Y-%m'),'(none)') AS Month,
+           COALESCE(b.Location,'(none)') AS Prev_Location, COALESCE(b.Food_Type,'(none)') AS Prev_Food_Type,
+           COALESCE(b.Meal_Type,'(none)') AS Prev_Meal_Type, COALESCE(b.Provider_Type,'(none)') AS Prev_Provider_Type,
+           COALESCE(DATE_FORMAT(e.Prev_Claim_Time, '%Y-%m'),'(none)') AS Prev_Month
+    FROM claim_events e
+    LEFT JOIN food_listings a ON a.Food_ID = e.Food_ID
+    LEFT JOIN food_listings b ON b.Food_ID = e.Prev_Food_ID
+    WHERE e.Seq > %s
+    ORDER BY e.Seq
+    LIMIT %s
+"""
+
+class Cube(Consumer):
+    name = "supply_cube"
+    sql = EVENTS_SQL
+
+    def __init__(self, capacity=1024):
+        super().__init__()  # self._lock: Consumer's RLock, also taken by poll() inside refresh()
+        self._reset(capacity)
+
+    def _reset(self, capacity=1024):
+        self.labels = {d: [] for d in DIMS}   # code -> label
+        self.index = {d: {} for d in DIMS}    # label -> code
+        self.codes = np.zeros((capacity, len(DIMS)), dtype=np.int32)
+        self.values = np.zeros((capacity, len(MEASURES)), dtype=np.int64)
+        self.n = 0
+        self._cell = {}                       # tuple(codes) -> row
+        self.offsets = {}                     # stream -> last claim_events Seq folded in
+        self.built_at = None
+
+    # ---------- encoding / storage ----------
+    def _code(self, dim, label):
+        idx = self.index[dim]
+        c = idx.get(label)
+        if c is None:
+            c = idx[label] = len(self.labels[dim])
+            self.labels[dim].append(label)
+        return c
+
+    def _row(self, key):
+        r = self._cell.get(key)
+        if r is None:
+            if self.n == len(self.codes):
+                self.codes = np.concatenate([self.codes, np.zeros_like(self.codes)])
+                self.values = np.concatenate([self.values, np.zeros_like(self.values)])
+            r = self._cell[key] = self.n
+            self.codes[r] = key
+            self.n += 1
+        return r
+
+    def add(self, dims: dict, measure: str, amount: int):
+        key = tuple(self._code(d, str(dims[d])) for d in DIMS)
+        self.values[self._row(key), MEASURES.index(measure)] += int(amount)
+
+    def _add_claims(self, dims, status, n):
+        self.add(dims, "Claims", n)
+        m = STATUS_MEASURE.get(status)
+        if m:
+            self.add(dims, m, n)
+
+    def apply(self, events):
+        """Consumer hook: retract each event's before image, add its after image."""
+        for e in events:
+            if e["has_before"]:
+                self._add_claims({d: e[f"Prev_{d}"] for d in DIMS}, e["Prev_Status"], -1)
+            if e["has_after"]:
+                self._add_claims(e, e["Status"], 1)
+
+    # ---------- loading ----------
+    def build(self, readers):
+        """
+        Full (re)build from {stream: run_q} (run_q(sql, params) -> list[dict]), or one run_q.
+        Pass db.snapshot() readers so each stream's tables and event offset are read at the
+        same point in time.
+        """
+        if callable(readers):
+            readers = {MAIN: readers}
+        with self._lock:
+            self._reset()
+            for stream, run_q in readers.items():
+                self.offsets[stream] = head(run_q)
+                for r in run_q(LISTINGS_SQL, None):
+                    self.add(r, "Quantity", r["Quantity"] or 0)
+                    self.add(r, "Listings", r["Listings"])
+                for r in run_q(CLAIMS_SQL, None):
+                    self._add_claims(r, r["Status"], int(r["n"]))
+            self.built_at = time.time()
+        return self
+
+    def refresh(self, readers):
+        """Incremental: apply claim events after the current offset(s); same `readers` as build()."""
+        if callable(readers):
+            readers = {MAIN: readers}
+        with self._lock:
+            for stream, run_q in readers.items():
+                poll(self, run_q, stream=stream)
+        return self
+
+    # ---------- querying ----------
+    def _mask(self, filters):
+        mask = np.ones(self.n, dtype=bool)
+        for dim, wanted in (filters or {}).items():
+            if isinstance(wanted, str):
+                wanted = [wanted]
+            codes = [self.index[dim][w] for w in wanted if w in self.index[dim]]
+            mask &= np.isin(self.codes[:self.n, DIMS.index(dim)], codes)
+        return mask
+
+    def query(self, group_by=(), filters=None, measures=MEASURES) -> pd.DataFrame:
+        """
+        Slice/dice with `filters` ({dim: value or [values]}), roll up to `group_by` dims.
+        group_by=() gives the grand total.
+        """
+        with self._lock:
+            mask = self._mask(filters)
+            codes = self.codes[:self.n][mask]
+            vals = self.values[:self.n][mask][:, [MEASURES.index(m) for m in measures]]
+            if not group_by:
+                return pd.DataFrame([vals.sum(axis=0)], columns=list(measures))
+            cols = [DIMS.index(d) for d in group_by]
+            shape = tuple(max(len(self.labels[d]), 1) for d in group_by)
+            keys = np.ravel_multi_index(tuple(codes[:, c] for c in cols), shape)
+            uniq, inv = np.unique(keys, return_inverse=True)
+            sums = np.zeros((len(uniq), vals.shape[1]), dtype=np.int64)
+            np.add.at(sums, inv, vals)
+            out = {d: np.asarray(self.labels[d], dtype=object)[idx]
+                   for d, idx in zip(group_by, np.unravel_index(uniq, shape))}
+            out.update({m: sums[:, i] for i, m in enumerate(measures)})
+            return pd.DataFrame(out)
+
+    def members(self, dim, filters=None):
+        """Dimension values that have data under `filters` (for drill-down pickers)."""
+        with self._lock:
+            codes = np.unique(self.codes[:self.n][self._mask(filters), DIMS.index(dim)])
+            return sorted(self.labels[dim][c] for c in codes)
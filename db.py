@@ -1,8 +1,45 @@
 # db.py  — robust pooling; fresh connection per call
+#
+# Optional read replicas ([[mysql.replicas]] in secrets):
+#   run_q    -> a healthy replica (lag <= replica_max_lag), else the primary
+#   run_exec -> always the primary
+# Read-your-writes: after a session writes, its reads are either pinned to the primary
+# for `pin_seconds` (read_your_writes = "pin", default) or sent to a replica only once it
+# has applied the session's last GTID set (read_your_writes = "gtid").
+#
+# Prepared statements: DML sent through run_q/run_exec is executed as a server-side prepared
+# statement (binary protocol), cached per connection by SQL text — see _StmtCache.
+#
+# Optional city sharding ([sharding] in secrets; replicas are not used then):
+#   providers/receivers by City, food_listings by Location, claims with their listing.
+#   The shard map (City -> shard) lives in the [mysql] database, the "directory".
+#   run_q(city=...) -> that city's shard; otherwise every shard in parallel, merged by merge=...
+#   run_exec / transaction need city= or shard=; see sharding.py for merges and moving cities.
+import random
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from functools import partial
+
 import streamlit as st
 import mysql.connector
+from mysql.connector.errors import PoolError
 from mysql.connector.pooling import MySQLConnectionPool
 
+from claim_events import MAIN  # name of the one database (and its event stream) when not sharded
+from schema import COLUMNS, ID_SEQUENCES, INDEXES, RESERVE_SQL, SCHEMA, setup_database  # noqa: F401  (db.SCHEMA etc. kept importable)
+
+HEALTH_TTL = 2.0  # seconds between replica lag checks
+POOL_WAIT_TIMEOUT = 5.0   # seconds to wait for a free pooled connection before giving up
+POOL_WAITS = deque(maxlen=10_000)  # recent checkout wait times (s), read by bench/load_sessions.py
+STMT_CACHE_SIZE = 64      # prepared statements kept per connection (LRU)
+STMT_STATS = {"prepared": 0, "hits": 0, "evicted": 0, "reprepared": 0, "text": 0}
+SHARD_MAP_TTL = 5.0       # seconds a process trusts its copy of the shard map
+
 def _cfg():
     s = st.secrets["mysql"]
     return {
@@ -15,13 +52,78 @@ def _cfg():
         "charset": "utf8mb4",
     }
 
+def _settings():
+    s = st.secrets["mysql"]
+    max_lag = float(s.get("replica_max_lag", 5))
+    # a replica passes the health check with up to max_lag of lag, and that reading can be HEALTH_TTL old,
+    # so a write may take max_lag + HEALTH_TTL to show up there: the pin has to outlast that
+    floor = max_lag + HEALTH_TTL
+    pin = float(s.get("pin_seconds", max(10.0, floor + 1)))
+    if pin <= floor:
+        raise ValueError(f"[mysql] pin_seconds = {pin:g} must exceed replica_max_lag + {HEALTH_TTL:g} s "
+                         f"(= {floor:g}), or sessions can read from a replica that hasn't applied their write")
+    return {
+        "replica_max_lag": max_lag,
+        "read_your_writes": s.get("read_your_writes", "pin"),
+        "pin_seconds": pin,
+        "gtid_wait_timeout": float(s.get("gtid_wait_timeout", 1)),
+    }
+
+def _replica_cfgs():
+    """Each [[mysql.replicas]] entry overrides host/port (and optionally user/password) of the primary."""
+    base = _cfg()
+    return [{**base, **{k: (int(v) if k == "port" else v) for k, v in dict(r).items()}}
+            for r in st.secrets["mysql"].get("replicas", [])]
+
+class _Pool(MySQLConnectionPool):
+    """
+    Pool that cleans a returned session itself. COM_RESET_CONNECTION (pool_reset_session=True) would also
+    deallocate the connection's cached prepared statements, so instead every connection coming back is
+    rolled back: that ends open transactions and the read view a SELECT leaves open with autocommit off.
+    Nothing in this app sets user/session variables or creates temporary tables on pooled connections.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(pool_reset_session=False, **kwargs)
+
+    def add_connection(self, cnx=None):
+        if cnx is not None:
+            try:
+                if cnx.unread_result:
+                    cnx.consume_results()
+                cnx.rollback()
+            except mysql.connector.Error:
+                pass  # dead connection: _checkout's ping reconnects it (and its statement cache resets)
+        super().add_connection(cnx)
+
 @st.cache_resource
 def _pool():
     # Create once per session; connections drawn on demand
-    return MySQLConnectionPool(pool_name="app_pool", pool_size=6, **_cfg())
+    return _Pool(pool_name="app_pool", pool_size=6, **_cfg())
 
-def get_conn():
-    conn = _pool().get_connection()
+@st.cache_resource
+def _replica_pools():
+    return [
+        {"name": f"replica_{i}",
+         "pool": _Pool(pool_name=f"replica_{i}", pool_size=6, **cfg),
+         "lag": None, "checked": 0.0, "healthy": False, "lock": threading.Lock()}
+        for i, cfg in enumerate(_replica_cfgs())
+    ]
+
+def _checkout(pool):
+    # MySQLConnectionPool raises PoolError as soon as it's exhausted; wait for a slot instead
+    t0 = time.perf_counter()
+    delay = 0.005
+    while True:
+        try:
+            conn = pool.get_connection()
+            break
+        except PoolError:
+            if time.perf_counter() - t0 > POOL_WAIT_TIMEOUT:
+                raise
+            time.sleep(delay)
+            delay = min(delay * 2, 0.1)
+    POOL_WAITS.append(time.perf_counter() - t0)
     # ensure the socket is alive; auto-reconnect if needed
     try:
         conn.ping(reconnect=True, attempts=3, delay=2)
@@ -30,79 +132,553 @@ def get_conn():
         raise
     return conn
 
-def run_q(sql, params=None):
-    conn = get_conn()
+def get_conn():
+    return _checkout(_pool())
+
+def open_pools():
+    """Create the primary (and replica / shard) pools; MySQLConnectionPool opens all its connections up front."""
+    _pool()
+    if st.secrets["mysql"].get("replicas"):
+        _replica_pools()
+    if sharded():
+        _shard_pools()
+
+def connect(**overrides):
+    """Standalone (un-pooled) connection for headless tools like bulk_load.py."""
+    return mysql.connector.connect(**{**_cfg(), **overrides})
+
+# ---------- replica health ----------
+def _replica_lag(conn):
+    """Seconds behind the source, or None if replication isn't running."""
+    cur = conn.cursor(dictionary=True)
     try:
-        cur = conn.cursor(dictionary=True)
-        cur.execute(sql, params or ())
-        rows = cur.fetchall()
-        cur.close()
-        return rows
+        try:
+            cur.execute("SHOW REPLICA STATUS")
+        except mysql.connector.Error:
+            cur.execute("SHOW SLAVE STATUS")  # MySQL < 8.0.22
+        row = cur.fetchone()
     finally:
-        conn.close()
+        cur.close()
+    if not row:
+        return None
+    lag = row.get("Seconds_Behind_Source", row.get("Seconds_Behind_Master"))
+    return None if lag is None else float(lag)
+
+def _check(rep, max_lag):
+    if time.monotonic() - rep["checked"] < HEALTH_TTL:
+        return rep["healthy"]
+    with rep["lock"]:
+        if time.monotonic() - rep["checked"] >= HEALTH_TTL:
+            try:
+                conn = _checkout(rep["pool"])
+                try:
+                    rep["lag"] = _replica_lag(conn)
+                finally:
+                    conn.close()
+                rep["healthy"] = rep["lag"] is not None and rep["lag"] <= max_lag
+            except mysql.connector.Error:
+                rep["lag"], rep["healthy"] = None, False
+            rep["checked"] = time.monotonic()
+    return rep["healthy"]
 
-def run_exec(sql, params=None):
+def replica_status():
+    """[{name, lag, healthy}] for the admin/health pages."""
+    max_lag = _settings()["replica_max_lag"]
+    return [{"name": r["name"], "lag": r["lag"], "healthy": _check(r, max_lag)} for r in _replica_pools()]
+
+def replica_conn():
+    """Pooled connection to the least-lagged healthy replica, or None (none configured or healthy)."""
+    if not st.secrets["mysql"].get("replicas"):
+        return None
+    healthy = [r for r in _replica_pools() if _check(r, _settings()["replica_max_lag"])]
+    if not healthy:
+        return None
+    return _checkout(min(healthy, key=lambda r: r["lag"])["pool"])
+
+# ---------- read-your-writes bookkeeping ----------
+_no_session = threading.local()
+
+def _session():
+    """Streamlit session_state inside a script run; a per-thread dict elsewhere (CLIs, worker threads)."""
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    if get_script_run_ctx() is not None:
+        return st.session_state
+    if not hasattr(_no_session, "state"):
+        _no_session.state = {}
+    return _no_session.state
+
+def note_write(conn=None):
     """
-    params: tuple -> execute
-            list[tuple] -> executemany
+    Record that this session just wrote, so its next reads see it.
+    run_exec calls this itself; call it after writes made on other connections
+    (e.g. the claim queue). `conn` is a primary connection to read the GTID set from.
     """
-    conn = get_conn()
+    if not st.secrets["mysql"].get("replicas"):
+        return
+    state = {"at": time.monotonic(), "gtid": None}
+    if _settings()["read_your_writes"] == "gtid":
+        own = conn is None
+        conn = get_conn() if own else conn
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT @@GLOBAL.gtid_executed")
+            state["gtid"] = cur.fetchone()[0]
+            cur.close()
+        finally:
+            if own:
+                conn.close()
+    _session()["_db_last_write"] = state
+
+def _read_target():
+    """Pick (pool, gtid_to_wait_for) for the next read."""
+    reps = _replica_pools() if st.secrets["mysql"].get("replicas") else []
+    if not reps:
+        return _pool(), None
+    cfg = _settings()
+    healthy = [r for r in reps if _check(r, cfg["replica_max_lag"])]
+    if not healthy:
+        return _pool(), None
+    last = _session().get("_db_last_write")
+    recent = last and time.monotonic() - last["at"] < cfg["pin_seconds"]
+    if recent and cfg["read_your_writes"] != "gtid":
+        return _pool(), None
+    rep = min(healthy, key=lambda r: (r["lag"], random.random()))
+    return rep["pool"], (last["gtid"] if recent else None)
+
+def _replica_caught_up(conn, gtid, timeout):
+    cur = conn.cursor()
     try:
+        cur.execute("SELECT WAIT_FOR_EXECUTED_GTID_SET(%s, %s)", (gtid, timeout))
+        return cur.fetchone()[0] == 0
+    finally:
+        cur.close()
+
+def _fetch(conn, sql, params, prepared=False):
+    if prepared and _preparable(sql):
+        return _run_prepared(conn, sql, params)
+    cur = conn.cursor(dictionary=True)
+    cur.execute(sql, params or ())
+    rows = cur.fetchall() if cur.with_rows else []
+    cur.close()
+    return rows
+
+# ---------- server-side prepared statements ----------
+_DML = re.compile(r"\s*(SELECT|INSERT|UPDATE|DELETE|REPLACE|WITH)\b", re.IGNORECASE)
+_UNPREPARABLE = set()     # SQL the server refused to prepare; always sent as text
+_stmt_limit = None
+_use_prepared = None      # [mysql] prepared_statements, read once per process (not per query)
+ER_UNKNOWN_STMT_HANDLER = 1243
+ER_UNSUPPORTED_PS = 1295
+ER_MAX_PREPARED_STMT_COUNT_REACHED = 1461
+ER_NEED_REPREPARE = 1615
+STMT_INVALIDATED = (ER_UNKNOWN_STMT_HANDLER, ER_NEED_REPREPARE)  # the cached statement itself is unusable
+
+def _preparable(sql):
+    global _use_prepared
+    if _use_prepared is None:
+        _use_prepared = bool(st.secrets["mysql"].get("prepared_statements", True))
+    return _use_prepared and sql not in _UNPREPARABLE and bool(_DML.match(sql))
+
+def _capacity(conn):
+    """Per-connection cache size: STMT_CACHE_SIZE, or less so all our pools fit in max_prepared_stmt_count."""
+    global _stmt_limit
+    if _stmt_limit is None:
         cur = conn.cursor()
-        if isinstance(params, list):
-            cur.executemany(sql, params)
-        else:
-            cur.execute(sql, params or ())
-        conn.commit()
+        cur.execute("SELECT @@GLOBAL.max_prepared_stmt_count")
+        _stmt_limit = int(cur.fetchone()[0])
         cur.close()
+    conns = 6 * (1 + len(st.secrets["mysql"].get("replicas", [])))
+    if sharded():
+        conns += int(st.secrets["sharding"].get("pool_size", 4)) * len(shard_names())
+    # leave half the server-wide budget to other app processes and tools
+    return max(1, min(STMT_CACHE_SIZE, _stmt_limit // (2 * conns)))
+
+class _StmtCache:
+    """LRU of prepared cursors for ONE connection, keyed by SQL text; forgotten when the session changes."""
+
+    def __init__(self, conn, capacity):
+        self.conn = conn
+        self.capacity = capacity
+        self.session = conn.connection_id
+        self.cursors = OrderedDict()  # sql -> (sql object, prepared cursor)
+
+    def get(self, sql):
+        if self.conn.connection_id != self.session:
+            # reconnected (ping(reconnect=True)): the old session's statements are gone server-side
+            STMT_STATS["reprepared"] += len(self.cursors)
+            self.cursors.clear()
+            self.session = self.conn.connection_id
+        hit = self.cursors.get(sql)
+        if hit is not None:
+            self.cursors.move_to_end(sql)
+            STMT_STATS["hits"] += 1
+            return hit
+        self.shrink(self.capacity - 1)
+        # the cursor re-prepares whenever it's given a different string object, so keep the key's
+        hit = self.cursors[sql] = (sql, self.conn.cursor(prepared=True))
+        STMT_STATS["prepared"] += 1
+        return hit
+
+    def drop(self, sql):
+        entry = self.cursors.pop(sql, None)
+        if entry is not None:
+            try:
+                entry[1].close()
+            except mysql.connector.Error:
+                pass
+
+    def shrink(self, size):
+        while len(self.cursors) > max(size, 0):
+            self.drop(next(iter(self.cursors)))
+            STMT_STATS["evicted"] += 1
+
+def _stmt_cache(conn):
+    raw = getattr(conn, "_cnx", conn)  # pooled wrapper -> the real connection, which outlives checkouts
+    cache = getattr(raw, "_stmt_cache", None)
+    if cache is None:
+        cache = raw._stmt_cache = _StmtCache(raw, _capacity(raw))
+    return cache
+
+def _run_prepared(conn, sql, params):
+    """Execute through the connection's statement cache -> list[dict] (empty for writes)."""
+    cache = _stmt_cache(conn)
+    args = tuple(params or ())
+    for attempt in range(2):
+        key, cur = cache.get(sql)
+        try:
+            cur.execute(key, args)
+            if not cur.with_rows:
+                return []
+            cols = cur.column_names
+            return [dict(zip(cols, row)) for row in cur.fetchall()]
+        except mysql.connector.Error as e:
+            if e.errno in STMT_INVALIDATED and attempt == 0:
+                cache.drop(sql)
+                STMT_STATS["reprepared"] += 1   # server dropped it / a table changed under it: prepare again
+                continue
+            if e.errno == ER_MAX_PREPARED_STMT_COUNT_REACHED:
+                cache.drop(sql)
+                cache.capacity = max(1, len(cache.cursors) // 2)
+                cache.shrink(cache.capacity)
+            elif e.errno == ER_UNSUPPORTED_PS:
+                cache.drop(sql)
+                _UNPREPARABLE.add(sql)
+            else:
+                # the statement is still good (duplicate key, lock wait, bad value...): keep it cached
+                raise
+            break
+    STMT_STATS["text"] += 1
+    return _fetch(conn, sql, params)
+
+# ---------- optional city sharding ----------
+class ShardError(mysql.connector.Error):
+    """A write the shard layout can't take right now (city being moved, row on another shard)."""
+
+def sharded():
+    return bool(st.secrets.get("sharding", {}).get("enabled", False))
+
+def shard_cfgs():
+    """name -> connection kwargs; each [[sharding.shards]] entry overrides the [mysql] settings."""
+    base = _cfg()
+    return {
+        s["name"]: {**base, **{k: (int(v) if k == "port" else v) for k, v in dict(s).items() if k != "name"}}
+        for s in st.secrets["sharding"]["shards"]
+    }
+
+def shard_names():
+    return list(shard_cfgs())
+
+def databases():
+    """[(name, route)] for every database holding app tables; pass **route to run_q/run_exec/transaction."""
+    if not sharded():
+        return [(MAIN, {})]
+    return [(name, {"shard": name}) for name in shard_names()]
+
+@st.cache_resource
+def _shard_pools():
+    size = int(st.secrets["sharding"].get("pool_size", 4))
+    return {
+        name: _Pool(pool_name=f"shard_{name}", pool_size=size, **cfg)
+        for name, cfg in shard_cfgs().items()
+    }
+
+@st.cache_resource
+def _scatter_pool():
+    return ThreadPoolExecutor(max_workers=len(shard_names()), thread_name_prefix="scatter")
+
+def _on_shard(name, fn):
+    conn = _checkout(_shard_pools()[name])
+    try:
+        return fn(conn)
     finally:
         conn.close()
 
-# ---------- optional: schema helpers ----------
-SCHEMA = (
-    """
-    CREATE TABLE IF NOT EXISTS providers (
-      Provider_ID INT PRIMARY KEY,
-      Name VARCHAR(100) NOT NULL,
-      Type VARCHAR(50),
-      Address VARCHAR(255),
-      City VARCHAR(100),
-      Contact VARCHAR(100)
-    ) ENGINE=InnoDB;
-    """,
+def scatter(fn, shards=None):
+    """fn(conn) on every shard (or `shards`) in parallel -> {shard: result}."""
+    names = list(shards or shard_names())
+    futs = {name: _scatter_pool().submit(_on_shard, name, fn) for name in names}
+    return {name: f.result() for name, f in futs.items()}
+
+SHARD_SCHEMA = (
     """
-    CREATE TABLE IF NOT EXISTS receivers (
-      Receiver_ID INT PRIMARY KEY,
-      Name VARCHAR(100) NOT NULL,
-      Type VARCHAR(50),
-      City VARCHAR(100),
-      Contact VARCHAR(100)
+    CREATE TABLE IF NOT EXISTS shard_map (
+      City VARCHAR(100) PRIMARY KEY,
+      Shard VARCHAR(64) NOT NULL,
+      Moving TINYINT NOT NULL DEFAULT 0,
+      Updated_At DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
     ) ENGINE=InnoDB;
     """,
+    ID_SEQUENCES,
     """
-    CREATE TABLE IF NOT EXISTS food_listings (
+    CREATE TABLE IF NOT EXISTS listing_cities (
       Food_ID INT PRIMARY KEY,
-      Food_Name VARCHAR(120) NOT NULL,
-      Quantity INT DEFAULT 0,
-      Expiry_Date DATE,
-      Provider_ID INT NOT NULL,
-      Provider_Type VARCHAR(50),
-      Location VARCHAR(100),
-      Food_Type VARCHAR(50),
-      Meal_Type VARCHAR(50)
+      City VARCHAR(100) NOT NULL
     ) ENGINE=InnoDB;
     """,
+)
+
+def _directory(sql, params=None):
+    """Statement on the directory ([mysql] database): shard map, global ID sequences, listing cities."""
+    conn = get_conn()
+    try:
+        rows = _fetch(conn, sql, params)
+        conn.commit()
+        return rows
+    finally:
+        conn.close()
+
+def _city_key(city):
+    # MySQL compares cities case-insensitively; routing has to agree with it
+    return ("" if city is None else str(city)).strip().lower()
+
+_map = {"at": float("-inf"), "cities": {}, "lock": threading.Lock()}
+
+def shard_map(refresh=False):
+    """city key -> (shard, moving), re-read from the directory at most every SHARD_MAP_TTL seconds."""
+    with _map["lock"]:
+        if refresh or time.monotonic() - _map["at"] > SHARD_MAP_TTL:
+            rows = _directory("SELECT City, Shard, Moving FROM shard_map")
+            _map["cities"] = {_city_key(r["City"]): (r["Shard"], bool(r["Moving"])) for r in rows}
+            _map["at"] = time.monotonic()
+        return _map["cities"]
+
+def _hashed(key):
+    names = shard_names()
+    return names[zlib.crc32(key.encode()) % len(names)]
+
+def assign_cities(cities):
+    """Pin cities that aren't in the shard map yet to their hash shard (first write wins)."""
+    known = shard_map()
+    new = sorted({c.strip() for c in cities if c and c.strip() and _city_key(c) not in known})
+    if new:
+        conn = get_conn()
+        try:
+            cur = conn.cursor()
+            cur.executemany("INSERT IGNORE INTO shard_map (City, Shard) VALUES (%s, %s)",
+                            [(c, _hashed(_city_key(c))) for c in new])
+            conn.commit()
+            cur.close()
+        finally:
+            conn.close()
+        shard_map(refresh=True)
+
+def shard_for(city, write=False):
+    """Shard holding `city`. Writes pin a new city in the map and refuse one that is being moved."""
+    key = _city_key(city)
+    if write and key not in shard_map():
+        assign_cities([city])
+    shard, moving = shard_map().get(key, (None, False))
+    if write and moving:
+        raise ShardError(msg=f"City {city!r} is being moved to another shard; try again shortly.")
+    return shard or _hashed(key)
+
+def set_city(city, shard, moving=False):
+    """Point `city` at `shard` (rebalancing); other processes follow within SHARD_MAP_TTL."""
+    _directory(
+        "INSERT INTO shard_map (City, Shard, Moving) VALUES (%s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE Shard = VALUES(Shard), Moving = VALUES(Moving)",
+        (city, shard, int(moving)),
+    )
+    shard_map(refresh=True)
+
+def locate(table, id_col, value):
+    """(shard, row) holding table.id_col = value, or (None, None)."""
+    found = scatter(lambda conn: _fetch(conn, f"SELECT * FROM {table} WHERE {id_col} = %s", (value,), prepared=True))
+    for name, rows in found.items():
+        if rows:
+            return name, rows[0]
+    return None, None
+
+def lookup_names(table, id_col, name_col, ids, chunk=1000):
+    """{id: name} for `ids` from every shard (the app-side half of a cross-shard join)."""
+    ids = sorted({i for i in ids if i is not None})
+    out = {}
+    for k in range(0, len(ids), chunk):
+        part = ids[k:k + chunk]
+        sql = f"SELECT {id_col} AS id, {name_col} AS name FROM {table} WHERE {id_col} IN ({','.join(['%s'] * len(part))})"
+        for rows in scatter(lambda conn: _fetch(conn, sql, tuple(part))).values():
+            out.update((r["id"], r["name"]) for r in rows)
+    return out
+
+def allocate_ids(name, n):
     """
-    CREATE TABLE IF NOT EXISTS claims (
-      Claim_ID INT PRIMARY KEY,
-      Food_ID INT NOT NULL,
-      Receiver_ID INT NOT NULL,
-      Status VARCHAR(20) DEFAULT 'Pending',
-      Timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-    ) ENGINE=InnoDB;
+    Reserve n consecutive IDs from an id_sequences row on [mysql]: the directory when sharded (claims are
+    numbered across all shards), else the database itself. Safe across app processes: the row is locked.
     """
-)
+    conn = get_conn()
+    try:
+        cur = conn.cursor()
+        cur.execute("UPDATE id_sequences SET Last_ID = LAST_INSERT_ID(Last_ID + %s) WHERE Name = %s", (n, name))
+        if cur.rowcount != 1:  # no such sequence: LAST_INSERT_ID() would be some earlier, unrelated value
+            conn.rollback()
+            fix = "run `python sharding.py init`" if sharded() else "db.ensure_schema() creates it"
+            raise ShardError(msg=f"ID sequence {name!r} is missing from id_sequences; {fix}.")
+        cur.execute("SELECT LAST_INSERT_ID()")
+        last = int(cur.fetchone()[0])
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
+    return last - n + 1
+
+def reserve_ids(name, upto):
+    """Move a sequence past IDs written explicitly (imports)."""
+    _directory(RESERVE_SQL, (name, int(upto or 0)))
+
+def _shard_conn(city=None, shard=None, write=False):
+    if shard is None:
+        if city is None:
+            raise ValueError("sharding is enabled: pass city= or shard= to say which shard this goes to")
+        shard = shard_for(city, write=write)
+    return _checkout(_shard_pools()[shard])
+
+def _shard_read(sql, params, city, shard, merge):
+    if city is not None or shard is not None:
+        conn = _shard_conn(city, shard)
+        try:
+            return _fetch(conn, sql, params, prepared=True)
+        finally:
+            conn.close()
+    from sharding import merge_rows  # deferred: only sharded deployments need it
+    parts = scatter(lambda conn: _fetch(conn, sql, params, prepared=True))
+    return merge_rows(parts.values(), merge, lookup_names)
+
+# ---------- public helpers ----------
+def run_q(sql, params=None, primary=False, city=None, shard=None, merge=None):
+    """
+    Read query; goes to a replica when configured and safe (primary=True forces the primary).
+    Sharded: city=/shard= read one shard, otherwise all shards are read in parallel and
+    combined by `merge` (a sharding.Merge; None just concatenates).
+    """
+    if sharded():
+        return _shard_read(sql, params, city, shard, merge)
+    pool, gtid = (_pool(), None) if primary else _read_target()
+    if pool is not _pool():
+        try:
+            conn = _checkout(pool)
+        except mysql.connector.Error:
+            conn = None  # replica down between health checks: fall through to the primary
+        if conn is not None:
+            try:
+                if gtid is None or _replica_caught_up(conn, gtid, _settings()["gtid_wait_timeout"]):
+                    return _fetch(conn, sql, params, prepared=True)
+            except mysql.connector.Error:
+                pass  # replica failed mid-query (dropped, restarted, ...): retry once on the primary
+            finally:
+                try:
+                    conn.close()
+                except mysql.connector.Error:
+                    pass  # a dead connection can fail its reset on the way back to the pool
+    conn = get_conn()
+    try:
+        return _fetch(conn, sql, params, prepared=True)
+    finally:
+        conn.close()
+
+def _write_conn(city=None, shard=None):
+    return _shard_conn(city, shard, write=True) if sharded() else get_conn()
+
+def run_exec(sql, params=None, city=None, shard=None):
+    """
+    params: tuple -> execute
+            list[tuple] -> executemany
+    Sharded: runs on the shard of `city` (or on `shard`).
+    """
+    conn = _write_conn(city, shard)
+    try:
+        if isinstance(params, list):
+            # text protocol on purpose: the connector folds INSERT executemany into one multi-row
+            # statement, while a prepared cursor would send one round trip per row
+            cur = conn.cursor()
+            cur.executemany(sql, params)
+            cur.close()
+        else:
+            _fetch(conn, sql, params, prepared=True)
+        conn.commit()
+        note_write(conn)
+    finally:
+        conn.close()
+
+@contextmanager
+def transaction(city=None, shard=None):
+    """Dict cursor inside ONE transaction on the primary (or one shard); commits on success, rolls back on error."""
+    conn = _write_conn(city, shard)
+    try:
+        cur = conn.cursor(dictionary=True)
+        try:
+            conn.start_transaction()
+            yield cur
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+        note_write(conn)
+    finally:
+        conn.close()
+
+def run_tx(statements, city=None, shard=None):
+    """Run [(sql, params), ...] as ONE transaction on the primary (or one shard); all or nothing."""
+    with transaction(city, shard) as cur:
+        for sql, params in statements:
+            cur.execute(sql, params or ())
+
+@contextmanager
+def snapshot(shard=None):
+    """run_q-style reader over ONE consistent InnoDB snapshot on the primary or `shard` (multi-query builds)."""
+    conn = get_conn() if shard is None else _shard_conn(shard=shard)
+    try:
+        conn.start_transaction(consistent_snapshot=True, isolation_level="REPEATABLE READ", readonly=True)
+        try:
+            yield lambda sql, params=None: _fetch(conn, sql, params)
+        finally:
+            conn.rollback()
+    finally:
+        conn.close()
+
+@contextmanager
+def snapshots():
+    """{stream: snapshot reader} over every database at once (one per shard when sharded)."""
+    with ExitStack() as stack:
+        yield {name: stack.enter_context(snapshot(**route)) for name, route in databases()}
+
+def max_allowed_packet(default=4 * 1024 * 1024):
+    """Server's max_allowed_packet in bytes (falls back to the 4 MiB MySQL default)."""
+    try:
+        rows = run_q("SELECT @@max_allowed_packet AS p")
+        return int(rows[0]["p"]) if rows else default
+    except mysql.connector.Error:
+        return default
 
+# ---------- schema (definitions and per-database setup: schema.py) ----------
 def ensure_schema():
-    for stmt in SCHEMA:
-        run_exec(stmt)
+    """Tables, late columns/indexes and backfills on the database, or on every shard plus the directory."""
+    for _, route in databases():
+        setup_database(partial(run_q, **route), partial(run_exec, **route), partial(transaction, **route),
+                       sequences=not sharded())
+    if sharded():
+        for stmt in SHARD_SCHEMA:
+            _directory(stmt)
+        tops = scatter(lambda conn: _fetch(conn, "SELECT COALESCE(MAX(Claim_ID), 0) AS top FROM claims", None))
+        reserve_ids("claims", max(int(rows[0]["top"]) for rows in tops.values()))
@@ -0,0 +1,239 @@
+# dedup.py — near-duplicate providers/receivers via blocking + vectorized similarity
+#
+# 1) normalize Name / Address / City / Contact
+# 2) blocking keys: (soundex of name, city) and (normalized contact) — only records sharing a key are compared;
+#    a block over MAX_BLOCK is split again on a second key, and what is still too big is reported, not compared
+# 3) inside each block: hashed character-trigram vectors, cosine similarity as one matrix product
+# 4) score = weighted name / address similarity + exact contact match; pairs above a threshold are candidates
+import zlib
+
+import numpy as np
+import pandas as pd
+
+import claim_events
+from contacts import COLUMNS as CONTACT_COLUMNS, normalize as normalize_contacts
+
+DIM = 1024          # hashed trigram space
+MAX_BLOCK = 500     # larger blocks are split on a second key (quadratic cost); still larger: skipped and reported
+THRESHOLD = 0.75
+_BLOCK_LABELS = {1: "name+city", 2: "contact", 3: "name+city,contact"}
+
+KINDS = {
+    "providers": {"id": "Provider_ID", "ref_table": "food_listings"},
+    "receivers": {"id": "Receiver_ID", "ref_table": "claims"},
+}
+
+_LEGAL = r"\b(inc|llc|ltd|plc|co|corp|group|and|the)\b"
+
+# ---------- normalization (vectorized with pandas .str) ----------
+def norm_name(s: pd.Series) -> pd.Series:
+    return (s.fillna("").str.lower()
+             .str.replace("&", " and ", regex=False)
+             .str.replace(r"[^a-z0-9 ]+", " ", regex=True)
+             .str.replace(_LEGAL, " ", regex=True)
+             .str.replace(r"\s+", " ", regex=True).str.strip())
+
+def norm_text(s: pd.Series) -> pd.Series:
+    return (s.fillna("").str.lower()
+             .str.replace(r"[^a-z0-9 ]+", " ", regex=True)
+             .str.replace(r"\s+", " ", regex=True).str.strip())
+
+def contact_key(df: pd.DataFrame) -> pd.Series:
+    """E.164 phone, else email; uses the stored normalized columns when the rows came from the DB."""
+    if all(c in df.columns for c in CONTACT_COLUMNS):
+        norm = df[list(CONTACT_COLUMNS)]
+    else:
+        norm = normalize_contacts(df.get("Contact", pd.Series("", index=df.index)))
+    return norm["Contact_E164"].fillna(norm["Contact_Email"]).fillna("").astype(str)
+
+_SOUNDEX = str.maketrans("bfpvcgjkqsxzdtlmnr", "111122222222334556")
+
+def soundex(word: str) -> str:
+    if not word:
+        return ""
+    head, tail = word[0], word[1:].translate(_SOUNDEX)
+    out, last = [], word[0].translate(_SOUNDEX)
+    for ch in tail:
+        if ch.isdigit() and ch != last:
+            out.append(ch)
+        if ch not in "hw":
+            last = ch
+    return (head.upper() + "".join(out) + "000")[:4]
+
+# ---------- similarity ----------
+def _trigram_ids(texts):
+    """CSR-style (indptr, ids) of hashed trigrams for each text."""
+    indptr, ids = [0], []
+    for t in texts:
+        t = f"  {t} "
+        ids.extend(zlib.crc32(t[i:i + 3].encode()) % DIM for i in range(len(t) - 2))
+        indptr.append(len(ids))
+    return np.asarray(indptr, dtype=np.int64), np.asarray(ids, dtype=np.int64)
+
+def _block_vectors(rows, indptr, ids):
+    """Dense L2-normalized trigram vectors for the records of one block."""
+    lens = indptr[rows + 1] - indptr[rows]
+    flat = np.concatenate([ids[indptr[r]:indptr[r + 1]] for r in rows])
+    v = np.zeros((len(rows), DIM), dtype=np.float32)
+    np.add.at(v, (np.repeat(np.arange(len(rows)), lens), flat), 1.0)
+    n = np.linalg.norm(v, axis=1, keepdims=True)
+    return v / np.where(n == 0, 1, n)
+
+def _pairs_from_blocks(keys: pd.Series, split: pd.Series, oversize: list):
+    """
+    Yield index arrays of blocks with 2+ members for one blocking key. A block over MAX_BLOCK is
+    grouped again by `split` (a second key); sub-blocks still over MAX_BLOCK go to `oversize` as
+    (key, rows) instead of being compared.
+    """
+    keys = keys[keys != ""]
+    for key, idx in keys.groupby(keys).groups.items():
+        if len(idx) <= MAX_BLOCK:
+            if len(idx) >= 2:
+                yield np.asarray(idx)
+            continue
+        sub = split[idx]
+        for sub_key, sub_idx in sub.groupby(sub).groups.items():
+            if len(sub_idx) > MAX_BLOCK:
+                oversize.append((f"{key} / {sub_key}", len(sub_idx)))
+            elif len(sub_idx) >= 2:
+                yield np.asarray(sub_idx)
+
+# ---------- main entry ----------
+def find_candidates(df: pd.DataFrame, kind: str, threshold=THRESHOLD, skipped=None) -> pd.DataFrame:
+    """
+    df: rows of `providers` or `receivers` (DB column names).
+    Returns one row per candidate pair, best score first.
+    skipped: a list to receive {"blocks", "key", "rows"} for each block too big to compare even after splitting.
+    """
+    id_col = KINDS[kind]["id"]
+    df = df.reset_index(drop=True)
+    name = norm_name(df["Name"])
+    city = norm_text(df.get("City", pd.Series("", index=df.index)))
+    addr = norm_text(df.get("Address", pd.Series("", index=df.index)))
+    contact = contact_key(df)
+    first = name.str.split(" ", n=1).str[0].fillna("")
+
+    first_sx = first.map(soundex)
+    last_sx = name.str.rsplit(" ", n=1).str[1].fillna("").map(soundex)  # "" for one-word names
+    blocks = {                                  # bit flag per blocking key: (key, second key for big blocks)
+        1: (first_sx + "|" + city, last_sx),    # name+city, then the name's last word
+        2: (contact, first_sx),                 # contact (e.g. a shared switchboard), then the name
+    }
+    n_ptr, n_ids = _trigram_ids(name)
+    a_ptr, a_ids = _trigram_ids(addr)
+
+    parts = []
+    for bit, (keys, split) in blocks.items():
+        oversize = []
+        for rows in _pairs_from_blocks(keys.where(name != "", ""), split, oversize):
+            nv = _block_vectors(rows, n_ptr, n_ids)
+            av = _block_vectors(rows, a_ptr, a_ids)
+            i, j = np.triu_indices(len(rows), k=1)
+            # one block x block Gram matrix each (400 rows: 0.6 MB) instead of
+            # gathering a DIM-wide vector per pair (nv[i], nv[j]: ~660 MB)
+            parts.append(pd.DataFrame({
+                "a": rows[i], "b": rows[j],
+                "name_sim": (nv @ nv.T)[i, j],
+                "addr_sim": (av @ av.T)[i, j],
+                "bit": bit,
+            }))
+        if skipped is not None:
+            skipped.extend({"blocks": _BLOCK_LABELS[bit], "key": key, "rows": n} for key, n in oversize)
+
+    cols = [f"{id_col}_a", f"{id_col}_b", "Name_a", "Name_b", "name_sim",
+            "addr_sim", "contact_match", "city_match", "score", "blocks"]
+    if not parts:
+        return pd.DataFrame(columns=cols)
+    # a pair found by several blocking keys is compared once
+    pairs = (pd.concat(parts, ignore_index=True)
+               .groupby(["a", "b"], as_index=False, sort=False)
+               .agg(name_sim=("name_sim", "first"), addr_sim=("addr_sim", "first"), bit=("bit", "sum")))
+    a, b = pairs["a"].to_numpy(), pairs["b"].to_numpy()
+    s_name, s_addr = pairs["name_sim"].to_numpy(), pairs["addr_sim"].to_numpy()
+    contact_match = (contact.values[a] == contact.values[b]) & (contact.values[a] != "")
+    city_match = city.values[a] == city.values[b]
+    has_addr = (addr.values[a] != "") & (addr.values[b] != "")
+    # providers have an address to compare; receivers fall back on city agreement
+    second = np.where(has_addr, s_addr, city_match.astype(float))
+    score = 0.6 * s_name + 0.25 * contact_match + 0.15 * second
+
+    out = pd.DataFrame({
+        f"{id_col}_a": df[id_col].values[a],
+        f"{id_col}_b": df[id_col].values[b],
+        "Name_a": df["Name"].values[a],
+        "Name_b": df["Name"].values[b],
+        "name_sim": s_name.round(3),
+        "addr_sim": np.where(has_addr, s_addr, np.nan).round(3),
+        "contact_match": contact_match,
+        "city_match": city_match,
+        "score": score.round(3),
+        "blocks": pairs["bit"].map(_BLOCK_LABELS).to_numpy(),
+    })
+    return out[out["score"] >= threshold].sort_values("score", ascending=False).reset_index(drop=True)
+
+def clusters(pairs):
+    """Union-find over (id_a, id_b) pairs -> {keep_id: [drop_ids]} keeping the lowest ID of each group."""
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in pairs:
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+    groups = {}
+    for x in list(parent):
+        groups.setdefault(find(x), []).append(x)
+    return {keep: sorted(m for m in members if m != keep) for keep, members in groups.items()}
+
+MERGE_STEPS = ("repoint", "delete")
+
+def merge_statements(kind, keep_id, drop_ids, steps=MERGE_STEPS):
+    """SQL to fold drop_ids into keep_id: repoint references, then delete the duplicates."""
+    k = KINDS[kind]
+    marks = ",".join(["%s"] * len(drop_ids))
+    stmts = {
+        "repoint": (f"UPDATE {k['ref_table']} SET {k['id']}=%s WHERE {k['id']} IN ({marks})", (keep_id, *drop_ids)),
+        "delete": (f"DELETE FROM {kind} WHERE {k['id']} IN ({marks})", tuple(drop_ids)),
+    }
+    return [stmts[s] for s in steps]
+
+def merge(cur, kind, keep_id, drop_ids, steps=MERGE_STEPS):
+    """Run merge_statements on an open transaction cursor; repointed claims are logged as claim events."""
+    stmts = merge_statements(kind, keep_id, drop_ids, steps)
+
+    def change():
+        for sql, params in stmts:
+            cur.execute(sql, params)
+
+    if kind != "receivers" or "repoint" not in steps:
+        change()
+        return
+    marks = ",".join(["%s"] * len(drop_ids))
+    cur.execute(f"SELECT Claim_ID FROM claims WHERE Receiver_ID IN ({marks})", tuple(drop_ids))
+    claim_events.logged(cur, [r["Claim_ID"] for r in cur.fetchall()], change)
+
+def merge_plan(kind, keep_id, drop_ids):
+    """
+    [(steps, route)] to run merge(cur, kind, keep_id, drop_ids, steps) in, one transaction each, in order.
+    Unsharded, and for sharded providers (their listings must stay with them, so all on one shard):
+    one transaction. Sharded receivers' claims sit on any shard: claims are repointed on every shard
+    first and the duplicates deleted only after that, so a plan that stops part-way never leaves
+    claims pointing at a deleted receiver. Every step is idempotent: rerunning the plan finishes it.
+    """
+    import db
+    if not db.sharded():
+        return [(MERGE_STEPS, {})]
+    if kind == "receivers":
+        routes = [route for _, route in db.databases()]
+        return [(("repoint",), r) for r in routes] + [(("delete",), r) for r in routes]
+    homes = {db.locate(kind, KINDS[kind]["id"], i)[0] for i in (keep_id, *drop_ids)} - {None}
+    if len(homes) > 1:
+        raise db.ShardError(msg=f"{kind} {[keep_id, *drop_ids]} are spread over shards {sorted(homes)}; "
+                                "move their cities onto one shard first.")
+    return [(MERGE_STEPS, {"shard": homes.pop() if homes else db.shard_names()[0]})]
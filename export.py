@@ -0,0 +1,333 @@
+# export.py — streaming CSV/Parquet export straight off an unbuffered cursor
+#
+#   python export.py --table claims --format parquet -o claims.parquet
+#   python export.py --report 16 -o monthly.csv
+#   python export.py --report 4 --city "New Jessica"        # CSV to stdout
+#   python export.py --browse --location "South Kellyville" -o listings.csv
+#   python export.py --claim-events warehouse -o events-$(date +%s).csv  # only events since last run
+#   python export.py --claim-events warehouse --shard s1 -o events-s1.csv  # sharded: one log per shard
+#
+# Rows are pulled CHUNK at a time from a server-side (unbuffered) cursor and
+# encoded chunk by chunk, so peak memory is bounded by the chunk size, not the result.
+# Sharded mode: city= reads one shard; otherwise tables stream shard after shard, an order-only
+# merge (Browse) is a k-way merge of the shards' sorted streams, and merges that combine
+# rows (reports: per-group sums, names) are gathered first, then encoded.
+import argparse
+import csv
+import datetime as dt
+import decimal
+import heapq
+import io
+import sys
+from functools import partial
+from itertools import islice
+
+import mysql.connector
+from mysql.connector import FieldType
+
+from queries import CRUD_TABLES, SHARDED, browse_route, browse_sql, report_by_number
+
+CHUNK = 10_000
+FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+
+def iter_chunks(sql, params=None, chunk_size=CHUNK, city=None, shard=None, merge=None):
+    """Yield (columns, field_types, rows) chunk by chunk from an unbuffered cursor (sharded: see header)."""
+    import db
+    if not db.sharded():
+        yield from _cursor_chunks({}, sql, params, chunk_size)
+    elif city is not None or shard is not None:
+        yield from _cursor_chunks(db.shard_cfgs()[shard or db.shard_for(city)], sql, params, chunk_size)
+    elif merge is None:
+        for k, cfg in enumerate(db.shard_cfgs().values()):
+            for part in _cursor_chunks(cfg, sql, params, chunk_size):
+                if k == 0 or part[2]:  # only the first shard's empty chunk carries the header
+                    yield part
+    elif _order_only(merge):
+        yield from _merged_chunks(list(db.shard_cfgs().values()), sql, params, chunk_size, merge)
+    else:
+        rows = db.run_q(sql, params, merge=merge)
+        cols = list(rows[0]) if rows else []
+        for k in range(0, max(len(rows), 1), chunk_size):
+            yield cols, None, [tuple(r.values()) for r in rows[k:k + chunk_size]]  # types: inferred
+
+def _order_only(merge):
+    """True if `merge` only interleaves sorted shard results (one direction), so it can stream."""
+    combines = merge.keys or merge.sums or merge.ratios or merge.share or merge.names or merge.distinct
+    return not combines and merge.order_by and len({desc for _, desc in merge.order_by}) == 1
+
+def _merged_chunks(cfgs, sql, params, chunk_size, merge):
+    # each shard's query carries the same ORDER BY, so heapq.merge only ever holds one row per shard
+    streams = [_cursor_chunks(cfg, sql, params, chunk_size) for cfg in cfgs]
+    try:
+        heads = [next(s) for s in streams]  # first chunk of each: header/schema and maybe rows
+        cols, types = heads[0][0], heads[0][1]
+        at = [cols.index(c) for c, _ in merge.order_by]
+
+        def key(row):  # NULLs before values, like MySQL ascending (and after them descending)
+            return tuple((0,) if row[i] is None else (1, row[i]) for i in at)
+
+        def rows(head, stream):
+            yield from head[2]
+            for _, _, part in stream:
+                yield from part
+
+        merged = heapq.merge(*(rows(h, s) for h, s in zip(heads, streams)), key=key,
+                             reverse=merge.order_by[0][1])
+        if merge.limit:
+            merged = islice(merged, merge.limit)
+        first = True
+        while True:
+            chunk = list(islice(merged, chunk_size))
+            if not chunk and not first:
+                break
+            first = False
+            yield cols, types, chunk
+            if not chunk:
+                break
+    finally:
+        for s in streams:
+            s.close()
+
+def _cursor_chunks(cfg, sql, params, chunk_size):
+    # dedicated connection: a long stream shouldn't hold a pool slot
+    import db
+    conn = db.connect(**cfg)
+    cur = None
+    try:
+        cur = conn.cursor(buffered=False)
+        cur.execute(sql, params or ())
+        cols = list(cur.column_names)
+        types = [d[1] for d in cur.description]
+        first = True
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows and not first:
+                break
+            first = False
+            yield cols, types, rows  # first chunk may be empty: still carries the header/schema
+            if not rows:
+                break
+    finally:
+        if conn.unread_result:
+            _abandon(conn, cfg)
+        else:
+            try:
+                if cur is not None:
+                    cur.close()
+            finally:
+                conn.close()
+
+def _abandon(conn, cfg):
+    """
+    Drop a connection left mid-result (consumer stopped or failed) without reading the rest off
+    the wire: close the socket, then KILL QUERY from a fresh connection so the server stops too.
+    The connection is never pooled, so nothing can hand it out again.
+    """
+    import db
+    thread_id = conn.connection_id
+    conn.shutdown()  # no QUIT (that would drain the result first), just the socket
+    try:
+        killer = db.connect(**cfg)
+        try:
+            killer.cmd_query(f"KILL QUERY {int(thread_id)}")
+        finally:
+            killer.close()
+    except mysql.connector.Error:
+        pass  # the server gives up on its next write to the closed socket anyway
+
+# ---------- CSV ----------
+def csv_chunks(sql, params=None, chunk_size=CHUNK, **route):
+    """Generator of UTF-8 CSV bytes: header with the first block, then one block per chunk."""
+    header_done = False
+    for cols, _, rows in iter_chunks(sql, params, chunk_size, **route):
+        buf = io.StringIO()
+        w = csv.writer(buf)
+        if not header_done:
+            w.writerow(cols)
+            header_done = True
+        w.writerows(rows)
+        yield buf.getvalue().encode("utf-8")
+
+# ---------- Parquet ----------
+class _Spool:
+    """Write-only sink that hands bytes back as they're produced (keeps tell() monotonic)."""
+
+    def __init__(self):
+        self.parts, self.pos, self.closed = [], 0, False
+
+    def write(self, b):
+        self.parts.append(bytes(b))
+        self.pos += len(b)
+        return len(b)
+
+    def tell(self):
+        return self.pos
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self):
+        return True
+
+    def drain(self) -> bytes:
+        out = b"".join(self.parts)
+        self.parts.clear()
+        return out
+
+def _arrow_type(pa, field_type):
+    if field_type in (FieldType.TINY, FieldType.SHORT, FieldType.INT24, FieldType.LONG, FieldType.LONGLONG, FieldType.YEAR):
+        return pa.int64()
+    if field_type in (FieldType.FLOAT, FieldType.DOUBLE, FieldType.DECIMAL, FieldType.NEWDECIMAL):
+        return pa.float64()
+    if field_type == FieldType.DATE:
+        return pa.date32()
+    if field_type in (FieldType.DATETIME, FieldType.TIMESTAMP):
+        return pa.timestamp("us")
+    return pa.string()
+
+def _arrow_value(v):
+    if isinstance(v, decimal.Decimal):
+        return float(v)
+    if isinstance(v, (bytes, bytearray)):
+        return v.decode("utf-8", "replace")
+    if isinstance(v, dt.timedelta):
+        return str(v)
+    return v
+
+def parquet_chunks(sql, params=None, chunk_size=CHUNK, **route):
+    """Generator of Parquet bytes: one row group per chunk, footer at the end."""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow).") from e
+
+    spool, writer, schema = _Spool(), None, None
+    for cols, types, rows in iter_chunks(sql, params, chunk_size, **route):
+        if writer is None:
+            if types is None:  # merged rows: no cursor description, let Arrow infer
+                schema = pa.schema([(c, pa.array([_arrow_value(r[i]) for r in rows]).type)
+                                    for i, c in enumerate(cols)])
+            else:
+                schema = pa.schema([(c, _arrow_type(pa, t)) for c, t in zip(cols, types)])
+            writer = pq.ParquetWriter(pa.PythonFile(spool, mode="w"), schema)
+        arrays = [
+            pa.array([_arrow_value(r[i]) for r in rows], type=schema.field(i).type)
+            for i in range(len(cols))
+        ]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        yield spool.drain()
+    if writer is not None:
+        writer.close()
+        yield spool.drain()
+
+def stream(sql, params=None, fmt="csv", chunk_size=CHUNK, **route):
+    if fmt == "csv":
+        return csv_chunks(sql, params, chunk_size, **route)
+    if fmt == "parquet":
+        return parquet_chunks(sql, params, chunk_size, **route)
+    raise ValueError(f"Unknown export format {fmt!r}; expected one of {list(FORMATS)}")
+
+class ExportTooLarge(RuntimeError):
+    """write_to() passed max_bytes; what was written so far is not a usable file."""
+
+def write_to(fileobj, sql, params=None, fmt="csv", chunk_size=CHUNK, max_bytes=None, **route) -> int:
+    """
+    Drain the export generator into a binary file object; returns bytes written. **route: city/shard/merge.
+    max_bytes: stop (and abandon the query) once the output would pass it, raising ExportTooLarge.
+    """
+    n = 0
+    parts = stream(sql, params, fmt, chunk_size, **route)
+    try:
+        for part in parts:
+            n += len(part)
+            if max_bytes is not None and n > max_bytes:
+                raise ExportTooLarge(f"export is larger than {max_bytes / 2**20:.0f} MB")
+            fileobj.write(part)
+    finally:
+        parts.close()  # early exit: unwinds down to _cursor_chunks, which abandons the query
+    return n
+
+# ---------- incremental claim_events export ----------
+EVENTS_RANGE_SQL = "SELECT * FROM claim_events WHERE Seq > %s AND Seq <= %s ORDER BY Seq"
+
+def _direct(sql, params=None, shard=None):
+    """run_q/run_exec stand-in on a dedicated connection (CLI: no Streamlit session or pool)."""
+    from db import connect, shard_cfgs
+    conn = connect(**(shard_cfgs()[shard] if shard else {}))
+    try:
+        cur = conn.cursor(dictionary=True)
+        cur.execute(sql, params or ())
+        rows = cur.fetchall() if cur.with_rows else []
+        conn.commit()
+        cur.close()
+        return rows
+    finally:
+        conn.close()
+
+def events_range(consumer, shard=None):
+    """(sql, params, upto) for the events `consumer` hasn't exported yet (from `shard`'s log when sharded)."""
+    from claim_events import head, load_offset
+    direct = partial(_direct, shard=shard)
+    start, upto = load_offset(direct, consumer), head(direct)
+    return EVENTS_RANGE_SQL, (start, upto), upto
+
+# ---------- CLI ----------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Stream a table, report or Browse result to CSV/Parquet.")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--table", choices=CRUD_TABLES, help="export a whole table")
+    src.add_argument("--report", type=int, help="export a Reports & Insights query by number")
+    src.add_argument("--browse", action="store_true", help="export a Browse & Filter result")
+    src.add_argument("--claim-events", metavar="CONSUMER",
+                     help="export claim events after CONSUMER's saved offset, then advance it")
+    ap.add_argument("--city", help="city for report 4")
+    ap.add_argument("--shard", help="sharded mode: the shard whose claim event log --claim-events reads")
+    ap.add_argument("--location", default="All", help="Browse filter: Location")
+    ap.add_argument("--provider", default="All", help="Browse filter: provider name")
+    ap.add_argument("--food-type", default="All", help="Browse filter: Food_Type")
+    ap.add_argument("--format", choices=list(FORMATS), default="csv")
+    ap.add_argument("--chunk", type=int, default=CHUNK, help="rows per fetch / row group")
+    ap.add_argument("-o", "--out", help="output file (default: stdout)")
+    args = ap.parse_args(argv)
+
+    from db import sharded
+    params = upto = None
+    route = {}
+    if args.claim_events:
+        if sharded() != bool(args.shard):
+            ap.error("--shard is required with sharding enabled (each shard has its own log), and only then")
+        sql, params, upto = events_range(args.claim_events, args.shard)
+        route = {"shard": args.shard} if args.shard else {}
+    elif args.table:
+        sql = f"SELECT * FROM {args.table}"
+    elif args.browse:
+        sql, params = browse_sql(args.location, args.provider, args.food_type)
+        route = browse_route(args.location)
+    else:
+        title, sql = report_by_number(args.report)
+        if "%s" in sql:
+            if not args.city:
+                ap.error(f"report {title!r} needs --city")
+            params = (args.city,)
+            route = {"city": args.city}
+        elif sharded():
+            sql, route["merge"] = SHARDED[title]
+
+    if args.out:
+        with open(args.out, "wb") as f:
+            n = write_to(f, sql, params, args.format, args.chunk, **route)
+        print(f"wrote {n:,} bytes to {args.out}", file=sys.stderr)
+    else:
+        write_to(sys.stdout.buffer, sql, params, args.format, args.chunk, **route)
+    if upto is not None:  # only after the file is fully written
+        from claim_events import save_offset
+        save_offset(partial(_direct, shard=args.shard), args.claim_events, upto)
+        print(f"{args.claim_events}: events {params[0] + 1:,}..{upto:,}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
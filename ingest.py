@@ -0,0 +1,200 @@
+# ingest.py — shared CSV -> MySQL mapping, cleaning and upsert SQL
+# (used by the Streamlit import page and the headless bulk_load.py CLI)
+import pandas as pd
+
+from contacts import COLUMNS as CONTACT_COLUMNS, normalize as normalize_contacts
+
+# -------- tiny helpers --------
+def _truncate(v, n):
+    if v is None:
+        return None
+    s = str(v)
+    return s[:n]
+
+def _clean(v):
+    # Turn NaN/NaT into None so MySQL accepts them
+    try:
+        if pd.isna(v):
+            return None
+    except Exception:
+        pass
+    return v
+
+# ----- canonical schemas (DB column names) -----
+CANON = {
+    "providers": {
+        "Provider_ID": ["provider_id","providerid","id"],
+        "Name":        ["name","providername"],
+        "Type":        ["type","providertype"],
+        "Address":     ["address","addr","street"],
+        "City":        ["city","locationcity"],
+        "Contact":     ["contact","phone","phone_number","phonenumber","contactnumber","email"],
+    },
+    "receivers": {
+        "Receiver_ID": ["receiver_id","receiverid","id"],
+        "Name":        ["name","receivername"],
+        "Type":        ["type"],
+        "City":        ["city"],
+        "Contact":     ["contact","phone","phone_number","phonenumber","contactnumber","email"],
+    },
+    "food_listings": {
+        "Food_ID":       ["food_id","foodid","id"],
+        "Food_Name":     ["food_name","foodname","name"],
+        "Quantity":      ["quantity","qty","count"],
+        "Expiry_Date":   ["expiry_date","expiredate","expdate","expiry"],
+        "Provider_ID":   ["provider_id","providerid"],
+        "Provider_Type": ["provider_type","providertype","type"],
+        "Location":      ["location","city","area"],
+        "Food_Type":     ["food_type","foodtype","category"],
+        "Meal_Type":     ["meal_type","mealtype"],
+    },
+    "claims": {
+        "Claim_ID":    ["claim_id","claimid","id"],
+        "Food_ID":     ["food_id","foodid"],
+        "Receiver_ID": ["receiver_id","receiverid"],
+        "Status":      ["status"],
+        "Timestamp":   ["timestamp","created_at","createdat","time"],
+    },
+}
+
+def norm(s: str) -> str:
+    return "".join(ch for ch in s.lower() if ch.isalnum())
+
+def make_mapper(table: str, cols):
+    # Build reverse lookup {normalized_source: canonical}
+    rev = {}
+    for canon, alts in CANON[table].items():
+        for a in [canon] + alts:
+            rev[norm(a)] = canon
+    mapping = {}
+    for c in cols:
+        nc = norm(c)
+        mapping[c] = rev.get(nc)  # None if unknown
+    return mapping
+
+def apply_mapping(df: pd.DataFrame, table: str) -> pd.DataFrame:
+    mapping = make_mapper(table, df.columns)
+    # columns we successfully mapped
+    mapped = {src: dst for src, dst in mapping.items() if dst}
+    df = df.rename(columns=mapped)
+    required = set(CANON[table].keys())
+    have = set(df.columns) & required
+    missing = list(required - have)
+    return df, mapped, missing
+
+# ----- upsert statements + row builders (one per table) -----
+UPSERT_SQL = {
+    "providers": """
+        INSERT INTO providers(Provider_ID,Name,Type,Address,City,Contact,
+                              Contact_E164,Contact_Ext,Contact_Email,Contact_Kind)
+        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+        ON DUPLICATE KEY UPDATE Name=VALUES(Name),Type=VALUES(Type),
+        Address=VALUES(Address),City=VALUES(City),Contact=VALUES(Contact),
+        Contact_E164=VALUES(Contact_E164),Contact_Ext=VALUES(Contact_Ext),
+        Contact_Email=VALUES(Contact_Email),Contact_Kind=VALUES(Contact_Kind)
+    """,
+    "receivers": """
+        INSERT INTO receivers(Receiver_ID,Name,Type,City,Contact,
+                              Contact_E164,Contact_Ext,Contact_Email,Contact_Kind)
+        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
+        ON DUPLICATE KEY UPDATE Name=VALUES(Name),Type=VALUES(Type),
+        City=VALUES(City),Contact=VALUES(Contact),
+        Contact_E164=VALUES(Contact_E164),Contact_Ext=VALUES(Contact_Ext),
+        Contact_Email=VALUES(Contact_Email),Contact_Kind=VALUES(Contact_Kind)
+    """,
+    "food_listings": """
+        INSERT INTO food_listings(Food_ID,Food_Name,Quantity,Expiry_Date,Provider_ID,Provider_Type,Location,Food_Type,Meal_Type)
+        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s)
+        ON DUPLICATE KEY UPDATE Food_Name=VALUES(Food_Name),Quantity=VALUES(Quantity),
+        Expiry_Date=VALUES(Expiry_Date),Provider_ID=VALUES(Provider_ID),Provider_Type=VALUES(Provider_Type),
+        Location=VALUES(Location),Food_Type=VALUES(Food_Type),Meal_Type=VALUES(Meal_Type)
+    """,
+    "claims": """
+        INSERT INTO claims(Claim_ID,Food_ID,Receiver_ID,Status,Timestamp)
+        VALUES (%s,%s,%s,%s,%s)
+        ON DUPLICATE KEY UPDATE Food_ID=VALUES(Food_ID),Receiver_ID=VALUES(Receiver_ID),
+        Status=VALUES(Status),Timestamp=VALUES(Timestamp)
+    """,
+}
+
+# ----- row builders (module-level so process pools can pickle them) -----
+def _contact_fields(r):
+    # filled in by build_rows() from contacts.normalize (one vectorized pass per file)
+    return tuple(_clean(r.get(c)) for c in CONTACT_COLUMNS)
+
+def provider_row(r):
+    return (
+        int(r["Provider_ID"]),
+        _truncate(_clean(r.get("Name")), 100),
+        _truncate(_clean(r.get("Type")), 50),
+        _truncate(_clean(r.get("Address")), 255),
+        _truncate(_clean(r.get("City")), 100),
+        _truncate(_clean(r.get("Contact")), 100),
+        *_contact_fields(r),
+    )
+
+def receiver_row(r):
+    return (
+        int(r["Receiver_ID"]),
+        _truncate(_clean(r.get("Name")), 100),
+        _truncate(_clean(r.get("Type")), 50),
+        _truncate(_clean(r.get("City")), 100),
+        _truncate(_clean(r.get("Contact")), 100),
+        *_contact_fields(r),
+    )
+
+def food_row(r):
+    return (
+        int(r["Food_ID"]),
+        _truncate(_clean(r.get("Food_Name")), 120),
+        int(_clean(r.get("Quantity", 0)) or 0),
+        _clean(r.get("Expiry_Date")),
+        int(r["Provider_ID"]),
+        _truncate(_clean(r.get("Provider_Type")), 50),
+        _truncate(_clean(r.get("Location")), 100),
+        _truncate(_clean(r.get("Food_Type")), 50),
+        _truncate(_clean(r.get("Meal_Type")), 50),
+    )
+
+def claim_row(r):
+    return (
+        int(r["Claim_ID"]),
+        int(r["Food_ID"]),
+        int(r["Receiver_ID"]),
+        _truncate(_clean(r.get("Status", "Pending")), 20),
+        _clean(r.get("Timestamp")),
+    )
+
+ROW_BUILDERS = {
+    "providers": provider_row,
+    "receivers": receiver_row,
+    "food_listings": food_row,
+    "claims": claim_row,
+}
+
+# load order: a table only depends on tables in earlier stages
+LOAD_STAGES = [["providers", "receivers"], ["food_listings"], ["claims"]]
+
+def coerce_types(df: pd.DataFrame, table: str) -> pd.DataFrame:
+    """Parse date/datetime columns and normalize contacts, after renaming to canonical names."""
+    if table == "food_listings" and "Expiry_Date" in df.columns:
+        df["Expiry_Date"] = pd.to_datetime(df["Expiry_Date"], errors="coerce").dt.date
+    if table == "claims" and "Timestamp" in df.columns:
+        df["Timestamp"] = pd.to_datetime(df["Timestamp"], errors="coerce")
+    if table in ("providers", "receivers") and "Contact" in df.columns:
+        df = df.drop(columns=[c for c in CONTACT_COLUMNS if c in df.columns])
+        df = df.join(normalize_contacts(df["Contact"].astype("string").str.slice(0, 100)))
+    return df
+
+def build_rows(df: pd.DataFrame, table: str) -> list:
+    """Canonical-column DataFrame -> list of upsert tuples."""
+    df = coerce_types(df, table)
+    build = ROW_BUILDERS[table]
+    return [build(r) for r in df.to_dict(orient="records")]
+
+def parse_csv(path: str, table: str) -> list:
+    """Read + map + clean one CSV into upsert tuples (safe to run in a worker process)."""
+    df, _, missing = apply_mapping(pd.read_csv(path), table)
+    if missing:
+        raise KeyError(f"{path}: missing required columns for `{table}`: {missing}")
+    return build_rows(df, table)
@@ -0,0 +1,121 @@
+# queries.py — SQL shared by the app pages, exports and CLIs
+from sharding import Merge
+
+BROWSE_SQL = """
+    SELECT fl.Food_ID, fl.Food_Name, fl.Quantity, fl.Expiry_Date,
+           fl.Provider_ID, p.Name AS Provider_Name, p.Type AS Provider_Type,
+           fl.Location, fl.Food_Type, fl.Meal_Type, p.Contact,
+           p.Contact_E164, p.Contact_Ext, p.Contact_Email
+    FROM food_listings fl
+    JOIN providers p ON p.Provider_ID = fl.Provider_ID
+"""
+
+def browse_sql(loc="All", prov="All", food="All"):
+    """Browse & Filter query for the selected dropdowns -> (sql, args)."""
+    where, args = [], []
+    if loc  != "All": where.append("fl.Location = %s");  args.append(loc)
+    if prov != "All": where.append("p.Name = %s");       args.append(prov)
+    if food != "All": where.append("fl.Food_Type = %s"); args.append(food)
+    sql = BROWSE_SQL
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY fl.Expiry_Date ASC"
+    return sql, args
+
+BROWSE_MERGE = Merge(order_by=(("Expiry_Date", False),))
+
+def browse_route(loc="All"):
+    """run_q routing for a Browse query in sharded mode: one city's shard, or all of them in expiry order."""
+    return {"city": loc} if loc != "All" else {"merge": BROWSE_MERGE}
+
+CRUD_TABLES = ["providers", "receivers", "food_listings", "claims"]
+
+# ---- Reports & Insights ----
+QUERIES = {
+    "1. Providers per city":
+        "SELECT city, COUNT(provider_id) AS no_of_food_providers FROM providers GROUP BY city ORDER BY 2 DESC;",
+    "2. Receivers per city":
+        "SELECT city, COUNT(receiver_id) AS no_of_receivers FROM receivers GROUP BY city ORDER BY 2 DESC;",
+    "3. Top provider types by quantity":
+        "SELECT provider_type, SUM(quantity) AS total_quantity FROM food_listings GROUP BY 1 ORDER BY 2 DESC;",
+    "4. Provider contacts in a city (enter city below)":
+        "SELECT name, type, address, city, contact FROM providers WHERE city = %s ORDER BY name;",
+    "5. Top receivers by successful claims":
+        "SELECT r.receiver_id, r.name, COUNT(*) AS successful_claims FROM claims c INNER JOIN receivers r ON r.receiver_id=c.receiver_id WHERE status='Completed' GROUP BY 1,2 ORDER BY 3 DESC;",
+    "6. Total quantity available":
+        "SELECT SUM(quantity) AS total_quantity_available FROM food_listings;",
+    "7. Listings count by city":
+        "SELECT location AS city, COUNT(*) AS listings_count FROM food_listings GROUP BY 1 ORDER BY 2 DESC;",
+    "8. Most common food types":
+        "SELECT food_type, COUNT(*) AS occurrences FROM food_listings GROUP BY 1 ORDER BY 2 DESC;",
+    "9. Claims per food item":
+        "SELECT fl.food_id, fl.food_name, COUNT(c.claim_id) AS claims_count FROM food_listings fl LEFT JOIN claims c ON c.food_id=fl.food_id GROUP BY 1,2 ORDER BY 3 DESC;",
+    "10. Provider with most completed claims":
+        "SELECT p.provider_id, p.name, COUNT(*) AS successful_claims FROM claims c JOIN food_listings fl ON fl.food_id=c.food_id JOIN providers p ON p.provider_id=fl.provider_id WHERE status='Completed' GROUP BY 1,2 ORDER BY 3 DESC;",
+    "11. Claims status % split":
+        "SELECT status, ROUND(COUNT(*)*100.0/(SELECT COUNT(*) FROM claims),2) AS percentage FROM claims GROUP BY 1;",
+    "12. Avg quantity claimed per receiver":
+        """
+        WITH successful_claims AS (
+          SELECT receiver_id, food_id FROM claims WHERE status='Completed'
+        )
+        SELECT r.receiver_id, r.name, ROUND(AVG(fl.quantity),2) AS avg_quantity_claimed
+        FROM successful_claims sc
+        JOIN receivers r ON r.receiver_id=sc.receiver_id
+        JOIN food_listings fl ON fl.food_id=sc.food_id
+        GROUP BY 1,2 ORDER BY 3 DESC;
+        """,
+    "13. Most-claimed meal types":
+        "SELECT fl.meal_type, COUNT(*) AS successful_claims FROM claims c JOIN food_listings fl ON fl.food_id=c.food_id WHERE status='Completed' GROUP BY 1 ORDER BY 2 DESC;",
+    "14. Total quantity donated by provider":
+        "SELECT p.provider_id, p.name, SUM(fl.quantity) AS total_qty_donated FROM food_listings fl INNER JOIN providers p ON p.provider_id=fl.provider_id GROUP BY 1,2 ORDER BY 3 DESC;",
+    "15. Highest demand locations (completed claims)":
+        "SELECT fl.Location, COUNT(*) AS completed_claims FROM claims c JOIN food_listings fl ON fl.food_id=c.food_id WHERE c.Status='Completed' GROUP BY fl.Location ORDER BY 2 DESC;",
+    # Timestamp is the creation time (edits leave it alone; their time is in claim_events)
+    "16. Claims created per month":
+        "SELECT DATE_FORMAT(Timestamp, '%Y-%m') AS month, COUNT(*) AS claims_created FROM claims GROUP BY 1 ORDER BY 1;"
+}
+
+def report_by_number(n):
+    """'16' -> ('16. Claims created per month', sql)."""
+    prefix = f"{int(n)}."
+    for title, sql in QUERIES.items():
+        if title.startswith(prefix):
+            return title, sql
+    raise KeyError(f"No report numbered {n}")
+
+# ---- the same reports in sharded mode: per-shard SQL + how the partial results merge ----
+# Per-shard GROUP BY partials are re-aggregated by sharding.merge_rows. Receivers usually live on
+# another shard than the listings they claim, so receiver (and provider) names are joined by ID
+# after the merge instead of in SQL. Report 4 is for one city and is routed there instead.
+def _totals(keys, col, desc=True):
+    return Merge(keys=keys, sums=(col,), order_by=((col, desc),))
+
+def _named(table, id_col, col, **kw):
+    return Merge(keys=(id_col,), names=(id_col, table, id_col, "name", "name"), order_by=((col, True),), **kw)
+
+SHARDED = {report_by_number(n)[0]: plan for n, plan in {
+    1: (report_by_number(1)[1], _totals(("city",), "no_of_food_providers")),
+    2: (report_by_number(2)[1], _totals(("city",), "no_of_receivers")),
+    3: (report_by_number(3)[1], _totals(("provider_type",), "total_quantity")),
+    5: ("SELECT receiver_id, COUNT(*) AS successful_claims FROM claims WHERE status='Completed' GROUP BY 1;",
+        _named("receivers", "receiver_id", "successful_claims", sums=("successful_claims",))),
+    6: (report_by_number(6)[1], Merge(sums=("total_quantity_available",))),
+    7: (report_by_number(7)[1], _totals(("city",), "listings_count")),
+    8: (report_by_number(8)[1], _totals(("food_type",), "occurrences")),
+    9: (report_by_number(9)[1], _totals(("food_id", "food_name"), "claims_count")),
+    10: ("SELECT fl.provider_id, COUNT(*) AS successful_claims FROM claims c JOIN food_listings fl ON fl.food_id=c.food_id "
+         "WHERE status='Completed' GROUP BY 1;",
+         _named("providers", "provider_id", "successful_claims", sums=("successful_claims",))),
+    11: ("SELECT status, COUNT(*) AS n FROM claims GROUP BY 1;",
+         Merge(keys=("status",), sums=("n",), share=("percentage", "n", 2), drop=("n",))),
+    12: ("SELECT c.receiver_id, SUM(fl.quantity) AS qty, COUNT(fl.quantity) AS n FROM claims c "
+         "JOIN food_listings fl ON fl.food_id=c.food_id WHERE c.status='Completed' GROUP BY 1;",
+         _named("receivers", "receiver_id", "avg_quantity_claimed", sums=("qty", "n"),
+                ratios=(("avg_quantity_claimed", "qty", "n", 2),), drop=("qty", "n"))),
+    13: (report_by_number(13)[1], _totals(("meal_type",), "successful_claims")),
+    14: ("SELECT provider_id, SUM(quantity) AS total_qty_donated FROM food_listings GROUP BY 1;",
+         _named("providers", "provider_id", "total_qty_donated", sums=("total_qty_donated",))),
+    15: (report_by_number(15)[1], _totals(("Location",), "completed_claims")),
+    16: (report_by_number(16)[1], Merge(keys=("month",), sums=("claims_created",), order_by=(("month", False),))),
+}.items()}
@@ -0,0 +1,133 @@
+# schema.py — table definitions and idempotent setup of ONE database (no streamlit, no pool)
+#
+# db.ensure_schema() runs setup_database() on the app's database (or every shard);
+# bulk_load.py runs it on a plain connection when given explicit connection settings.
+import claim_events
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS providers (
+      Provider_ID INT PRIMARY KEY,
+      Name VARCHAR(100) NOT NULL,
+      Type VARCHAR(50),
+      Address VARCHAR(255),
+      City VARCHAR(100),
+      Contact VARCHAR(100),
+      Contact_E164 VARCHAR(16),
+      Contact_Ext VARCHAR(10),
+      Contact_Email VARCHAR(100),
+      Contact_Kind VARCHAR(10),
+      INDEX ix_providers_e164 (Contact_E164),
+      INDEX ix_providers_email (Contact_Email)
+    ) ENGINE=InnoDB;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS receivers (
+      Receiver_ID INT PRIMARY KEY,
+      Name VARCHAR(100) NOT NULL,
+      Type VARCHAR(50),
+      City VARCHAR(100),
+      Contact VARCHAR(100),
+      Contact_E164 VARCHAR(16),
+      Contact_Ext VARCHAR(10),
+      Contact_Email VARCHAR(100),
+      Contact_Kind VARCHAR(10),
+      INDEX ix_receivers_e164 (Contact_E164),
+      INDEX ix_receivers_email (Contact_Email)
+    ) ENGINE=InnoDB;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS food_listings (
+      Food_ID INT PRIMARY KEY,
+      Food_Name VARCHAR(120) NOT NULL,
+      Quantity INT DEFAULT 0,
+      Expiry_Date DATE,
+      Provider_ID INT NOT NULL,
+      Provider_Type VARCHAR(50),
+      Location VARCHAR(100),
+      Food_Type VARCHAR(50),
+      Meal_Type VARCHAR(50)
+    ) ENGINE=InnoDB;
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS claims (
+      Claim_ID INT PRIMARY KEY,
+      Food_ID INT NOT NULL,
+      Receiver_ID INT NOT NULL,
+      Status VARCHAR(20) DEFAULT 'Pending',
+      Timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB;
+    """
+)
+
+# Claim_IDs come from a named sequence (db.allocate_ids), so app processes never pick the same one.
+# Unsharded it lives in the database itself; sharded, in the directory, covering every shard.
+ID_SEQUENCES = """
+    CREATE TABLE IF NOT EXISTS id_sequences (
+      Name VARCHAR(64) PRIMARY KEY,
+      Last_ID BIGINT NOT NULL
+    ) ENGINE=InnoDB;
+    """
+# move a sequence past IDs written explicitly (imports, rows from before the sequence existed)
+RESERVE_SQL = (
+    "INSERT INTO id_sequences (Name, Last_ID) VALUES (%s, %s) "
+    "ON DUPLICATE KEY UPDATE Last_ID = GREATEST(Last_ID, VALUES(Last_ID))"
+)
+
+# added after the first release: (table, column) -> type, and index name -> (table, columns).
+# setup_database() adds whatever an older database is missing.
+COLUMNS = {
+    (t, c): typ
+    for t in ("providers", "receivers")
+    for c, typ in (("Contact_E164", "VARCHAR(16)"), ("Contact_Ext", "VARCHAR(10)"),
+                   ("Contact_Email", "VARCHAR(100)"), ("Contact_Kind", "VARCHAR(10)"))
+}
+INDEXES = {
+    "ix_providers_e164": ("providers", "Contact_E164"),
+    "ix_providers_email": ("providers", "Contact_Email"),
+    "ix_receivers_e164": ("receivers", "Contact_E164"),
+    "ix_receivers_email": ("receivers", "Contact_Email"),
+    # joins behind the contact reverse lookup
+    "ix_food_listings_provider": ("food_listings", "Provider_ID"),
+    "ix_claims_receiver": ("claims", "Receiver_ID"),
+    "ix_claims_food": ("claims", "Food_ID"),
+}
+
+def migrate(q, ex):
+    have = {
+        (r["t"], r["c"]) for r in q(
+            "SELECT table_name AS t, column_name AS c FROM information_schema.columns "
+            "WHERE table_schema = DATABASE()", primary=True)
+    }
+    for table in sorted({t for t, _ in COLUMNS}):
+        add = [f"ADD COLUMN {c} {typ}" for (t, c), typ in COLUMNS.items() if t == table and (t, c) not in have]
+        if add:
+            ex(f"ALTER TABLE {table} " + ", ".join(add))
+    indexed = {
+        r["i"] for r in q(
+            "SELECT DISTINCT index_name AS i FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE()", primary=True)
+    }
+    for name, (table, cols) in INDEXES.items():
+        if name not in indexed:
+            ex(f"CREATE INDEX {name} ON {table} ({cols})")
+
+def setup_database(q, ex, tx, sequences=True):
+    """
+    Tables, late columns/indexes, the claim event log and contact backfills on one database.
+    q(sql, params=None, primary=False) -> list[dict]; ex(sql, params) runs a statement
+    (list params: executemany); tx() is a context manager yielding a dict cursor in a transaction.
+    sequences: also keep the claims ID sequence here (False for shards: it's in the directory).
+    """
+    from contacts import backfill  # deferred: pandas
+    for stmt in SCHEMA + claim_events.SCHEMA:
+        ex(stmt)
+    migrate(q, ex)
+    if sequences:
+        ex(ID_SEQUENCES)
+        top = q("SELECT COALESCE(MAX(Claim_ID), 0) AS top FROM claims", primary=True)[0]["top"]
+        ex(RESERVE_SQL, ("claims", int(top)))
+    with tx() as cur:
+        claim_events.bootstrap(cur)
+    backfill(q, ex, "providers", "Provider_ID")
+    backfill(q, ex, "receivers", "Receiver_ID")
@@ -0,0 +1,418 @@
+# sharding.py — city-sharded mode: merging scatter-gather results, partitioning writes, moving cities
+#
+#   python sharding.py init                        # tables on every shard + directory, pin existing cities
+#   python sharding.py status                      # rows and cities per shard, cities mid-move
+#   python sharding.py move "New Jessica" s1       # move one city (its providers, receivers,
+#                                                  # listings and their claims) to shard s1
+#
+# Placement: providers/receivers by City, food_listings by Location, claims with the listing
+# they claim. Listings are expected in their provider's city (true of the sample data), so
+# listing <-> provider joins stay on one shard; claims -> receivers crosses shards and is
+# joined app-side (Merge.names). Claim writes find their shard through the directory's
+# listing_cities (Food_ID -> city) and the shard map, not by asking every shard. CRUD writes find
+# an existing row the same way (plus a per-process row -> shard memory and the form's city), and
+# only ask every shard when none of those has it.
+# Routing and pools live in db.py; this module only imports it where needed.
+import argparse
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+CITY_COLUMN = {"providers": "City", "receivers": "City", "food_listings": "Location"}
+ROW_CITY = {"providers": 4, "receivers": 3, "food_listings": 6}  # position in ingest.UPSERT_SQL rows
+ROW_FOOD = 1                                                      # claims rows: Food_ID
+
+# ---------- scatter-gather ----------
+@dataclass(frozen=True)
+class Merge:
+    """
+    How per-shard partial results combine into one (hashable, so it can be part of a memo key).
+      keys      group-by columns; rows with equal keys across shards become one
+      sums      additive columns (per-shard COUNT / SUM) added up per group
+      ratios    (out, num, den, digits): out = round(num / den) after summing
+      share     (out, col, digits): out = col as a % of its total over all rows
+      names     (id_col, table, table_id, name_col, out): look names up on every shard and put
+                them after id_col; rows without a match are dropped (an inner join)
+      distinct  drop repeated rows
+      order_by  ((col, descending), ...) — NULLs sort first ascending, last descending, like MySQL
+      drop      helper columns removed at the end
+    """
+    keys: tuple = ()
+    sums: tuple = ()
+    ratios: tuple = ()
+    share: tuple = None
+    names: tuple = None
+    distinct: bool = False
+    order_by: tuple = ()
+    limit: int = None
+    drop: tuple = ()
+
+def _add(a, b):
+    return b if a is None else a if b is None else a + b
+
+def _group(rows, keys, sums):
+    out = {}
+    for r in rows:
+        k = tuple(r[c] for c in keys)
+        acc = out.get(k)
+        if acc is None:
+            out[k] = r
+        else:
+            for c in sums:
+                acc[c] = _add(acc[c], r[c])
+    return list(out.values())
+
+def _with(r, after, col, value):
+    out = {}
+    for k, v in r.items():
+        out[k] = v
+        if k == after:
+            out[col] = value
+    return out
+
+def merge_rows(parts, spec=None, lookup=None):
+    """
+    parts: one list[dict] per shard. lookup(table, id_col, name_col, ids) -> {id: name}
+    serves Merge.names (db.lookup_names).
+    """
+    rows = [dict(r) for part in parts for r in part]
+    if spec is None:
+        return rows
+    if spec.keys or spec.sums:
+        rows = _group(rows, spec.keys, spec.sums)
+    if spec.distinct:
+        rows = list({tuple(r.values()): r for r in rows}.values())
+    for out, num, den, digits in spec.ratios:
+        for r in rows:
+            r[out] = round(r[num] / r[den], digits) if r[den] else None
+    if spec.share:
+        out, col, digits = spec.share
+        total = sum(r[col] or 0 for r in rows)
+        for r in rows:
+            r[out] = round(100 * (r[col] or 0) / total, digits) if total else None
+    if spec.names:
+        id_col, table, table_id, name_col, out = spec.names
+        names = lookup(table, table_id, name_col, [r[id_col] for r in rows])
+        rows = [_with(r, id_col, out, names[r[id_col]]) for r in rows if r[id_col] in names]
+    for col, desc in reversed(spec.order_by):
+        rows.sort(key=lambda r: (r[col] is not None, r[col]), reverse=desc)
+    for r in rows:
+        for c in spec.drop:
+            r.pop(c, None)
+    return rows[:spec.limit] if spec.limit is not None else rows
+
+# ---------- placing writes ----------
+def note_listings(pairs, chunk=1000):
+    """Record (Food_ID, Location) pairs in the directory's listing_cities, which claim_home routes by."""
+    import db
+    pairs = [(int(f), c) for f, c in pairs if c]
+    for k in range(0, len(pairs), chunk):
+        part = pairs[k:k + chunk]
+        db._directory(
+            "INSERT INTO listing_cities (Food_ID, City) VALUES " + ",".join(["(%s,%s)"] * len(part))
+            + " ON DUPLICATE KEY UPDATE City = VALUES(City)",
+            tuple(v for pair in part for v in pair),
+        )
+
+def listing_shards(food_ids, chunk=1000):
+    """
+    {Food_ID: shard} for the listings that exist, asking every shard; refuses listings whose
+    city is being moved. Bulk loads use it; claim_home only falls back to it.
+    """
+    import db
+    ids = sorted({int(i) for i in food_ids})
+    out, seen = {}, []
+    for k in range(0, len(ids), chunk):
+        part = ids[k:k + chunk]
+        sql = f"SELECT Food_ID, Location FROM food_listings WHERE Food_ID IN ({','.join(['%s'] * len(part))})"
+        for shard, rows in db.scatter(lambda conn: db._fetch(conn, sql, tuple(part))).items():
+            for r in rows:
+                db.shard_for(r["Location"], write=True)  # raises while the city is moving
+                out[r["Food_ID"]] = shard
+                seen.append((r["Food_ID"], r["Location"]))
+    note_listings(seen)  # next time these route through the map
+    return out
+
+def claim_home(food_id):
+    """
+    Shard a claim on `food_id` is written to: the one holding the listing. The listing's city comes
+    from the directory (listing_cities) and goes through the shard map; the listing is then confirmed
+    on that one shard. Only a listing the directory doesn't know (or knows wrongly) asks every shard.
+    """
+    import db
+    fid = int(food_id)
+    known = db._directory("SELECT City FROM listing_cities WHERE Food_ID = %s", (fid,))
+    if known:
+        city = known[0]["City"]
+        shard = db.shard_for(city, write=True)  # raises while the city is moving
+        rows = db.run_q("SELECT Location FROM food_listings WHERE Food_ID = %s", (fid,), shard=shard)
+        if rows and db._city_key(rows[0]["Location"]) == db._city_key(city):
+            return shard
+    shard = listing_shards([fid]).get(fid)
+    if shard is None:
+        raise db.ShardError(msg=f"Food_ID {food_id} is not on any shard; a claim needs an existing listing.")
+    return shard
+
+HOMES_MAX = 10_000  # rows whose shard this process remembers for CRUD routing
+_homes = {"rows": OrderedDict(), "lock": threading.Lock()}
+
+def _remember(table, id_value, shard):
+    with _homes["lock"]:
+        rows = _homes["rows"]
+        rows[(table, int(id_value))] = shard
+        rows.move_to_end((table, int(id_value)))
+        while len(rows) > HOMES_MAX:
+            rows.popitem(last=False)
+
+def find_row(table, id_col, id_value, likely=()):
+    """
+    (shard, row) holding table.id_col = id_value, or (None, None). The likely shards are asked one at
+    a time first: where this process last saw the row, the directory's for a listing, then `likely`.
+    Every shard is asked (db.locate) only if none of them has it, e.g. for a new ID.
+    """
+    import db
+    with _homes["lock"]:
+        guesses = [_homes["rows"].get((table, int(id_value)))]
+    if table == "food_listings":
+        known = db._directory("SELECT City FROM listing_cities WHERE Food_ID = %s", (int(id_value),))
+        if known:
+            guesses.append(db.shard_for(known[0]["City"]))
+    sql = f"SELECT * FROM {table} WHERE {id_col} = %s"
+    for shard in dict.fromkeys(g for g in [*guesses, *likely] if g):
+        rows = db.run_q(sql, (id_value,), shard=shard)
+        if rows:
+            _remember(table, id_value, shard)
+            return shard, rows[0]
+    home, row = db.locate(table, id_col, id_value)
+    if home is not None:
+        _remember(table, id_value, home)
+    return home, row
+
+def _moved_away(table, id_col, id_value, home, target):
+    import db
+    return db.ShardError(msg=(
+        f"{table} {id_col}={id_value} is stored on shard {home!r} but would now belong on {target!r}; "
+        "delete it and add it again instead."
+    ))
+
+def route(table, id_col, id_value, city=None):
+    """
+    run_exec / transaction routing for a CRUD write on one row ({} when sharding is off).
+    Upserts (city given) go to the city's shard and are refused if the ID already lives on
+    another one; deletes (city=None) go to wherever the row is.
+    """
+    import db
+    if not db.sharded():
+        return {}
+    target = None if city is None else db.shard_for(city, write=True)
+    home, row = find_row(table, id_col, id_value, likely=[target])
+    if row is not None:  # refuse writes to a row whose city is mid-move
+        if table == "claims":
+            claim_home(row["Food_ID"])
+        else:
+            db.shard_for(row[CITY_COLUMN[table]], write=True)
+    if city is None:
+        return {"shard": home or db.shard_names()[0]}  # a missing row: the delete is a no-op anywhere
+    if home not in (None, target):
+        raise _moved_away(table, id_col, id_value, home, target)
+    if table == "food_listings":
+        note_listings([(id_value, city)])  # claim_home checks it against the shard, so a failed write is harmless
+    return {"shard": target}
+
+def claim_route(claim_id, food_id):
+    """Routing for saving claim `claim_id` on listing `food_id`: the listing's shard, which must hold the claim."""
+    import db
+    if not db.sharded():
+        return {}
+    target = claim_home(food_id)
+    home, _ = find_row("claims", "Claim_ID", claim_id, likely=[target])
+    if home not in (None, target):
+        raise _moved_away("claims", "Claim_ID", claim_id, home, target)
+    return {"shard": target}
+
+def partition(table, rows, food_shards=None):
+    """Split ingest rows (ingest.UPSERT_SQL order) by shard -> {shard: rows}; new cities are pinned."""
+    import db
+    if table == "claims":
+        if food_shards is None:
+            food_shards = listing_shards(r[ROW_FOOD] for r in rows)
+        missing = sorted({r[ROW_FOOD] for r in rows if r[ROW_FOOD] not in food_shards})
+        if missing:
+            raise db.ShardError(msg=(
+                f"{len(missing)} claimed Food_ID(s) are on no shard (e.g. {missing[:5]}); load food_listings first."
+            ))
+        home = lambda r: food_shards[r[ROW_FOOD]]
+    else:
+        col = ROW_CITY[table]
+        db.assign_cities({r[col] for r in rows if r[col]})
+        home = lambda r: db.shard_for(r[col], write=True)
+        if table == "food_listings":
+            note_listings((r[0], r[col]) for r in rows)
+    out = {}
+    for r in rows:
+        out.setdefault(home(r), []).append(r)
+    return out
+
+# ---------- rebalancing ----------
+MOVE_TABLES = (  # read in this order; deleted from the source in reverse
+    ("providers", "City = %s"),
+    ("receivers", "City = %s"),
+    ("food_listings", "Location = %s"),
+    ("claims", "Food_ID IN (SELECT Food_ID FROM food_listings WHERE Location = %s)"),
+)
+
+def _upsert_sql(table, cols):
+    return (f"INSERT INTO {table} ({','.join(cols)}) VALUES ({','.join(['%s'] * len(cols))}) "
+            "ON DUPLICATE KEY UPDATE " + ",".join(f"{c}=VALUES({c})" for c in cols))
+
+def move_city(city, target, settle=None, log=print):
+    """
+    Move every row of `city` from its shard to `target`:
+      1) mark the city as moving: writes to it are refused from then on
+      2) wait `settle` seconds (default SHARD_MAP_TTL + 1) so every process has seen the flag
+      3) copy the rows into `target` and delete them from the source, each in one transaction
+         (claims are logged as 'create' events on the target, 'delete' events on the source)
+      4) point the map at `target` and clear the flag
+    Copying is an upsert, so a move that failed after the target committed can simply be rerun.
+    Returns rows moved per table.
+    """
+    import claim_events
+    import db
+    if target not in db.shard_names():
+        raise ValueError(f"Unknown shard {target!r}; configured: {db.shard_names()}")
+    db.shard_map(refresh=True)
+    db.assign_cities([city])
+    source = db.shard_for(city)
+    moved = {t: 0 for t, _ in MOVE_TABLES}
+    if source == target:
+        db.set_city(city, target)
+        return moved
+
+    db.set_city(city, source, moving=True)
+    wait = db.SHARD_MAP_TTL + 1 if settle is None else settle
+    log(f"{city}: writes paused; waiting {wait:g}s for every process to notice")
+    time.sleep(wait)
+
+    src = db.connect(**db.shard_cfgs()[source])
+    dst = db.connect(**db.shard_cfgs()[target])
+    copied = False
+    try:
+        scur, dcur = src.cursor(dictionary=True), dst.cursor(dictionary=True)
+        src.start_transaction()
+        dst.start_transaction()
+        rows = {}
+        for table, where in MOVE_TABLES:
+            scur.execute(f"SELECT * FROM {table} WHERE {where} FOR UPDATE", (city,))
+            rows[table] = scur.fetchall()
+        for table, _ in MOVE_TABLES:
+            if not rows[table]:
+                continue
+            cols = list(rows[table][0])
+            params = [tuple(r[c] for c in cols) for r in rows[table]]
+            if table == "claims":
+                claim_events.upsert_rows(dcur, _upsert_sql(table, cols), params)
+            else:
+                dcur.executemany(_upsert_sql(table, cols), params)
+            moved[table] = len(params)
+        claim_where = MOVE_TABLES[-1][1]
+        claim_events.logged(scur, [r["Claim_ID"] for r in rows["claims"]],
+                            lambda: scur.execute(f"DELETE FROM claims WHERE {claim_where}", (city,)))
+        for table, where in reversed(MOVE_TABLES[:-1]):
+            scur.execute(f"DELETE FROM {table} WHERE {where}", (city,))
+        dst.commit()
+        copied = True
+        src.commit()
+    except Exception:
+        for conn in (dst, src):
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+        if copied:  # rows are on both shards: keep writes paused until the move is rerun
+            log(f"{city}: copied to {target} but not removed from {source}; rerun the move")
+        else:
+            db.set_city(city, source)
+        raise
+    finally:
+        src.close()
+        dst.close()
+    db.set_city(city, target)
+    log(f"{city}: {source} -> {target} {moved}")
+    return moved
+
+# ---------- admin ----------
+COUNTS_SQL = """
+    SELECT (SELECT COUNT(*) FROM providers) AS providers, (SELECT COUNT(*) FROM receivers) AS receivers,
+           (SELECT COUNT(*) FROM food_listings) AS food_listings, (SELECT COUNT(*) FROM claims) AS claims
+"""
+CITIES_SQL = """
+    SELECT City AS City FROM providers UNION SELECT City FROM receivers UNION SELECT Location FROM food_listings
+"""
+
+def _cities_by_shard():
+    import db
+    found = db.scatter(lambda conn: db._fetch(conn, CITIES_SQL, None))
+    return {shard: sorted(r["City"] for r in rows if r["City"]) for shard, rows in found.items()}
+
+def status():
+    """Rows and cities per shard; cities mid-move or present on more than one shard."""
+    import db
+    cities = _cities_by_shard()
+    counts = db.scatter(lambda conn: db._fetch(conn, COUNTS_SQL, None)[0])
+    seen = {}
+    for shard, names in cities.items():
+        for c in names:
+            seen.setdefault(db._city_key(c), []).append(shard)
+    return {
+        "shards": {s: {**counts[s], "cities": len(cities[s])} for s in db.shard_names()},
+        "mapped_cities": len(db.shard_map(refresh=True)),
+        "moving": sorted(k for k, (_, moving) in db.shard_map().items() if moving),
+        "split": {k: v for k, v in seen.items() if len(v) > 1},
+    }
+
+def init():
+    """Create the tables everywhere and pin each city already on a shard to that shard."""
+    import db
+    db.ensure_schema()
+    known = db.shard_map(refresh=True)
+    pinned = 0
+    for shard, cities in _cities_by_shard().items():
+        for c in cities:
+            if db._city_key(c) not in known:
+                db.set_city(c, shard)
+                known = db.shard_map()
+                pinned += 1
+    for rows in db.scatter(lambda conn: db._fetch(conn, "SELECT Food_ID, Location FROM food_listings", None)).values():
+        note_listings((r["Food_ID"], r["Location"]) for r in rows)  # claim routing for listings already loaded
+    return {"pinned": pinned, **status()}
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Sharded mode admin: set up, inspect, move cities between shards.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("init", help="create tables on every shard and the directory; pin existing cities")
+    sub.add_parser("status", help="rows and cities per shard")
+    mv = sub.add_parser("move", help="move a city to another shard")
+    mv.add_argument("city")
+    mv.add_argument("shard")
+    mv.add_argument("--settle", type=float, default=None,
+                    help="seconds to wait after pausing writes (default: shard map TTL + 1)")
+    args = ap.parse_args(argv)
+
+    import db
+    if not db.sharded():
+        ap.error("sharding is not enabled ([sharding] enabled = true in secrets)")
+    if args.cmd == "init":
+        out = init()
+    elif args.cmd == "status":
+        out = status()
+    else:
+        out = {"city": args.city, "shard": args.shard,
+               "moved": move_city(args.city, args.shard, args.settle, log=lambda m: print(m, file=sys.stderr))}
+    print(json.dumps(out, indent=2, default=str))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
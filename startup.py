@@ -0,0 +1,136 @@
+# startup.py — cold-start profiling, background warm-up and readiness
+#
+#   APP_PROFILE_STARTUP=1 streamlit run app.py   # per-phase timings on stderr + in the sidebar
+#   APP_READY_FILE=/tmp/app.ready                # touched once every warm-up task has succeeded
+#   python startup.py --check                    # readiness probe (DB reachable + schema); exit 0 = ready
+#
+# Streamlit pages render over a websocket, so an HTTP GET can't see the app's state: orchestrators
+# should exec `python startup.py --check` (or test for APP_READY_FILE) instead of probing a URL.
+#
+# Stdlib only: this is imported before streamlit/pandas so it can time them.
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+T0 = time.perf_counter()
+PROFILE = os.environ.get("APP_PROFILE_STARTUP", "") not in ("", "0", "false")
+READY_FILE = os.environ.get("APP_READY_FILE")
+
+PHASES = []   # [(name, seconds)] in the order they ran; first run of the process only
+_reported = False
+
+@contextmanager
+def phase(name):
+    """Time one import/init step of the first (cold) script run."""
+    t = time.perf_counter()
+    try:
+        yield
+    finally:
+        if not _reported:
+            PHASES.append((name, time.perf_counter() - t))
+
+def report():
+    """Print the cold-start breakdown once per process (only in profiling mode)."""
+    global _reported
+    if _reported:
+        return
+    _reported = True
+    if not PROFILE:
+        return
+    total = time.perf_counter() - T0
+    print(f"[startup] first paint after {total * 1000:.0f} ms", file=sys.stderr)
+    for name, secs in PHASES:
+        print(f"[startup]   {name:<28} {secs * 1000:8.1f} ms", file=sys.stderr)
+
+# ---------- warm-up ----------
+RETRY_DELAY = 1.0   # seconds before the first retry of a failed task; doubles per attempt
+RETRY_MAX = 30.0    # cap on the delay between retries
+
+class WarmUp:
+    """
+    Runs named tasks in a daemon thread, in order. Failed tasks are retried with backoff until they
+    succeed (the DB may come up after the app); readiness = every task has succeeded.
+    """
+
+    def __init__(self, tasks):
+        self.tasks = list(tasks)
+        self.status = {name: "pending" for name, _ in self.tasks}
+        self.timings = {}
+        self.attempts = {name: 0 for name, _ in self.tasks}
+        self.done = threading.Event()  # first pass over every task finished (retries may follow)
+        self._ok = {name: threading.Event() for name, _ in self.tasks}
+        self._thread = threading.Thread(target=self._run, name="warm-up", daemon=True)
+        self._thread.start()
+
+    def _attempt(self, name, fn):
+        t = time.perf_counter()
+        self.attempts[name] += 1
+        try:
+            fn()
+            self.status[name] = "ok"
+            self._ok[name].set()
+        except Exception as e:  # a failed task means "not ready" until a retry succeeds
+            self.status[name] = f"error: {e}"
+        self.timings[name] = time.perf_counter() - t
+
+    def _run(self):
+        for name, fn in self.tasks:
+            self._attempt(name, fn)
+        self.done.set()
+        delay = RETRY_DELAY
+        while not self.ready:
+            time.sleep(delay)
+            delay = min(delay * 2, RETRY_MAX)
+            for name, fn in self.tasks:
+                if not self._ok[name].is_set():
+                    self._attempt(name, fn)
+        if READY_FILE:
+            with open(READY_FILE, "w") as f:
+                f.write(str(os.getpid()))
+
+    def wait(self, name, timeout=None) -> bool:
+        """Block until task `name` has succeeded (or `timeout` passes); True if it has."""
+        return self._ok[name].wait(timeout)
+
+    @property
+    def ready(self) -> bool:
+        return all(e.is_set() for e in self._ok.values())
+
+    def readiness(self) -> dict:
+        return {
+            "ready": self.ready,
+            "tasks": dict(self.status),
+            "attempts": dict(self.attempts),
+            "ms": {k: round(v * 1000, 1) for k, v in self.timings.items()},
+        }
+
+# ---------- exec probe ----------
+def check() -> int:
+    """Exit code 0 if the DB is reachable and the app's tables exist."""
+    from db import connect
+    try:
+        conn = connect()
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = DATABASE() "
+            "AND table_name IN ('providers','receivers','food_listings','claims')"
+        )
+        n = cur.fetchone()[0]
+        cur.close()
+        conn.close()
+    except Exception as e:
+        print(f"not ready: {e}", file=sys.stderr)
+        return 1
+    if n < 4:
+        print(f"not ready: {n}/4 tables present", file=sys.stderr)
+        return 1
+    print("ready")
+    return 0
+
+if __name__ == "__main__":
+    if {"--check", "check"} & set(sys.argv[1:]):
+        sys.exit(check())
+    print("usage: python startup.py --check", file=sys.stderr)
+    sys.exit(2)
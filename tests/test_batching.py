@@ -0,0 +1,63 @@
+# tests/test_batching.py — AdaptiveBatcher sizing and load_batched retries (no database)
+import mysql.connector
+import pytest
+
+from batching import AdaptiveBatcher, load_batched, row_bytes
+
+def _feed(b, rps, n=None):
+    n = n or b.next_size()
+    b.record(n, n / rps, n * 50)
+    return b.next_size()
+
+def test_grows_while_throughput_improves():
+    b = AdaptiveBatcher(start=100)
+    assert _feed(b, 1000) == 151
+    assert _feed(b, 1500) == 227
+
+def test_holds_inside_tolerance_band():
+    b = AdaptiveBatcher(start=100, tolerance=0.95)
+    assert _feed(b, 1000) == 151
+    for rps in (990, 980, 975):    # each a little slower than the last: noise, not a reason to grow
+        assert _feed(b, rps) == 151
+
+def test_steps_back_towards_best_on_a_real_drop():
+    b = AdaptiveBatcher(start=100)
+    _feed(b, 1000)                  # best so far: 100 rows at 1000 rows/s; next 151
+    assert _feed(b, 500) == (151 + 100) // 2
+
+def test_backoff_halves_and_counts():
+    b = AdaptiveBatcher(start=400, min_size=10)
+    b.backoff()
+    assert b.next_size() == 200
+    assert b.errors == 1
+    for _ in range(10):
+        b.backoff()
+    assert b.next_size() == 10
+
+def test_packet_cap():
+    b = AdaptiveBatcher(start=1000, max_packet=10_000)
+    b.record(100, 0.1, 100 * 100)  # 100-byte rows -> at most 80 per statement
+    assert b.next_size() == 80
+
+def test_load_batched_retries_retryable_errors():
+    sent, failures = [], [mysql.connector.Error(errno=1213)]
+
+    def exec_fn(sql, chunk):
+        if failures:
+            raise failures.pop()
+        sent.extend(chunk)
+
+    rows = [(i, "x") for i in range(250)]
+    b = load_batched("INSERT", rows, exec_fn, AdaptiveBatcher(start=100), retry_sleep=0)
+    assert sent == rows
+    assert b.errors == 1 and b.rows == 250
+
+def test_load_batched_raises_other_errors():
+    def exec_fn(sql, chunk):
+        raise mysql.connector.Error(errno=1062)
+
+    with pytest.raises(mysql.connector.Error):
+        load_batched("INSERT", [(1,)], exec_fn, AdaptiveBatcher(), retry_sleep=0)
+
+def test_row_bytes():
+    assert row_bytes((None, "abc")) == 4 + 6 + 6
@@ -0,0 +1,108 @@
+# tests/test_claim_events.py — offsets, polling and CompletionTimes against a fake event log (no database)
+import datetime as dt
+
+import claim_events
+from claim_events import READ_SQL, CompletionTimes, Consumer, append, poll
+
+T0 = dt.datetime(2024, 1, 1, 8, 0)
+
+def _event(seq, cid, kind, status, hours, claim_time=T0):
+    return {"Seq": seq, "Claim_ID": cid, "Event": kind, "Status": status,
+            "Claim_Time": claim_time, "Recorded_At": T0 + dt.timedelta(hours=hours)}
+
+class FakeLog:
+    """run_q / run_exec over an in-memory claim_events table and event_offsets."""
+
+    def __init__(self, events):
+        self.events, self.offsets, self.reads = events, {}, []
+
+    def run_q(self, sql, params=None):
+        if sql == READ_SQL:
+            after, limit = params
+            self.reads.append(after)
+            return [e for e in self.events if e["Seq"] > after][:limit]
+        if sql.startswith("SELECT Seq FROM event_offsets"):
+            return [{"Seq": self.offsets[params[0]]}] if params[0] in self.offsets else []
+        raise AssertionError(sql)
+
+    def run_exec(self, sql, params):
+        assert sql.startswith("INSERT INTO event_offsets")
+        self.offsets[params[0]] = params[1]
+
+class Collect(Consumer):
+    name = "collect"
+
+    def __init__(self):
+        super().__init__()
+        self.seen = []
+
+    def apply(self, events):
+        self.seen += [e["Seq"] for e in events]
+
+def test_poll_reads_in_batches_and_only_new_events():
+    log = FakeLog([_event(i, i, "create", "Pending", 0) for i in range(1, 6)])
+    c = Collect()
+    assert poll(c, log.run_q, limit=2) == 5
+    assert log.reads == [0, 2, 4]          # a short batch ends the loop
+    assert c.seen == [1, 2, 3, 4, 5] and c.offset == 5
+    log.events.append(_event(6, 6, "create", "Pending", 0))
+    assert poll(c, log.run_q, limit=2) == 1
+    assert c.seen[-1] == 6
+
+def test_streams_keep_separate_offsets():
+    a, b = FakeLog([_event(1, 1, "create", "Pending", 0)]), FakeLog([_event(1, 9, "create", "Pending", 0)])
+    c = Collect()
+    poll(c, a.run_q, stream="s0")
+    poll(c, b.run_q, stream="s1")
+    assert c.offsets == {"s0": 1, "s1": 1} and c.offset == 2
+
+def test_durable_consumer_resumes_from_saved_offset():
+    log = FakeLog([_event(i, i, "create", "Pending", 0) for i in range(1, 4)])
+    log.offsets["collect"] = 2
+
+    class Durable(Collect):
+        durable = True
+
+    c = Durable()
+    assert poll(c, log.run_q, log.run_exec) == 1
+    assert c.seen == [3] and log.offsets["collect"] == 3
+
+def test_completion_times():
+    ct = CompletionTimes()
+    ct.apply([
+        _event(1, 1, "create", "Pending", 0),
+        _event(2, 2, "create", "Pending", 0),
+        _event(3, 3, "create", "Completed", 0),     # imported settled: no timing
+        _event(4, 1, "update", "Completed", 2),
+        _event(5, 1, "update", "Cancelled", 5),     # only the first outcome counts
+        _event(6, 2, "update", "Cancelled", 4),
+        _event(7, 4, "create", "Pending", 0),
+        _event(8, 4, "delete", None, 1),
+    ])
+    rows = {r["Outcome"]: r for r in ct.summary()}
+    assert rows["Completed"]["Claims"] == 1 and rows["Completed"]["Median_h"] == 2.0
+    assert rows["Cancelled"]["Claims"] == 1 and rows["Cancelled"]["Median_h"] == 4.0
+    assert rows["Still open"]["Claims"] == 0
+
+class FakeCursor:
+    def __init__(self):
+        self.seq, self.inserted = 0, []
+
+    def execute(self, sql, params=()):
+        if sql.startswith("UPDATE claim_event_seq"):
+            self.seq += params[0]
+        self._row = {"last": self.seq}
+
+    def fetchone(self):
+        return self._row
+
+    def executemany(self, sql, rows):
+        self.inserted += rows
+
+def test_append_numbers_events_from_the_counter():
+    cur = FakeCursor()
+    cur.seq = 10
+    assert append(cur, [(1, "create", (5, 6, "Pending", T0), None), (2, "delete", None, (5, 6, "Pending", T0))]) == 12
+    assert [r[0] for r in cur.inserted] == [11, 12]
+    assert len(cur.inserted[0]) == len(claim_events.EVENT_COLUMNS)
+    assert append(cur, []) == 0
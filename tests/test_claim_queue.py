@@ -0,0 +1,120 @@
+# tests/test_claim_queue.py — ClaimWriteQueue IDs and lost-COMMIT handling against a fake connection
+import datetime as dt
+import itertools
+
+import mysql.connector
+import pytest
+
+from claim_queue import ClaimWriteQueue, CommitUnknown
+
+class FakeServer:
+    def __init__(self):
+        self.claims, self.events = {}, []
+        self.fail_commit = []  # errnos to raise on upcoming COMMITs: (errno, applied_first)
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn, self._rows = conn, []
+
+    def execute(self, sql, params=()):
+        if sql.startswith("SELECT NOW()"):
+            self._rows = [{"now": dt.datetime(2024, 1, 1)}]
+        elif sql.startswith("UPDATE claim_event_seq"):
+            self.conn.seq += params[0]
+            self._last = self.conn.seq
+        elif sql.startswith("SELECT LAST_INSERT_ID()"):
+            self._rows = [{"last": self._last}]
+        elif sql.startswith("SELECT COUNT(*) FROM claims"):
+            self._rows = [(sum(i in self.conn.server.claims for i in params),)]
+        else:
+            raise AssertionError(sql)
+
+    def executemany(self, sql, rows):
+        for r in rows:
+            if sql.startswith("INSERT INTO claims"):
+                if r[0] in self.conn.server.claims or r[0] in self.conn.pending:
+                    raise mysql.connector.IntegrityError(errno=1062)
+                self.conn.pending[r[0]] = r
+            else:
+                self.conn.pending_events.append(r)
+
+    def fetchone(self):
+        return self._rows[0]
+
+    def close(self):
+        pass
+
+class FakeConn:
+    def __init__(self, server):
+        self.server, self.seq = server, 0
+        self.pending, self.pending_events = {}, []
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self)
+
+    def ping(self, **kw):
+        pass
+
+    def start_transaction(self):
+        self.pending, self.pending_events = {}, []
+
+    def commit(self):
+        if self.pending and self.server.fail_commit:
+            errno, applied = self.server.fail_commit.pop(0)
+            if applied:
+                self.server.claims.update(self.pending)
+            self.pending = {}
+            raise mysql.connector.OperationalError(errno=errno)
+        self.server.claims.update(self.pending)
+        self.server.events += self.pending_events
+        self.pending = {}
+
+    def rollback(self):
+        self.pending = {}
+
+    def close(self):
+        pass
+
+def _queue(server, **kw):
+    counter = itertools.count(1)
+    return ClaimWriteQueue(lambda: FakeConn(server), lambda n: [next(counter) for _ in range(n)][0],
+                           window_ms=50, **kw)
+
+def test_ids_come_from_the_allocator():
+    server = FakeServer()
+    q = _queue(server)
+    futs = [q.submit(1, 2) for _ in range(3)]
+    assert sorted(f.result(timeout=5) for f in futs) == [1, 2, 3]
+    q.close()
+    assert sorted(server.claims) == [1, 2, 3]
+
+def test_commit_that_landed_before_the_connection_dropped_is_not_replayed():
+    server = FakeServer()
+    server.fail_commit = [(2013, True)]
+    q = _queue(server)
+    futs = [q.submit(1, 2) for _ in range(3)]
+    assert sorted(f.result(timeout=5) for f in futs) == [1, 2, 3]
+    q.close()
+    assert len(server.claims) == 3
+
+def test_commit_that_did_not_land_is_replayed_with_the_same_ids():
+    server = FakeServer()
+    server.fail_commit = [(2013, False)]
+    q = _queue(server)
+    futs = [q.submit(1, 2) for _ in range(3)]
+    assert sorted(f.result(timeout=5) for f in futs) == [1, 2, 3]
+    q.close()
+    assert sorted(server.claims) == [1, 2, 3]
+
+def test_unconfirmed_commit_reports_pending():
+    server = FakeServer()
+    server.fail_commit = [(2013, True)]
+    q = _queue(server)
+    q._landed = lambda ids: (_ for _ in ()).throw(mysql.connector.InterfaceError(errno=2003))
+    with pytest.raises(TimeoutError):
+        q.create(1, 2, timeout=5)
+    q.close()
+
+def test_replica_durability_needs_replicas():
+    with pytest.raises(ValueError):
+        _queue(FakeServer(), durability="replica")
@@ -0,0 +1,48 @@
+# tests/test_contacts.py — Contact normalization, lookup keys and backfill (no database)
+import pandas as pd
+
+from contacts import COLUMNS, backfill, lookup_key, normalize, normalize_one
+
+def test_normalize_phone_formats():
+    out = normalize(pd.Series([
+        "(925) 283-8901",          # national -> default country code
+        "1-925-283-8901",          # national with the country code
+        "+44 20 7946 0958",        # international
+        "001-517-555-0100",        # 00 international prefix
+        "925.283.8901 x6297",      # extension
+    ]))
+    assert out["Contact_E164"].tolist() == ["+19252838901", "+19252838901", "+442079460958",
+                                            "+15175550100", "+19252838901"]
+    assert out["Contact_Ext"].tolist() == [None, None, None, None, "6297"]
+    assert set(out["Contact_Kind"]) == {"phone"}
+
+def test_normalize_email_other_and_empty():
+    out = normalize(pd.Series([" Ops@FoodBank.org ", "call the front desk", "", None, "12345"]))
+    assert out["Contact_Email"].tolist() == ["ops@foodbank.org", None, None, None, None]
+    assert out["Contact_Kind"].tolist() == ["email", "other", None, None, "other"]
+    assert out["Contact_E164"].isna().all()
+    assert list(out.columns) == list(COLUMNS)
+
+def test_normalize_keeps_the_index():
+    s = pd.Series(["(925) 283-8901"], index=[42])
+    assert normalize(s).index.tolist() == [42]
+
+def test_normalize_one():
+    assert normalize_one("925-283-8901 ext. 12") == ("+19252838901", "12", None, "phone")
+    assert normalize_one(None) == (None, None, None, None)
+
+def test_lookup_key():
+    assert lookup_key("(925) 283-8901") == ("Contact_E164", "+19252838901")
+    assert lookup_key("OPS@foodbank.org") == ("Contact_Email", "ops@foodbank.org")
+    assert lookup_key("n/a") is None
+
+def test_backfill_updates_in_batches():
+    written = []
+
+    def run_q(sql, params=None, primary=False):
+        assert primary and "Contact_Kind IS NULL" in sql
+        return [{"Provider_ID": i, "Contact": f"925-283-89{i:02d}"} for i in range(5)]
+
+    assert backfill(run_q, lambda sql, params: written.append(params), "providers", "Provider_ID", batch=2) == 5
+    assert [len(b) for b in written] == [2, 2, 1]
+    assert written[0][0] == ("+19252838900", None, None, "phone", 0)
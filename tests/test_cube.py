@@ -0,0 +1,52 @@
+# tests/test_cube.py — Cube build, query roll-ups/filters and incremental refresh (no database)
+from claim_events import HEAD_SQL
+from cube import CLAIMS_SQL, EVENTS_SQL, LISTINGS_SQL, MEASURES, Cube
+
+def _cell(loc, food, month, **measures):
+    return {"Location": loc, "Food_Type": food, "Meal_Type": "Lunch", "Provider_Type": "NGO", "Month": month,
+            **measures}
+
+def _reader(events=()):
+    def run_q(sql, params=None):
+        if sql == HEAD_SQL:
+            return [{"seq": 10}]
+        if sql == LISTINGS_SQL:
+            return [_cell("Delhi", "Veg", "2024-01", Quantity=20, Listings=2),
+                    _cell("Delhi", "Meat", "2024-02", Quantity=5, Listings=1),
+                    _cell("Pune", "Veg", "2024-01", Quantity=None, Listings=1)]
+        if sql == CLAIMS_SQL:
+            return [_cell("Delhi", "Veg", "2024-01", Status="Pending", n=3),
+                    _cell("Pune", "Veg", "2024-01", Status="Completed", n=1)]
+        if sql == EVENTS_SQL:
+            return [e for e in events if e["Seq"] > params[0]][:params[1]]
+        raise AssertionError(sql)
+    return run_q
+
+def test_grand_total_and_group_by():
+    cube = Cube(capacity=1).build(_reader())   # capacity=1: the arrays grow as cells arrive
+    total = cube.query().iloc[0]
+    assert (total["Quantity"], total["Listings"], total["Claims"], total["Pending"], total["Completed"]) == (25, 4, 4, 3, 1)
+    by_loc = cube.query(["Location"]).set_index("Location")
+    assert by_loc.loc["Delhi", "Quantity"] == 25 and by_loc.loc["Pune", "Claims"] == 1
+    assert list(cube.query(["Location"]).columns) == ["Location", *MEASURES]
+    assert cube.offset == 10
+
+def test_filters_and_members():
+    cube = Cube().build(_reader())
+    veg = cube.query(["Location"], {"Food_Type": "Veg"}).set_index("Location")
+    assert veg.loc["Delhi", "Quantity"] == 20
+    both = cube.query((), {"Location": ["Delhi", "Pune"], "Month": "2024-01"})
+    assert both.loc[0, "Listings"] == 3
+    assert cube.query((), {"Location": "Nowhere"}).loc[0, "Claims"] == 0
+    assert cube.members("Food_Type", {"Location": "Delhi"}) == ["Meat", "Veg"]
+    assert cube.members("Location", {"Food_Type": "Meat"}) == ["Delhi"]
+
+def test_refresh_moves_a_claim_between_statuses():
+    dims = {d: v for d, v in _cell("Delhi", "Veg", "2024-01").items()}
+    event = {"Seq": 11, "Status": "Completed", "Prev_Status": "Pending", "has_after": 1, "has_before": 1,
+             **dims, **{f"Prev_{d}": v for d, v in dims.items()}}
+    cube = Cube().build(_reader())
+    cube.refresh(_reader([event]))
+    delhi = cube.query(["Location"]).set_index("Location").loc["Delhi"]
+    assert (delhi["Claims"], delhi["Pending"], delhi["Completed"]) == (3, 2, 1)
+    assert cube.offset == 11
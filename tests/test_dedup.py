@@ -0,0 +1,43 @@
+# tests/test_dedup.py — soundex, candidate pairs, oversize blocks and clustering (no database)
+import pandas as pd
+
+import dedup
+from dedup import clusters, find_candidates, soundex
+
+def test_soundex():
+    assert soundex("robert") == soundex("rupert") == "R163"
+    assert soundex("ashcraft") == "A261"   # h/w don't separate equal codes
+    assert soundex("lee") == "L000"
+    assert soundex("") == ""
+
+def _providers(rows):
+    return pd.DataFrame(rows, columns=["Provider_ID", "Name", "Address", "City", "Contact"])
+
+def test_find_candidates_pairs_punctuation_variants():
+    df = _providers([
+        (1, "Green Grocers Inc.", "12 Main St", "Springfield", "+1 (555) 010-1234"),
+        (2, "green grocers", "12 Main Street", "Springfield", "555.010.1234"),
+        (3, "Blue Bakery", "9 Elm Rd", "Springfield", "555-999-0000"),
+    ])
+    out = find_candidates(df, "providers")
+    assert list(zip(out["Provider_ID_a"], out["Provider_ID_b"])) == [(1, 2)]
+    assert out.loc[0, "blocks"] == "name+city,contact"
+
+def test_find_candidates_empty_when_nothing_shares_a_key():
+    df = _providers([(1, "Alpha", "", "X", ""), (2, "Omega", "", "Y", "")])
+    assert find_candidates(df, "providers").empty
+
+def test_big_blocks_split_on_a_second_key_and_report_the_rest(monkeypatch):
+    monkeypatch.setattr(dedup, "MAX_BLOCK", 3)
+    rows = [(i, f"Food Bank {w}", "", "Springfield", "") for i, w in enumerate(["North", "North", "South", "East", "West"], 1)]
+    rows += [(10 + i, "Food", "", "Springfield", "") for i in range(4)]  # one word: no second key, still too big
+    skipped = []
+    out = find_candidates(_providers(rows), "providers", threshold=0.0, skipped=skipped)
+    pairs = set(zip(out["Provider_ID_a"], out["Provider_ID_b"]))
+    assert (1, 2) in pairs                       # same last word: compared
+    assert (3, 4) not in pairs                   # different last word: split apart
+    assert skipped == [{"blocks": "name+city", "key": "F300|springfield / ", "rows": 4}]
+
+def test_clusters_keep_lowest_id():
+    assert clusters([(5, 3), (3, 9), (7, 8)]) == {3: [5, 9], 7: [8]}
+    assert clusters([]) == {}
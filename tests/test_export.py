@@ -0,0 +1,48 @@
+# tests/test_export.py — k-way merge of shard streams and the write_to size cap (no database)
+import io
+
+import pytest
+
+import export
+from sharding import Merge
+
+def _fake_shards(monkeypatch, data, closed):
+    def fake(cfg, sql, params, chunk_size):
+        try:
+            rows = data[cfg["name"]]
+            yield ["Food_ID", "Expiry_Date"], [3, 10], rows[:chunk_size]
+            for k in range(chunk_size, len(rows), chunk_size):
+                yield ["Food_ID", "Expiry_Date"], [3, 10], rows[k:k + chunk_size]
+        finally:
+            closed.append(cfg["name"])
+    monkeypatch.setattr(export, "_cursor_chunks", fake)
+
+def test_order_only_merges_stream(monkeypatch):
+    data = {"s0": [(1, None), (2, "2024-01-02"), (3, "2024-01-05")], "s1": [(4, "2024-01-01"), (5, "2024-01-03")]}
+    closed = []
+    _fake_shards(monkeypatch, data, closed)
+    spec = Merge(order_by=(("Expiry_Date", False),))
+    chunks = list(export._merged_chunks([{"name": "s0"}, {"name": "s1"}], "SQL", None, 2, spec))
+    assert [r[0] for _, _, rows in chunks for r in rows] == [1, 4, 2, 5, 3]
+    assert all(len(rows) <= 2 for _, _, rows in chunks)
+    assert sorted(closed) == ["s0", "s1"]
+
+def test_only_plain_orderings_stream():
+    assert export._order_only(Merge(order_by=(("Expiry_Date", False),)))
+    assert not export._order_only(Merge(keys=("city",), sums=("n",), order_by=(("n", True),)))
+    assert not export._order_only(Merge(order_by=(("a", False), ("b", True))))
+
+def test_write_to_stops_past_max_bytes(monkeypatch):
+    closed = []
+
+    def parts(*a, **k):
+        try:
+            while True:
+                yield b"x" * 100
+        finally:
+            closed.append(True)
+    monkeypatch.setattr(export, "stream", parts)
+    out = io.BytesIO()
+    with pytest.raises(export.ExportTooLarge):
+        export.write_to(out, "SQL", max_bytes=250)
+    assert len(out.getvalue()) == 200 and closed == [True]
@@ -0,0 +1,43 @@
+# tests/test_export_apptest.py — click "Prepare export" in app.py and check a download comes back
+#
+#   MYSQL_HOST=127.0.0.1 MYSQL_USER=app MYSQL_PASSWORD=... MYSQL_DATABASE=food_test python -m pytest tests/
+#
+# Runs the real app against a scratch database (same MYSQL_* variables as bulk_load.py); skipped without one.
+import os
+
+import pytest
+
+pytest.importorskip("streamlit")
+pytest.importorskip("mysql.connector")
+from streamlit.testing.v1 import AppTest
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+pytestmark = pytest.mark.skipif(not os.environ.get("MYSQL_HOST"), reason="needs a scratch MySQL (MYSQL_HOST etc.)")
+
+def _app():
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.secrets["mysql"] = {
+        "host": os.environ["MYSQL_HOST"],
+        "port": int(os.environ.get("MYSQL_PORT", 3306)),
+        "user": os.environ["MYSQL_USER"],
+        "password": os.environ.get("MYSQL_PASSWORD", ""),
+        "database": os.environ["MYSQL_DATABASE"],
+    }
+    at.run()
+    assert not at.exception
+    return at
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet"])
+def test_table_export_offers_download(fmt):
+    if fmt == "parquet":
+        pytest.importorskip("pyarrow")
+    at = _app()
+    at.sidebar.radio(key="nav_radio").set_value("CRUD").run()
+    at.selectbox(key="crud_table").set_value("providers").run()
+    at.selectbox(key="crud_providers_fmt").set_value(fmt).run()
+    at.button(key="crud_providers_prep").click().run()
+
+    assert not at.exception, at.exception
+    assert not [e.value for e in at.error if str(e.value).startswith("Export failed")]
+    assert len(at.get("download_button")) == 1
@@ -0,0 +1,71 @@
+# tests/test_sharding.py — merge_rows over per-shard partials and CRUD row lookup (no database)
+import pytest
+
+import sharding
+from sharding import Merge, merge_rows
+
+def test_no_spec_concatenates():
+    assert merge_rows([[{"a": 1}], [{"a": 2}]]) == [{"a": 1}, {"a": 2}]
+
+def test_group_sums_and_order():
+    parts = [[{"city": "A", "n": 2}, {"city": "B", "n": 1}], [{"city": "A", "n": 3}, {"city": "C", "n": None}]]
+    out = merge_rows(parts, Merge(keys=("city",), sums=("n",), order_by=(("n", True),)))
+    assert out == [{"city": "A", "n": 5}, {"city": "B", "n": 1}, {"city": "C", "n": None}]  # NULLs last descending
+
+def test_ratios_share_and_drop():
+    parts = [[{"k": "x", "qty": 10, "c": 2}], [{"k": "x", "qty": 5, "c": 1}, {"k": "y", "qty": 0, "c": 0}]]
+    out = merge_rows(parts, Merge(keys=("k",), sums=("qty", "c"), ratios=(("avg", "qty", "c", 2),),
+                                  share=("pct", "qty", 1), drop=("c",)))
+    assert out == [{"k": "x", "qty": 15, "avg": 5.0, "pct": 100.0}, {"k": "y", "qty": 0, "avg": None, "pct": 0.0}]
+
+def test_names_are_joined_after_the_merge_and_unmatched_rows_dropped():
+    seen = []
+
+    def lookup(table, id_col, name_col, ids):
+        seen.append((table, id_col, sorted(ids)))
+        return {1: "Shelter A"}
+
+    spec = Merge(keys=("receiver_id",), sums=("n",), names=("receiver_id", "receivers", "Receiver_ID", "name", "name"))
+    out = merge_rows([[{"receiver_id": 1, "n": 1}], [{"receiver_id": 1, "n": 2}, {"receiver_id": 7, "n": 1}]],
+                     spec, lookup)
+    assert out == [{"receiver_id": 1, "name": "Shelter A", "n": 3}]
+    assert seen == [("receivers", "Receiver_ID", [1, 7])]
+
+def test_distinct_ascending_nulls_first_and_limit():
+    parts = [[{"loc": "b"}, {"loc": None}], [{"loc": "a"}, {"loc": "b"}]]
+    assert merge_rows(parts, Merge(distinct=True, order_by=(("loc", False),))) == [{"loc": None}, {"loc": "a"}, {"loc": "b"}]
+    assert len(merge_rows(parts, Merge(limit=3))) == 3
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    import db
+    shards = {"s0": {}, "s1": {5: {"Provider_ID": 5, "City": "Delhi"}}}
+    calls = {"q": [], "locate": 0}
+
+    def run_q(sql, params=None, shard=None, **_):
+        calls["q"].append(shard)
+        row = shards[shard].get(params[0])
+        return [row] if row else []
+
+    def locate(table, id_col, value):
+        calls["locate"] += 1
+        for name, rows in shards.items():
+            if value in rows:
+                return name, rows[value]
+        return None, None
+
+    monkeypatch.setattr(db, "run_q", run_q)
+    monkeypatch.setattr(db, "locate", locate)
+    monkeypatch.setattr(sharding, "_homes", {"rows": sharding.OrderedDict(), "lock": sharding.threading.Lock()})
+    return calls
+
+def test_find_row_asks_the_likely_shard_first(fake_db):
+    assert sharding.find_row("providers", "Provider_ID", 5, likely=["s1"])[0] == "s1"
+    assert fake_db == {"q": ["s1"], "locate": 0}
+
+def test_find_row_remembers_and_scatters_only_on_a_miss(fake_db):
+    assert sharding.find_row("providers", "Provider_ID", 5, likely=["s0"])[0] == "s1"
+    assert fake_db["locate"] == 1                       # wrong guess: asked every shard once
+    assert sharding.find_row("providers", "Provider_ID", 5)[0] == "s1"
+    assert fake_db["locate"] == 1 and fake_db["q"][-1] == "s1"  # remembered
+    assert sharding.find_row("providers", "Provider_ID", 99) == (None, None)